@@ -0,0 +1,19 @@
+from MLProject.serving.asgi_app import create_app
+from MLProject.serving.model_registry import model_registry
+from MLProject.config.configuration import ConfigurationManager
+from MLProject import logger
+
+# Load the preprocessor and model at import time. Under gunicorn with preload_app
+# (see gunicorn.conf.py) this runs once in the master and the forked workers share it.
+try:
+    model_registry.warm_up()
+except Exception as e:
+    logger.exception(f"Model warm-up failed, artifacts will be loaded on first request: {e}")
+
+serving_config = ConfigurationManager().get_serving_config()
+app = create_app(serving_config)
+
+if __name__ == "__main__":
+    # Single-process mode for local runs; production uses: gunicorn -c gunicorn.conf.py asgi:app
+    import uvicorn
+    uvicorn.run(app, host=serving_config.host, port=serving_config.port)
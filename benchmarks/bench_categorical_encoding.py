@@ -0,0 +1,112 @@
+"""
+Compares the two DataTransformation feature modes for CatBoost:
+
+- onehot: City one-hot encoded by the sklearn ColumnTransformer (dense floats)
+- native: City passed through as a raw category via a pre-quantized Pool
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+The transformation stage is re-run into a temporary directory with the
+repository's config/params, overriding only `categorical_encoding`.
+
+Run from the repository root after data ingestion:
+    python benchmarks/bench_categorical_encoding.py --iterations 1000
+"""
+import argparse
+import dataclasses
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+MODES = ("onehot", "native")
+
+
+def run_mode(mode: str, iterations: int, depth: int, thread_count: int) -> dict:
+    from catboost import CatBoostRegressor, Pool
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    from MLProject.config.configuration import ConfigurationManager
+    from MLProject.components.data_transformation import DataTransformation
+    from MLProject.utils.artifact_io import load_features_and_target
+
+    config = ConfigurationManager().get_data_transformation_config()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = dataclasses.replace(
+            config, root_dir=Path(temp_dir), categorical_encoding=mode, export_csv=False,
+            train_data_path=Path(temp_dir) / "train", test_data_path=Path(temp_dir) / "test",
+        )
+        DataTransformation(config).initiate_data_transformation()
+        train_x, train_y = load_features_and_target(config.train_data_path, config.target_column)
+        test_x, test_y = load_features_and_target(config.test_data_path, config.target_column)
+
+    cat_features = [i for i, column in enumerate(train_x.columns) if train_x[column].dtype == object]
+
+    start = time.perf_counter()
+    train_pool = Pool(train_x, train_y, cat_features=cat_features or None)
+    train_pool.quantize()
+    pool_s = time.perf_counter() - start
+
+    model = CatBoostRegressor(iterations=iterations, depth=depth, random_seed=42, verbose=0,
+                              thread_count=thread_count, allow_writing_files=False)
+    start = time.perf_counter()
+    model.fit(train_pool)
+    fit_s = time.perf_counter() - start
+
+    predictions = model.predict(Pool(test_x, cat_features=cat_features or None))
+    actual = np.asarray(test_y)
+    if config.target_column in config.columns_to_log_transform:
+        actual, predictions = np.expm1(actual), np.expm1(predictions)
+
+    return {
+        "mode": mode,
+        "n_features": int(train_x.shape[1]),
+        "train_matrix_mb": float(train_x.memory_usage(deep=True).sum() / 2**20),
+        "pool_build_s": pool_s,
+        "fit_s": fit_s,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "rmse": float(np.sqrt(mean_squared_error(actual, predictions))),
+        "mae": float(mean_absolute_error(actual, predictions)),
+        "r2": float(r2_score(actual, predictions)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--thread-count", type=int, default=-1)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS) # internal: child process
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.iterations, args.depth, args.thread_count)))
+        return
+
+    results = []
+    for mode in MODES:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--iterations", str(args.iterations),
+             "--depth", str(args.depth), "--thread-count", str(args.thread_count)],
+            check=True, capture_output=True, text=True, env=os.environ.copy(),
+        )
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(f"{'mode':<8}{'features':>9}{'matrix MB':>11}{'pool s':>9}{'fit s':>9}{'peak RSS MB':>13}"
+          f"{'RMSE':>9}{'MAE':>9}{'R2':>8}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['n_features']:>9}{r['train_matrix_mb']:>11.1f}{r['pool_build_s']:>9.2f}"
+              f"{r['fit_s']:>9.2f}{r['peak_rss_mb']:>13.0f}{r['rmse']:>9.2f}{r['mae']:>9.2f}{r['r2']:>8.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark and parity check of the compiled NumPy preprocessor against the
+fitted sklearn ColumnTransformer.
+
+Run from the repository root after the data transformation stage:
+    python benchmarks/bench_compiled_preprocessor.py
+"""
+import argparse
+import json
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from MLProject.utils.compiled_preprocessor import compile_preprocessor
+from MLProject.utils.date_features import date_features
+
+
+def engineer_features(data: pd.DataFrame) -> pd.DataFrame:
+    data = data.copy()
+    for column, values in date_features(data['Date'].to_numpy()).items():
+        data[column] = values
+    return data
+
+
+def time_per_call(fn, repeats: int) -> float:
+    fn() # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preprocessor", default="artifacts/data_transformation/preprocessor.joblib")
+    parser.add_argument("--data", default="artifacts/data_ingestion/city_day.csv")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    preprocessor = joblib.load(args.preprocessor)
+    data = engineer_features(pd.read_csv(args.data))
+
+    # Parity on the full history plus the synthetic edge-case frame
+    compiled = compile_preprocessor(preprocessor, data=data)
+    compiled.verify_parity(preprocessor)
+    features = data[compiled.input_columns]
+    print(f"Parity OK on {len(features)} rows and synthetic edge cases.")
+
+    results = {"rows_checked": len(features)}
+    for batch_size in (1, 64, 4096):
+        batch = features.iloc[:batch_size]
+        numeric = batch[compiled.numeric_columns].to_numpy(dtype=np.float64)
+        categorical = [batch[column].to_numpy(dtype=object) for column in compiled.categorical_columns]
+        repeats = max(args.repeats // max(batch_size // 64, 1), 5)
+
+        sklearn_s = time_per_call(lambda: preprocessor.transform(batch), repeats)
+        frame_s = time_per_call(lambda: compiled.transform_frame(batch), repeats)
+        array_s = time_per_call(lambda: compiled.transform(numeric, categorical), repeats)
+        results[f"batch_{batch_size}"] = {
+            "sklearn_us": sklearn_s * 1e6,
+            "compiled_frame_us": frame_s * 1e6,
+            "compiled_array_us": array_s * 1e6,
+            "speedup_array": sklearn_s / array_s,
+        }
+        print(f"batch={batch_size:>5}: ColumnTransformer {sklearn_s * 1e6:10.1f} us | "
+              f"compiled (DataFrame) {frame_s * 1e6:9.1f} us | compiled (array) {array_s * 1e6:9.1f} us | "
+              f"speedup x{sklearn_s / array_s:.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Date feature engineering: the former pandas code (pd.to_datetime plus five
+.dt accessors) against the shared calendar lookup in
+MLProject.utils.date_features, on single requests, micro-batches and the full
+history. Both must produce the same Year/Month/Day/DayOfWeek/IsWeekend.
+
+Run from the repository root after data ingestion:
+    python benchmarks/bench_date_features.py
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from MLProject.utils.date_features import DATE_FEATURE_COLUMNS, date_features
+
+
+def pandas_date_features(dates: pd.Series, **to_datetime_kwargs) -> dict:
+    parsed = pd.to_datetime(dates, errors='coerce', **to_datetime_kwargs)
+    day_of_week = parsed.dt.dayofweek
+    return {
+        "Year": parsed.dt.year,
+        "Month": parsed.dt.month,
+        "Day": parsed.dt.day,
+        "DayOfWeek": day_of_week,
+        "IsWeekend": day_of_week.isin([5, 6]).astype(int),
+    }
+
+
+def time_per_call(fn, repeats: int) -> float:
+    fn() # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="artifacts/data_ingestion/city_day.csv")
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    dates = pd.read_csv(args.data, usecols=["Date"])["Date"]
+    # Edge cases: unparseable, missing, non-padded and dates outside the precomputed calendar
+    check = pd.concat([dates, pd.Series(["not a date", None, "", "2020-1-5", "2020-02-30", "2012-06-15", "2031-01-01"])],
+                      ignore_index=True)
+    # format="mixed" so pandas parses every row on its own instead of inferring one format from the first
+    expected, actual = pandas_date_features(check, format="mixed"), date_features(check.to_numpy())
+    mismatched = [column for column in DATE_FEATURE_COLUMNS
+                  if not np.array_equal(np.asarray(expected[column], dtype=np.float64),
+                                        actual[column].astype(np.float64), equal_nan=True)]
+    if mismatched:
+        raise AssertionError(f"date_features differs from pandas in {mismatched}")
+    print(f"Parity OK on {len(check)} dates (history plus edge cases).")
+
+    results = {"rows_checked": len(dates)}
+    for batch_size in (1, 64, len(dates)):
+        batch = dates.iloc[:batch_size]
+        values = batch.to_numpy()
+        repeats = max(args.repeats // max(batch_size // 64, 1), 5)
+
+        pandas_s = time_per_call(lambda: pandas_date_features(batch), repeats)
+        lookup_s = time_per_call(lambda: date_features(values), repeats)
+        results[f"batch_{batch_size}"] = {"pandas_us": pandas_s * 1e6, "lookup_us": lookup_s * 1e6,
+                                          "speedup": pandas_s / lookup_s}
+        print(f"batch={batch_size:>6}: pandas {pandas_s * 1e6:10.1f} us | calendar lookup {lookup_s * 1e6:9.1f} us | "
+              f"speedup x{pandas_s / lookup_s:.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Import cost of the serving entry points and of each training stage.
+
+Every target runs in a fresh `python -X importtime` interpreter. The script
+reports the total import time (sum of the per-module self times CPython
+records), the wall time of the process, its RSS afterwards, which heavy
+third-party packages got loaded and the packages that cost the most.
+
+Training stages are measured as the stage module plus the component it runs.
+That covers everything the stage needs before any data is touched. main.py
+and `python -m` only pay for the stage that actually executes.
+
+Run from the repository root (serving targets load the downloaded model like
+a real worker does):
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --target app --target "stage 04 model trainer"
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ("pandas", "sklearn", "scipy", "joblib", "catboost", "mlflow", "dagshub", "flask", "starlette")
+
+TARGETS = {
+    "app": "import app",
+    "asgi": "import asgi",
+    "standalone model": "from MLProject.serving.standalone_model import StandaloneModel",
+    "main.py stages": ("import MLProject.pipeline.data_ingestion_01, MLProject.pipeline.data_validation_02, "
+                       "MLProject.pipeline.data_transformation_03, MLProject.pipeline.model_trainer_04, "
+                       "MLProject.pipeline.model_evaluation_05"),
+    "stage 01 data ingestion": "import MLProject.pipeline.data_ingestion_01, MLProject.components.data_ingestion",
+    "stage 02 data validation": "import MLProject.pipeline.data_validation_02, MLProject.components.data_validation",
+    "stage 03 data transformation": ("import MLProject.pipeline.data_transformation_03, "
+                                     "MLProject.components.data_transformation"),
+    "stage 04 model trainer": "import MLProject.pipeline.model_trainer_04, MLProject.components.model_trainer",
+    "stage 05 model evaluation": "import MLProject.pipeline.model_evaluation_05, MLProject.components.model_evaluation",
+}
+
+# Appended to every target: reports RSS and the heavy modules on the last stdout line
+_EPILOGUE = f"""
+import json, sys
+rss_kb = 0
+try:
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+except (OSError, StopIteration):
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'rss_mb': rss_kb / 1024, 'heavy_modules': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def parse_importtime(stderr: str):
+    '''Per-module self/cumulative microseconds from -X importtime output.'''
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def run_target(name: str, statement: str, top: int) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement + "\n" + _EPILOGUE],
+                               capture_output=True, text=True, env=env)
+    wall_s = time.perf_counter() - start
+    if completed.returncode != 0:
+        # e.g. an optional training dependency that is not installed in this environment
+        return {"target": name, "statement": statement, "error": completed.stderr.strip().splitlines()[-1]}
+
+    modules = parse_importtime(completed.stderr)
+    by_package = defaultdict(int)
+    for module, self_us, _ in modules:
+        by_package[module.split(".")[0]] += self_us
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {
+        "target": name,
+        "statement": statement,
+        "import_s": sum(self_us for _, self_us, _ in modules) / 1e6,
+        "wall_s": wall_s,
+        "n_modules": len(modules),
+        "rss_mb": result["rss_mb"],
+        "heavy_modules": result["heavy_modules"],
+        "top_packages": sorted(((package, us / 1e6) for package, us in by_package.items()), key=lambda item: -item[1])[:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", choices=list(TARGETS), help="targets to run (default: all)")
+    parser.add_argument("--top", type=int, default=5, help="most expensive packages listed per target")
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = [run_target(name, TARGETS[name], args.top) for name in (args.target or TARGETS)]
+
+    print(f"{'target':<30}{'import s':>10}{'wall s':>9}{'modules':>9}{'RSS MB':>9}  heavy modules")
+    for r in results:
+        if "error" in r:
+            print(f"{r['target']:<30}  failed: {r['error']}")
+            continue
+        print(f"{r['target']:<30}{r['import_s']:>10.2f}{r['wall_s']:>9.2f}{r['n_modules']:>9}{r['rss_mb']:>9.0f}"
+              f"  {', '.join(r['heavy_modules']) or '-'}")
+        print(f"{'':<30}  top: " + ", ".join(f"{package} {seconds:.2f}s" for package, seconds in r["top_packages"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Memory of N serving workers with and without copy-on-write sharing.
+
+Starts gunicorn with gunicorn.conf.py twice:
+- shared:     preload_app + gc.freeze() (the default) - model loaded once in
+              the master, workers forked afterwards
+- per-worker: no preload - every worker imports asgi.py and unpickles its
+              own model and preprocessor
+
+After a short prediction load it reports RSS and PSS per process; the PSS
+total is the real footprint of the pod.
+
+Run from the repository root with downloaded model artifacts:
+    python benchmarks/bench_prefork_memory.py --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from MLProject.serving.process_memory import child_pids, format_report, memory_report
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RECORD = {"City": "Delhi", "Date": "2020-01-01", "PM2.5": "120", "PM10": "200", "NO": "10", "NO2": "40", "NOx": "30",
+          "NH3": "20", "CO": "1.2", "SO2": "10", "O3": "30", "Benzene": "2", "Toluene": "5", "Xylene": "1"}
+
+
+def start_server(preload: bool, workers: int, port: int) -> subprocess.Popen:
+    config = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False)
+    config.write(f"exec(open({str(REPO_ROOT / 'gunicorn.conf.py')!r}).read())\n"
+                 f"bind = '127.0.0.1:{port}'\nworkers = {workers}\npreload_app = {preload}\n")
+    if not preload:
+        config.write("def when_ready(server):\n    pass\n")
+    config.close()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+    return subprocess.Popen(["gunicorn", "-c", config.name, "asgi:app"], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(server: subprocess.Popen, workers: int, port: int, timeout_s: float = 120):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            if len(child_pids(server.pid)) == workers:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("server did not become ready")
+
+
+def send_load(port: int, n_requests: int):
+    body = json.dumps([RECORD] * 64).encode()
+    for _ in range(n_requests):
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/v1/predict/batch", data=body,
+                                         headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request).read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--requests", type=int, default=200, help="batch requests sent before measuring")
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, preload in (("shared", True), ("per-worker", False)):
+        server = start_server(preload, args.workers, args.port)
+        try:
+            wait_until_ready(server, args.workers, args.port)
+            send_load(args.port, args.requests)
+            time.sleep(1)
+            rows = memory_report(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        results[mode] = rows
+        print(f"\n{mode} ({args.workers} workers):\n{format_report(rows)}")
+
+    shared_total, per_worker_total = results["shared"][-1]["pss"], results["per-worker"][-1]["pss"]
+    print(f"\nTotal PSS: shared {shared_total / 2**20:.0f} MB vs per-worker {per_worker_total / 2**20:.0f} MB "
+          f"({1 - shared_total / per_worker_total:.0%} saved)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
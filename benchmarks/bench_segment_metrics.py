@@ -0,0 +1,90 @@
+"""
+Model evaluation with bootstrap confidence intervals per City, Month and AQI
+bucket: the vectorized MLProject.utils.segment_metrics against a plain loop
+that resamples with replacement and calls the sklearn metrics per resample
+and segment. Runs on the full history (every row with an AQI), with
+synthetic predictions (the actual AQI plus noise), so no trained model is
+needed. The point estimates must match sklearn.
+
+Run from the repository root after data ingestion:
+    python benchmarks/bench_segment_metrics.py
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from MLProject.utils.common import get_aqi_buckets
+from MLProject.utils.date_features import date_features
+from MLProject.utils.segment_metrics import segment_metrics
+
+
+def loop_bootstrap(actual, predicted, segments, n_resamples: int, seed: int = 42):
+    '''The straightforward version: one sklearn call per resample, segment and metric.'''
+    rng = np.random.default_rng(seed)
+    for values in segments.values():
+        for label in np.unique(values):
+            rows = np.flatnonzero(values == label)
+            for _ in range(n_resamples):
+                sample = rng.choice(rows, len(rows))
+                np.sqrt(mean_squared_error(actual[sample], predicted[sample]))
+                mean_absolute_error(actual[sample], predicted[sample])
+                if len(sample) > 1:
+                    r2_score(actual[sample], predicted[sample])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="artifacts/data_ingestion/city_day.csv")
+    parser.add_argument("--resamples", type=int, default=1000)
+    parser.add_argument("--loop-resamples", type=int, default=10,
+                        help="resamples actually run by the loop version; its time is extrapolated to --resamples")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, usecols=["City", "Date", "AQI"]).dropna(subset=["AQI"])
+    actual = data["AQI"].to_numpy(dtype=np.float64)
+    predicted = np.clip(actual * np.random.default_rng(0).lognormal(0, 0.15, len(actual)), 0, None)
+    actual_buckets = get_aqi_buckets(actual)
+    segments = {
+        "City": data["City"].to_numpy().astype(str),
+        "Month": date_features(data["Date"].to_numpy())["Month"],
+        "AQI_Bucket": actual_buckets,
+    }
+
+    start = time.perf_counter()
+    result = segment_metrics(actual, predicted, segments, n_resamples=args.resamples, n_jobs=args.n_jobs,
+                             actual_buckets=actual_buckets, predicted_buckets=get_aqi_buckets(np.round(predicted, 2)))
+    vectorized_s = time.perf_counter() - start
+
+    for name, values in segments.items():
+        for label, entry in result["segments"][name].items():
+            rows = values.astype(str) == label
+            expected = (np.sqrt(mean_squared_error(actual[rows], predicted[rows])), mean_absolute_error(actual[rows], predicted[rows]))
+            if not np.allclose((entry["rmse"], entry["mae"]), expected):
+                raise AssertionError(f"{name}={label}: {entry} differs from sklearn {expected}")
+    print(f"Parity OK: point estimates of {sum(map(len, result['segments'].values()))} segments match sklearn.")
+
+    start = time.perf_counter()
+    loop_bootstrap(actual, predicted, segments, args.loop_resamples)
+    loop_s = (time.perf_counter() - start) * args.resamples / args.loop_resamples
+
+    results = {
+        "rows": len(actual),
+        "segments": sum(map(len, result["segments"].values())),
+        "resamples": args.resamples,
+        "vectorized_s": round(vectorized_s, 3),
+        "loop_s_extrapolated": round(loop_s, 1),
+        "speedup": round(loop_s / vectorized_s, 1),
+    }
+    print(f"{results['rows']} rows, {results['segments']} segments, {args.resamples} resamples: "
+          f"vectorized {vectorized_s:.2f}s, sklearn loop ~{loop_s:.0f}s (x{results['speedup']})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
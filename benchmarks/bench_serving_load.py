@@ -0,0 +1,455 @@
+"""
+Load test of the serving API: latency percentiles, throughput and error
+rate of a locally started server (Flask app.py or the ASGI app under
+gunicorn) or of one already running (--url).
+
+Traffic is either synthetic - valid readings, boundary readings (exactly at
+the POLLUTANT_CONSTRAINTS and date limits) and invalid ones (just out of
+range, non-numeric, bad or missing dates) in the --mix proportions - or
+replayed from a JSONL file (--replay): one record per line, a {"record": ...}
+object, or the structured log lines with a "payload" field that the apps
+write for sampled requests (serving.log_payload_sample_rate). The expected
+answer of every record (predicted or rejected with 422) comes from the
+server's own validate_record.
+
+Two load models, each run for --duration seconds per level after a warm-up:
+- closed loop (--concurrency 1,8,32): N clients send back to back
+- open loop (--rate 50,200): requests are sent on a fixed (or Poisson)
+  schedule regardless of how fast the server answers. Latency is measured
+  from the scheduled send time, so a saturated server shows up as growing
+  latency instead of silently lowering the offered load.
+
+Errors are transport failures, 5xx answers and answers that do not match
+the expectation (a valid record rejected or an invalid one predicted). The
+JSON report (--output) holds the git commit and the served model version,
+so runs can be compared across commits and models with --compare.
+
+Run from the repository root with downloaded model artifacts:
+    python benchmarks/bench_serving_load.py --server asgi --concurrency 1,8,32 --rate 100,400 --output load.json
+    python benchmarks/bench_serving_load.py --server asgi --concurrency 8 --compare load.json --max-regression 0.2
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from MLProject.constants import MAX_DATE, MIN_DATE, POLLUTANT_CONSTRAINTS
+from MLProject.serving.request_handling import validate_record
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CITIES = ("Ahmedabad", "Aizawl", "Amaravati", "Amritsar", "Bengaluru", "Bhopal", "Brajrajnagar", "Chandigarh",
+          "Chennai", "Coimbatore", "Delhi", "Ernakulam", "Gandhinagar", "Gurugram", "Guwahati", "Hyderabad", "Jaipur",
+          "Jorapokhar", "Kochi", "Kolkata", "Lucknow", "Mumbai", "Nagpur", "Patna", "Shillong", "Thiruvananthapuram",
+          "Visakhapatnam")
+ENDPOINTS = {"v1_predict": "/v1/predict", "v1_predict_batch": "/v1/predict/batch", "predict_form": "/predict"}
+
+
+# --- Traffic -----------------------------------------------------------------
+
+def random_date(rng: np.random.Generator) -> str:
+    return (MIN_DATE + timedelta(days=int(rng.integers(0, (MAX_DATE - MIN_DATE).days + 1)))).isoformat()
+
+
+def valid_record(rng: np.random.Generator) -> Dict[str, Any]:
+    record = {"City": str(rng.choice(CITIES)), "Date": random_date(rng)}
+    for pollutant, limits in POLLUTANT_CONSTRAINTS.items():
+        if rng.random() < 0.1:
+            record[pollutant] = "" # missing readings are allowed and imputed
+        else:
+            record[pollutant] = str(round(float(rng.uniform(limits["min"], limits["max"])), 2))
+    return record
+
+
+def boundary_record(rng: np.random.Generator) -> Dict[str, Any]:
+    record = valid_record(rng)
+    record["Date"] = str(rng.choice([MIN_DATE.isoformat(), MAX_DATE.isoformat(), record["Date"]]))
+    for pollutant, limits in POLLUTANT_CONSTRAINTS.items():
+        record[pollutant] = str(limits[str(rng.choice(["min", "max"]))])
+    return record
+
+
+def invalid_record(rng: np.random.Generator) -> Dict[str, Any]:
+    record = valid_record(rng)
+    pollutant = str(rng.choice(list(POLLUTANT_CONSTRAINTS)))
+    limits = POLLUTANT_CONSTRAINTS[pollutant]
+    problem = int(rng.integers(0, 6))
+    if problem == 0:
+        record[pollutant] = str(limits["max"] + 0.01)
+    elif problem == 1:
+        record[pollutant] = str(limits["min"] - 0.01)
+    elif problem == 2:
+        record[pollutant] = "n/a"
+    elif problem == 3:
+        record["Date"] = (MAX_DATE + timedelta(days=1)).isoformat()
+    elif problem == 4:
+        record["Date"] = "01/02/2019"
+    else:
+        record.pop("Date")
+    return record
+
+
+GENERATORS = {"valid": valid_record, "boundary": boundary_record, "invalid": invalid_record}
+
+
+def synthetic_records(mix: Dict[str, float], n: int, seed: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(list(mix), size=n, p=np.array(list(mix.values())) / sum(mix.values()))
+    return [{"kind": str(kind), "record": GENERATORS[kind](rng)} for kind in kinds]
+
+
+def replayed_records(path: Path) -> List[Dict[str, Any]]:
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            record = entry.get("record", entry.get("payload")) if isinstance(entry, dict) else None
+            if record is None and isinstance(entry, dict) and "message" not in entry:
+                record = entry # a bare reading
+            if isinstance(record, dict):
+                records.append({"kind": "replayed", "record": record})
+    if not records:
+        raise ValueError(f"No records found in {path}")
+    return records
+
+
+def build_requests(records: List[Dict[str, Any]], endpoint: str, batch_size: int) -> List[Dict[str, Any]]:
+    '''Encodes the records once up front, with the status code and outcome each request must get.'''
+    requests = []
+    if endpoint == "v1_predict_batch":
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            requests.append({"kind": "batch", "body": json.dumps([item["record"] for item in batch]).encode(),
+                             "content_type": "application/json", "expected": 200})
+        return requests
+    for item in records:
+        valid = not validate_record(item["record"])
+        if endpoint == "predict_form": # answers with an HTML page either way
+            body, content_type, expected = urllib.parse.urlencode(item["record"]).encode(), "application/x-www-form-urlencoded", 200
+        else:
+            body, content_type, expected = json.dumps(item["record"]).encode(), "application/json", 200 if valid else 422
+        requests.append({"kind": item["kind"], "body": body, "content_type": content_type, "expected": expected})
+    return requests
+
+
+# --- Load generation ---------------------------------------------------------
+
+class Client:
+    '''
+    One keep-alive connection; reconnects after a transport error. A request on
+    a reused connection that the server has meanwhile closed (idle keep-alive
+    timeout) is retried once on a fresh connection, as a browser or HTTP client
+    library would, instead of counting as an error.
+    '''
+
+    def __init__(self, url: str, timeout_s: float):
+        parsed = urllib.parse.urlsplit(url)
+        self.host, self.port, self.prefix, self.timeout_s = parsed.hostname, parsed.port or 80, parsed.path.rstrip("/"), timeout_s
+        self.connection = None
+
+    def send(self, path: str, request: Dict[str, Any]) -> Optional[int]:
+        for _ in range(2):
+            reused, responded = self.connection is not None, False
+            try:
+                if self.connection is None:
+                    self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout_s)
+                self.connection.request("POST", self.prefix + path, body=request["body"],
+                                        headers={"Content-Type": request["content_type"]})
+                response = self.connection.getresponse()
+                responded = True
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException) as e:
+                if self.connection is not None:
+                    self.connection.close()
+                self.connection = None
+                # Closed by the server while idle: nothing was answered, so the request is safe to resend
+                stale = isinstance(e, (BrokenPipeError, ConnectionResetError, http.client.RemoteDisconnected))
+                if not (reused and stale and not responded):
+                    return None
+        return None
+
+
+def _record(results: list, request: Dict[str, Any], status: Optional[int], latency_s: float, lag_s: float = 0.0):
+    results.append((request["kind"], status, request["expected"], latency_s, lag_s)) # list.append is thread-safe
+
+
+def closed_loop(url: str, path: str, requests: List[Dict[str, Any]], concurrency: int, duration_s: float,
+                timeout_s: float) -> list:
+    results, counter = [], itertools.count()
+    deadline = time.perf_counter() + duration_s
+
+    def run_client():
+        client = Client(url, timeout_s)
+        while time.perf_counter() < deadline:
+            request = requests[next(counter) % len(requests)]
+            start = time.perf_counter()
+            status = client.send(path, request)
+            _record(results, request, status, time.perf_counter() - start)
+
+    threads = [threading.Thread(target=run_client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def open_loop(url: str, path: str, requests: List[Dict[str, Any]], rate: float, duration_s: float,
+              timeout_s: float, max_connections: int, poisson: bool, seed: int) -> list:
+    results, scheduled = [], queue.Queue()
+    rng = np.random.default_rng(seed)
+    n = int(rate * duration_s)
+    gaps = rng.exponential(1 / rate, n) if poisson else np.full(n, 1 / rate)
+    offsets = np.cumsum(gaps) - gaps[0]
+
+    def run_client():
+        client = Client(url, timeout_s)
+        while True:
+            item = scheduled.get()
+            if item is None:
+                return
+            due, request = item
+            lag = time.perf_counter() - due # > 0 when every connection was busy at the due time
+            status = client.send(path, request)
+            # From the scheduled time, not the send time: waiting for a free connection counts
+            _record(results, request, status, time.perf_counter() - due, lag)
+
+    threads = [threading.Thread(target=run_client, daemon=True) for _ in range(max_connections)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    for i, offset in enumerate(offsets):
+        due = start + offset
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        scheduled.put((due, requests[i % len(requests)]))
+    for _ in threads:
+        scheduled.put(None)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def latency_summary(latencies_s) -> Dict[str, Optional[float]]:
+    if len(latencies_s) == 0:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ms = np.asarray(latencies_s) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "max": round(float(ms.max()), 3), "mean": round(float(ms.mean()), 3)}
+
+
+def summarize(results: list, wall_s: float) -> Dict[str, Any]:
+    kinds = np.array([r[0] for r in results])
+    statuses = [r[1] for r in results]
+    errors = np.array([status is None or status >= 500 or status != expected for _, status, expected, _, _ in results])
+    latencies = np.array([r[3] for r in results])
+    status_counts: Dict[str, int] = {}
+    for status in statuses:
+        key = str(status) if status is not None else "transport_error"
+        status_counts[key] = status_counts.get(key, 0) + 1
+    summary = {
+        "requests": len(results),
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(results) / wall_s, 1) if wall_s > 0 else None,
+        "error_rate": round(float(errors.mean()), 5) if len(results) else None,
+        "status_counts": status_counts,
+        "latency_ms": latency_summary(latencies),
+        "by_kind": {},
+    }
+    for kind in sorted(set(kinds)):
+        mask = kinds == kind
+        summary["by_kind"][kind] = {"requests": int(mask.sum()), "error_rate": round(float(errors[mask].mean()), 5),
+                                    "latency_ms": latency_summary(latencies[mask])}
+    lags = np.array([r[4] for r in results])
+    if lags.any():
+        summary["late_send_share"] = round(float((lags > 0.01).mean()), 5) # sent > 10 ms after schedule
+    return summary
+
+
+# --- Server ------------------------------------------------------------------
+
+def start_server(kind: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+    if kind == "flask":
+        command = [sys.executable, "-c", f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        config = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False)
+        config.write(f"exec(open({str(REPO_ROOT / 'gunicorn.conf.py')!r}).read())\nbind = '127.0.0.1:{port}'\n"
+                     + (f"workers = {workers}\n" if workers else ""))
+        config.close()
+        command = ["gunicorn", "-c", config.name, "asgi:app"]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(url: str, server: Optional[subprocess.Popen], timeout_s: float = 120):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError("The server exited during startup")
+        try:
+            urllib.request.urlopen(f"{url}/metrics", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"{url} did not become ready")
+
+
+def served_model_version(url: str) -> Optional[str]:
+    try:
+        metrics = urllib.request.urlopen(f"{url}/metrics", timeout=5).read().decode()
+    except OSError:
+        return None
+    match = re.search(r'aqi_model_info\{model_version="([^"]+)"\} 1(\.0)?$', metrics, re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+# --- Reporting -----------------------------------------------------------------
+
+def run_key(run: Dict[str, Any]) -> str:
+    return f"{run['mode']} {run['level']}"
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: Optional[float]) -> bool:
+    '''Prints the change of every run against the baseline run at the same level; False if one regressed too much.'''
+    ok = True
+    baseline_runs = {run_key(run): run for run in baseline["runs"]}
+    print(f"\nAgainst {baseline.get('commit', '?')[:12]} (model {baseline.get('model_version')}):")
+    for run in results["runs"]:
+        before = baseline_runs.get(run_key(run))
+        if before is None:
+            continue
+        changes = {}
+        for metric in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][metric], run["latency_ms"][metric]
+            changes[metric] = (new - old) / old if old and new is not None else None
+        old, new = before["throughput_rps"], run["throughput_rps"]
+        changes["throughput"] = (new - old) / old if old and new is not None else None
+        print(f"  {run_key(run):>16}: " + ", ".join(f"{metric} {change:+.1%}" for metric, change in changes.items() if change is not None)
+              + f", error rate {before['error_rate']} -> {run['error_rate']}")
+        if max_regression is not None:
+            worse = [changes["p95"] or 0, changes["p99"] or 0, -(changes["throughput"] or 0)]
+            if max(worse) > max_regression or (run["error_rate"] or 0) > (before["error_rate"] or 0):
+                ok = False
+    return ok
+
+
+def parse_levels(text: Optional[str], cast) -> list:
+    return [cast(level) for level in text.split(",")] if text else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=("asgi", "flask", "none"), default="asgi",
+                        help="server to start on --port; none = load an already running --url")
+    parser.add_argument("--url", default=None, help="base URL of a running server (implies --server none)")
+    parser.add_argument("--port", type=int, default=8096)
+    parser.add_argument("--workers", type=int, default=0, help="gunicorn workers for --server asgi; 0 = serving.workers")
+    parser.add_argument("--endpoint", choices=list(ENDPOINTS), default="v1_predict")
+    parser.add_argument("--batch-size", type=int, default=64, help="records per request for v1_predict_batch")
+    parser.add_argument("--mix", default="valid=0.8,boundary=0.1,invalid=0.1", help="synthetic traffic mix")
+    parser.add_argument("--replay", type=Path, default=None, help="JSONL of recorded requests instead of synthetic traffic")
+    parser.add_argument("--records", type=int, default=5000, help="distinct synthetic records, cycled through")
+    parser.add_argument("--concurrency", default=None, help="closed-loop levels, e.g. 1,8,32")
+    parser.add_argument("--rate", default=None, help="open-loop levels in requests/s, e.g. 50,200")
+    parser.add_argument("--arrivals", choices=("uniform", "poisson"), default="poisson", help="open-loop arrival process")
+    parser.add_argument("--max-connections", type=int, default=64, help="open-loop client connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of closed-loop load before the first level")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier --output to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="with --compare: exit 1 if p95/p99 rise or throughput drops by more than this share, or errors rise")
+    args = parser.parse_args()
+
+    concurrency_levels, rates = parse_levels(args.concurrency, int), parse_levels(args.rate, float)
+    if not concurrency_levels and not rates:
+        concurrency_levels = [1, 8]
+
+    if args.replay:
+        records = replayed_records(args.replay)
+    else:
+        mix = {kind: float(share) for kind, share in (part.split("=") for part in args.mix.split(","))}
+        records = synthetic_records(mix, args.records, args.seed)
+    requests = build_requests(records, args.endpoint, args.batch_size)
+    path = ENDPOINTS[args.endpoint]
+
+    url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    server = start_server(args.server, args.port, args.workers) if args.server != "none" and not args.url else None
+    try:
+        wait_until_ready(url, server)
+        if args.warmup > 0:
+            closed_loop(url, path, requests, max(concurrency_levels or [8]), args.warmup, args.timeout)
+
+        results = {
+            **git_commit(),
+            "model_version": served_model_version(url),
+            "server": "external" if server is None else args.server,
+            "endpoint": args.endpoint,
+            "traffic": str(args.replay) if args.replay else args.mix,
+            "distinct_requests": len(requests),
+            "started_at": time.time(),
+            "runs": [],
+        }
+        levels = [("closed", level) for level in concurrency_levels] + [("open", level) for level in rates]
+        for mode, level in levels:
+            start = time.perf_counter()
+            if mode == "closed":
+                run_results = closed_loop(url, path, requests, level, args.duration, args.timeout)
+            else:
+                run_results = open_loop(url, path, requests, level, args.duration, args.timeout,
+                                        args.max_connections, args.arrivals == "poisson", args.seed)
+            run = {"mode": mode, "level": level, **summarize(run_results, time.perf_counter() - start)}
+            results["runs"].append(run)
+            latency = run["latency_ms"]
+            print(f"{mode:>6} {'concurrency' if mode == 'closed' else 'rate'} {level:>6}: {run['throughput_rps']} req/s, "
+                  f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+                  f"errors {run['error_rate'] or 0:.2%} {run['status_counts']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            print(f"Regression beyond {args.max_regression:.0%} against {args.compare}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
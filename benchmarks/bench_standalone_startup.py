@@ -0,0 +1,141 @@
+"""
+Worker startup cost of the two ways to serve the trained model:
+
+- joblib:     PredictionPipeline - unpickles the ColumnTransformer and the
+              CatBoostRegressor (imports pandas, sklearn, joblib, catboost)
+- standalone: StandaloneModel - compiled preprocessing parameters (.npz) and
+              the CatBoost JSON export evaluated with NumPy only
+
+Each mode runs in a fresh interpreter and reports import time, artifact load
+time, first prediction, steady-state latency for 1 and 64 rows, RSS and the
+heavy modules that ended up imported. Both modes must return the same AQI.
+
+Run from the repository root with downloaded model artifacts; the standalone
+export is created from the downloaded joblib model if it does not exist yet:
+    python benchmarks/bench_standalone_startup.py
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+MODES = ("joblib", "standalone")
+HEAVY_MODULES = ("pandas", "sklearn", "scipy", "joblib", "catboost", "mlflow")
+RECORD = {"City": "Delhi", "Date": "2020-01-01", "PM2.5": "120", "PM10": "200", "NO": "10", "NO2": "40", "NOx": "30",
+          "NH3": "20", "CO": "1.2", "SO2": "10", "O3": "30", "Benzene": "2", "Toluene": "5", "Xylene": "1"}
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, export_dir: Path, repeats: int) -> dict:
+    start = time.perf_counter()
+    if mode == "joblib":
+        from MLProject.pipeline.prediction import PredictionPipeline
+        import_s = time.perf_counter() - start
+        pipeline = PredictionPipeline()
+    else:
+        from MLProject.serving.standalone_model import StandaloneModel
+        import_s = time.perf_counter() - start
+        pipeline = StandaloneModel.load(export_dir)
+    load_s = time.perf_counter() - start - import_s
+
+    first = pipeline.predict_records([RECORD])
+    first_prediction_s = time.perf_counter() - start - import_s - load_s
+
+    latencies = {}
+    for n_rows in (1, 64):
+        records = [RECORD] * n_rows
+        timings = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            pipeline.predict_records(records)
+            timings.append(time.perf_counter() - t0)
+        latencies[n_rows] = sorted(timings)[len(timings) // 2]
+
+    return {
+        "mode": mode,
+        "import_s": import_s,
+        "load_s": load_s,
+        "first_prediction_s": first_prediction_s,
+        "latency_1_row_ms": latencies[1] * 1000,
+        "latency_64_rows_ms": latencies[64] * 1000,
+        "rss_mb": current_rss_mb(),
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+        "prediction": float(first[0]),
+    }
+
+
+def ensure_export(export_dir: Path, artifacts_dir: Path, target_log_transformed: bool):
+    '''Builds the standalone export from the downloaded joblib artifacts (as ModelTrainer.train would).'''
+    if (export_dir / "export_manifest.json").exists():
+        return
+    import tempfile
+    import joblib
+    from MLProject.utils.compiled_preprocessor import compile_preprocessor
+    from MLProject.utils.model_export import export_standalone_model
+
+    model = joblib.load(artifacts_dir / "model" / "model.joblib")
+    preprocessor = joblib.load(artifacts_dir / "preprocessor" / "preprocessor.joblib")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        compiled_path = Path(temp_dir) / "compiled_preprocessor.npz"
+        compile_preprocessor(preprocessor).save(compiled_path)
+        export_standalone_model(model, export_dir, compiled_path, target_log_transformed, formats=["cbm", "json"])
+
+
+def main():
+    artifacts_dir = Path(os.environ.get("ML_ARTIFACTS_DIR", "artifacts/downloaded_model"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--export-dir", type=Path, default=artifacts_dir / "standalone")
+    parser.add_argument("--repeats", type=int, default=200, help="predictions per latency measurement")
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS) # internal: child process
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.export_dir, args.repeats)))
+        return
+
+    from MLProject.config.configuration import ConfigurationManager
+
+    ensure_export(args.export_dir, artifacts_dir, ConfigurationManager().get_model_trainer_config().target_log_transformed)
+
+    results = []
+    for mode in MODES:
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--export-dir", str(args.export_dir), "--repeats", str(args.repeats)],
+            check=True, capture_output=True, text=True, env=os.environ.copy(),
+        )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result["process_total_s"] = time.perf_counter() - start
+        results.append(result)
+
+    print(f"{'mode':<12}{'import s':>10}{'load s':>9}{'first ms':>10}{'1 row ms':>10}{'64 rows ms':>12}"
+          f"{'RSS MB':>9}{'process s':>11}  heavy modules")
+    for r in results:
+        print(f"{r['mode']:<12}{r['import_s']:>10.2f}{r['load_s']:>9.3f}{r['first_prediction_s'] * 1000:>10.2f}"
+              f"{r['latency_1_row_ms']:>10.3f}{r['latency_64_rows_ms']:>12.3f}{r['rss_mb']:>9.0f}"
+              f"{r['process_total_s']:>11.2f}  {', '.join(r['heavy_modules']) or '-'}")
+    if abs(results[0]["prediction"] - results[1]["prediction"]) > 1e-6:
+        print(f"WARNING: predictions differ ({results[0]['prediction']} vs {results[1]['prediction']})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,37 @@
+"""
+Fetches the model artifacts of one MLflow run into ML_ARTIFACTS_DIR in the
+layout the serving code reads:
+
+    <ML_ARTIFACTS_DIR>/model/model.joblib
+    <ML_ARTIFACTS_DIR>/preprocessor/preprocessor.joblib
+    <ML_ARTIFACTS_DIR>/standalone/...          (optional pickle-free export)
+
+Files go through a local content-addressed cache (ML_ARTIFACTS_CACHE_DIR):
+blobs are stored by sha256 and a small manifest per run ID lists them, so a
+container restarted on the same node with the same MLFLOW_RUN_ID copies
+verified files from the cache without contacting MLflow (or importing it).
+On a cache miss the artifact folders are downloaded concurrently, checked
+against the sizes MLflow lists and, when the run has one, against the
+checksums.json written at training time.
+
+MLFLOW_TRACKING_URI may also point at a local file store (file:./mlruns or a
+plain path) for offline testing; it is then read directly from disk.
+
+Configured through environment variables (set by entrypoint.sh); every one
+can be overridden on the command line, see --help.
+"""
+import argparse
+import hashlib
+import json
 import os
-import mlflow
-from mlflow.artifacts import download_artifacts
-from pathlib import Path
-import logging
+import shutil
 import sys # Import sys for sys.exit()
-import shutil # Import shutil for shutil.rmtree()
+import tempfile
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote, urlparse
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -12,132 +39,341 @@ logger = logging.getLogger(__name__)
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format='[%(asctime)s]: %(levelname)s: %(message)s')
 
-def download_artifacts_from_mlflow():
+# MLflow artifact folder -> file the serving code loads from it
+REQUIRED_ARTIFACTS = {"model": "model.joblib", "preprocessor": "preprocessor.joblib"}
+# Runs trained before the pickle-free export was added do not have it, so its absence is not fatal
+OPTIONAL_ARTIFACTS = {"standalone": None}
+CHECKSUMS_ARTIFACT = "checksums.json"
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "aqi_ml_artifacts"
+
+
+class IntegrityError(Exception):
+    pass
+
+
+def sha256_of(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_store_root(tracking_uri: str):
+    '''Directory of a file-based MLflow store, or None for a tracking server.'''
+    if not tracking_uri:
+        return None
+    parsed = urlparse(tracking_uri)
+    if parsed.scheme == "file":
+        return Path(unquote(parsed.netloc + parsed.path))
+    if os.path.isdir(tracking_uri): # plain path to an mlruns directory
+        return Path(tracking_uri)
+    return None
+
+
+class LocalStoreSource:
+    """Reads run artifacts straight from a file-based MLflow store (mlruns/<experiment>/<run>/artifacts)."""
+
+    def __init__(self, root: Path, run_id: str):
+        self.run_id = run_id
+        matches = sorted(Path(root).glob(f"*/{run_id}"))
+        if not matches:
+            raise FileNotFoundError(f"Run {run_id} not found in local MLflow store {root}")
+        self.artifacts_root = matches[0] / "artifacts"
+        meta_path = matches[0] / "meta.yaml"
+        if meta_path.exists():
+            # meta.yaml records where the run's artifacts were written (may be outside the store)
+            for line in meta_path.read_text().splitlines():
+                if line.startswith("artifact_uri:"):
+                    candidate = local_store_root(line.split(":", 1)[1].strip().strip("'\""))
+                    if candidate is not None and candidate.exists():
+                        self.artifacts_root = candidate
+        self.description = f"local MLflow store {root}"
+
+    def list_files(self, artifact_path: str) -> dict:
+        folder = self.artifacts_root / artifact_path
+        if not folder.exists():
+            raise FileNotFoundError(f"Artifact '{artifact_path}' not found for run {self.run_id}")
+        if folder.is_file():
+            return {folder.name: folder.stat().st_size}
+        return {path.relative_to(folder).as_posix(): path.stat().st_size for path in folder.rglob("*") if path.is_file()}
+
+    def download(self, artifact_path: str, dst_dir: Path) -> Path:
+        source = self.artifacts_root / artifact_path
+        target = Path(dst_dir) / artifact_path
+        if source.is_file():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+        else:
+            shutil.copytree(source, target)
+        return target
+
+
+class MlflowSource:
+    """Downloads run artifacts from an MLflow tracking server (mlflow is only imported here)."""
+
+    def __init__(self, tracking_uri: str, run_id: str):
+        import mlflow
+
+        self.run_id = run_id
+        self.tracking_uri = tracking_uri or mlflow.get_tracking_uri()
+        self.description = f"MLflow tracking server {self.tracking_uri}"
+
+    def list_files(self, artifact_path: str, prefix: str = "") -> dict:
+        from mlflow.artifacts import list_artifacts
+
+        files = {}
+        for info in list_artifacts(run_id=self.run_id, artifact_path=artifact_path, tracking_uri=self.tracking_uri):
+            name = info.path.rsplit("/", 1)[-1]
+            if info.is_dir:
+                files.update(self.list_files(info.path, prefix=f"{prefix}{name}/"))
+            else:
+                files[f"{prefix}{name}"] = info.file_size
+        if not files and not prefix:
+            raise FileNotFoundError(f"Artifact '{artifact_path}' not found for run {self.run_id}")
+        return files
+
+    def download(self, artifact_path: str, dst_dir: Path) -> Path:
+        from mlflow.artifacts import download_artifacts
+
+        return Path(download_artifacts(run_id=self.run_id, artifact_path=artifact_path,
+                                       dst_path=str(dst_dir), tracking_uri=self.tracking_uri))
+
+
+class ArtifactCache:
+    """
+    Content-addressed store: blobs/<sha256> holds file contents, runs/<run id>.json
+    maps each artifact folder of a run to {relative path: {sha256, size}}.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.blobs_dir = self.root / "blobs"
+        self.runs_dir = self.root / "runs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blobs_dir / sha256
+
+    def manifest_path(self, run_id: str) -> Path:
+        return self.runs_dir / f"{run_id}.json"
+
+    def load_manifest(self, run_id: str, verify: bool = True):
+        '''The run's manifest if every blob it lists is present (and intact when verify), else None.'''
+        path = self.manifest_path(run_id)
+        if not path.exists():
+            return None
+        manifest = json.loads(path.read_text())
+        for files in manifest["artifacts"].values():
+            for relative_path, entry in files.items():
+                blob = self.blob_path(entry["sha256"])
+                if not blob.exists() or blob.stat().st_size != entry["size"] or (verify and sha256_of(blob) != entry["sha256"]):
+                    logger.warning(f"Cached blob for {relative_path} of run {run_id} is missing or corrupt; downloading again.")
+                    blob.unlink(missing_ok=True)
+                    path.unlink(missing_ok=True)
+                    return None
+        os.utime(path) # recency for prune()
+        return manifest
+
+    def add_file(self, path: Path) -> dict:
+        sha256 = sha256_of(path)
+        blob = self.blob_path(sha256)
+        if not blob.exists():
+            # Same filesystem as the staging directory, so the rename is atomic
+            os.replace(path, blob)
+        return {"sha256": sha256, "size": blob.stat().st_size}
+
+    def save_manifest(self, run_id: str, manifest: dict):
+        with tempfile.NamedTemporaryFile("w", dir=self.runs_dir, suffix=".tmp", delete=False) as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(f.name, self.manifest_path(run_id))
+
+    def prune(self, keep_runs: int):
+        '''Keeps the manifests of the keep_runs most recently used runs and the blobs they reference.'''
+        manifests = sorted(self.runs_dir.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for stale in manifests[keep_runs:]:
+            stale.unlink(missing_ok=True)
+        referenced = set()
+        for path in manifests[:keep_runs]:
+            for files in json.loads(path.read_text())["artifacts"].values():
+                referenced.update(entry["sha256"] for entry in files.values())
+        for blob in self.blobs_dir.iterdir():
+            if blob.name not in referenced:
+                blob.unlink(missing_ok=True)
+
+
+def fetch_artifact(source, artifact_path: str, staging_dir: Path, cache: ArtifactCache, checksums: dict) -> dict:
+    '''Downloads one artifact folder, verifies it and moves its files into the cache.'''
+    expected_sizes = source.list_files(artifact_path)
+    start = time.perf_counter()
+    downloaded = source.download(artifact_path, staging_dir)
+    files = {}
+    for relative_path, expected_size in expected_sizes.items():
+        path = downloaded / relative_path if downloaded.is_dir() else downloaded
+        if not path.exists():
+            raise IntegrityError(f"{artifact_path}/{relative_path} is missing from the download")
+        if path.stat().st_size != expected_size:
+            raise IntegrityError(f"{artifact_path}/{relative_path}: {path.stat().st_size} bytes downloaded, {expected_size} expected")
+        files[relative_path] = cache.add_file(path)
+        expected_sha256 = checksums.get(f"{artifact_path}/{relative_path}")
+        if expected_sha256 is not None and files[relative_path]["sha256"] != expected_sha256:
+            cache.blob_path(files[relative_path]["sha256"]).unlink(missing_ok=True)
+            raise IntegrityError(f"{artifact_path}/{relative_path}: sha256 does not match {CHECKSUMS_ARTIFACT}")
+    logger.info(f"Downloaded '{artifact_path}' ({len(files)} files, {sum(f['size'] for f in files.values())} bytes) "
+                f"in {time.perf_counter() - start:.2f}s")
+    return files
+
+
+def fetch_run(source, run_id: str, cache: ArtifactCache, max_workers: int) -> dict:
+    '''Downloads every artifact folder of the run concurrently into the cache and records the run manifest.'''
+    staging_dir = Path(tempfile.mkdtemp(prefix="download-", dir=cache.root))
+    try:
+        checksums = {}
+        try:
+            checksums_file = source.download(CHECKSUMS_ARTIFACT, staging_dir)
+            checksums = json.loads(Path(checksums_file).read_text())
+        except Exception as e:
+            logger.warning(f"No {CHECKSUMS_ARTIFACT} for run {run_id}, verifying file sizes only: {e}")
+
+        artifact_paths = list(REQUIRED_ARTIFACTS) + list(OPTIONAL_ARTIFACTS)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact-download") as pool:
+            futures = {artifact_path: pool.submit(fetch_artifact, source, artifact_path, staging_dir, cache, checksums)
+                       for artifact_path in artifact_paths}
+        artifacts = {}
+        for artifact_path, future in futures.items():
+            try:
+                artifacts[artifact_path] = future.result()
+            except Exception as e:
+                if artifact_path in REQUIRED_ARTIFACTS:
+                    raise e
+                logger.warning(f"No '{artifact_path}' artifact for run {run_id}: {e}")
+
+        manifest = {"run_id": run_id, "source": source.description, "fetched_at": time.time(), "artifacts": artifacts}
+        cache.save_manifest(run_id, manifest)
+        return manifest
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def _link_or_copy(blob: Path, target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(blob, target)
+    except OSError:
+        shutil.copy2(blob, target) # different filesystem (e.g. cache on a mounted volume)
+
+
+def materialize(manifest: dict, cache: ArtifactCache, ml_artifacts_dir: Path):
+    '''
+    Places the run's files into ml_artifacts_dir. Each artifact folder is built
+    in a hidden staging directory and then renamed into place, so a serving
+    process watching the directory never sees a half-written folder.
+    Folders of the previous run that the new one does not have are removed.
+    '''
+    ml_artifacts_dir.mkdir(parents=True, exist_ok=True)
+    for artifact_path in list(REQUIRED_ARTIFACTS) + list(OPTIONAL_ARTIFACTS):
+        target_dir = ml_artifacts_dir / artifact_path
+        files = manifest["artifacts"].get(artifact_path)
+        if files is None:
+            if target_dir.exists():
+                shutil.rmtree(target_dir)
+                logger.info(f"Removed '{artifact_path}' left over from a previous run.")
+            continue
+
+        staging = ml_artifacts_dir / f".staging-{artifact_path}"
+        shutil.rmtree(staging, ignore_errors=True)
+        for relative_path, entry in files.items():
+            _link_or_copy(cache.blob_path(entry["sha256"]), staging / relative_path)
+
+        expected_file = REQUIRED_ARTIFACTS.get(artifact_path)
+        if expected_file and not (staging / expected_file).exists():
+            # Fallback for runs that logged the file under another name
+            candidates = sorted(path for path in staging.rglob("*") if path.suffix in (".pkl", ".joblib"))
+            if not candidates:
+                raise IntegrityError(f"No {expected_file} (or other .pkl/.joblib) in the '{artifact_path}' artifact")
+            os.link(candidates[0], staging / expected_file)
+
+        retired = ml_artifacts_dir / f".retired-{artifact_path}"
+        shutil.rmtree(retired, ignore_errors=True)
+        if target_dir.exists():
+            os.replace(target_dir, retired)
+        os.replace(staging, target_dir)
+        shutil.rmtree(retired, ignore_errors=True)
+    logger.info(f"Artifacts of run {manifest['run_id']} placed in {ml_artifacts_dir}: {sorted(manifest['artifacts'])}")
+
+
+def download_artifacts_from_mlflow(run_id: str = None, ml_artifacts_dir: str = None, cache_dir: str = None,
+                                   tracking_uri: str = None, max_workers: int = 4, keep_runs: int = 5,
+                                   verify_cache: bool = True) -> bool:
     """
     Downloads model and preprocessor artifacts from a specified MLflow run ID
-    to a local directory, relying on environment variables for configuration.
+    to a local directory (through the artifact cache). Arguments default to
+    the MLFLOW_RUN_ID, ML_ARTIFACTS_DIR, ML_ARTIFACTS_CACHE_DIR and
+    MLFLOW_TRACKING_URI environment variables.
     """
-    mlflow_run_id = os.environ.get("MLFLOW_RUN_ID")
-    ml_artifacts_dir = os.environ.get("ML_ARTIFACTS_DIR")
-    
-    # Ensure environment variables are set
-    if not mlflow_run_id:
+    run_id = run_id or os.environ.get("MLFLOW_RUN_ID")
+    ml_artifacts_dir = ml_artifacts_dir or os.environ.get("ML_ARTIFACTS_DIR", "").strip()
+    cache_dir = cache_dir or os.environ.get("ML_ARTIFACTS_CACHE_DIR") or DEFAULT_CACHE_DIR
+    tracking_uri = tracking_uri or os.environ.get("MLFLOW_TRACKING_URI")
+
+    # Ensure the run and target directory are set
+    if not run_id:
         logger.error("MLFLOW_RUN_ID environment variable not set. Cannot download artifacts.")
         return False
     if not ml_artifacts_dir:
         logger.error("ML_ARTIFACTS_DIR environment variable not set. Cannot download artifacts.")
         return False
 
-    # Clean and normalize the target directory path
     # Path().as_posix() converts to forward slashes for cross-platform compatibility
-    # .strip() removes any leading/trailing whitespace that could cause WinError 3
-    ml_artifacts_dir_clean = Path(ml_artifacts_dir).as_posix().strip()
-
-    logger.info(f"Starting artifact download for Run ID: {mlflow_run_id} to directory: {ml_artifacts_dir_clean}")
+    ml_artifacts_dir = Path(Path(ml_artifacts_dir).as_posix().strip())
+    start = time.perf_counter()
 
     try:
-        # Define the base temporary download location for MLflow artifacts
-        # MLflow downloads artifacts into a structure like <dst_path>/<artifact_path>/<files>
-        temp_mlflow_download_base_path = Path(ml_artifacts_dir_clean) / ".temp_mlflow_download"
-        
-        # Ensure the base temporary download directory exists
-        os.makedirs(temp_mlflow_download_base_path, exist_ok=True)
-        
-        logger.info(f"Attempting to download artifacts for MLflow Run ID: {mlflow_run_id} to {temp_mlflow_download_base_path}")
-
-        # --- Download Model Artifact ---
-        # artifact_path="model" means download the entire 'model' folder
-        downloaded_model_folder = download_artifacts(
-            run_id=mlflow_run_id,
-            artifact_path="model", # The artifact_path in MLflow UI for the model folder
-            dst_path=str(temp_mlflow_download_base_path), # Download 'model' folder into the temp_mlflow_download dir
-            tracking_uri=mlflow.get_tracking_uri()
-        )
-        logger.info(f"Model artifact downloaded to: {downloaded_model_folder}")
-
-        # Define final target path for the model.joblib
-        model_target_path = Path(ml_artifacts_dir_clean) / "model.joblib"
-        
-        # Move the actual model.joblib file from inside the downloaded 'model' folder
-        actual_model_file_in_download = Path(downloaded_model_folder) / "model.joblib" 
-        if not actual_model_file_in_download.exists():
-            # Fallback for older MLflow versions or different naming conventions if model.joblib isn't directly in 'model/'
-            for root, _, files in os.walk(downloaded_model_folder):
-                for f in files:
-                    if f.endswith((".pkl", ".joblib")): # Check for .pkl or .joblib extensions
-                        actual_model_file_in_download = Path(root) / f
-                        break
-                if actual_model_file_in_download.exists():
-                    break
-        
-        if actual_model_file_in_download.exists():
-            os.rename(str(actual_model_file_in_download), str(model_target_path))
-            logger.info(f"Model downloaded and saved to: {model_target_path}")
-        else:
-            logger.error("Could not find actual model file within the downloaded MLflow 'model' artifact.")
-            return False
-
-        # --- Download Preprocessor Artifact ---
-        # artifact_path="preprocessor" means download the entire 'preprocessor' folder
-        downloaded_preprocessor_folder = download_artifacts(
-            run_id=mlflow_run_id,
-            artifact_path="preprocessor", # The artifact_path in MLflow UI for the preprocessor folder
-            dst_path=str(temp_mlflow_download_base_path), # Download 'preprocessor' folder into the temp_mlflow_download dir
-            tracking_uri=mlflow.get_tracking_uri()
-        )
-        logger.info(f"Preprocessor artifact downloaded to: {downloaded_preprocessor_folder}")
-
-        # Define final target path for the preprocessor.joblib
-        preprocessor_target_path = Path(ml_artifacts_dir_clean) / "preprocessor.joblib"
-
-        # Move the actual preprocessor.joblib file from inside the downloaded 'preprocessor' folder
-        actual_preprocessor_file_in_download = Path(downloaded_preprocessor_folder) / "preprocessor.joblib" 
-        if not actual_preprocessor_file_in_download.exists():
-            # Fallback if preprocessor.joblib isn't directly in 'preprocessor/'
-            for root, _, files in os.walk(downloaded_preprocessor_folder):
-                for f in files:
-                    if f.endswith((".pkl", ".joblib")):
-                        actual_preprocessor_file_in_download = Path(root) / f
-                        break
-                if actual_preprocessor_file_in_download.exists():
-                    break
-        
-        if actual_preprocessor_file_in_download.exists():
-            os.rename(str(actual_preprocessor_file_in_download), str(preprocessor_target_path))
-            logger.info(f"Preprocessor downloaded and saved to: {preprocessor_target_path}")
+        cache = ArtifactCache(cache_dir)
+        manifest = cache.load_manifest(run_id, verify=verify_cache)
+        if manifest is not None:
+            logger.info(f"Artifacts of run {run_id} found in cache {cache.root}.")
         else:
-            logger.error(f"Preprocessor artifact not found at expected path: {preprocessor_src_path}") # Corrected var name
-            return False
-
-        # --- Clean up temporary download directory ---
-        # This will remove the .temp_mlflow_download folder and all its contents
-        if temp_mlflow_download_base_path.exists() and temp_mlflow_download_base_path.is_dir():
-            shutil.rmtree(temp_mlflow_download_base_path) 
-            logger.info(f"Cleaned up temporary download directory: {temp_mlflow_download_base_path}")
+            store_root = local_store_root(tracking_uri)
+            source = LocalStoreSource(store_root, run_id) if store_root is not None else MlflowSource(tracking_uri, run_id)
+            logger.info(f"Fetching artifacts of run {run_id} from {source.description} into cache {cache.root}")
+            manifest = fetch_run(source, run_id, cache, max_workers)
 
+        materialize(manifest, cache, ml_artifacts_dir)
+        cache.prune(keep_runs)
+        logger.info(f"Artifacts for run {run_id} ready in {time.perf_counter() - start:.2f}s.")
         return True
 
     except Exception as e:
         logger.error(f"Error downloading MLflow artifacts: {e}", exc_info=True)
         return False
 
+
 if __name__ == "__main__":
     # The run_id and artifact_base_dir are passed as environment variables by entrypoint.sh
-    run_id = os.environ.get("MLFLOW_RUN_ID") 
-    artifact_base_dir = os.environ.get("ML_ARTIFACTS_DIR", "").strip()
-    
-    # MLflow tracking URI and credentials are also read from environment variables by MLflow client
-    # No need to explicitly read them here, just ensure they are set in the environment.
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-id", default=os.environ.get("MLFLOW_RUN_ID"))
+    parser.add_argument("--dst", default=os.environ.get("ML_ARTIFACTS_DIR", "").strip(), help="ML_ARTIFACTS_DIR")
+    parser.add_argument("--cache-dir", default=os.environ.get("ML_ARTIFACTS_CACHE_DIR") or str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--tracking-uri", default=os.environ.get("MLFLOW_TRACKING_URI"),
+                        help="tracking server URI, or file:<path> / <path> of a local MLflow store")
+    parser.add_argument("--max-workers", type=int, default=4, help="artifact folders downloaded concurrently")
+    parser.add_argument("--keep-runs", type=int, default=5, help="runs kept in the cache")
+    parser.add_argument("--no-verify-cache", action="store_true", help="trust cached blobs without re-hashing them")
+    args = parser.parse_args()
 
-    if not run_id:
+    if not args.run_id:
         logger.error("MLFLOW_RUN_ID environment variable not set. Cannot download artifacts.")
-        sys.exit(1) 
-    if not artifact_base_dir:
+        sys.exit(1)
+    if not args.dst:
         logger.error("ML_ARTIFACTS_DIR environment variable not set. Cannot download artifacts.")
         sys.exit(1)
 
-    # Call the main download function
-    success = download_artifacts_from_mlflow()
+    # MLflow tracking credentials are read from the environment by the MLflow client
+    success = download_artifacts_from_mlflow(args.run_id, args.dst, args.cache_dir, args.tracking_uri,
+                                             args.max_workers, args.keep_runs, not args.no_verify_cache)
     if not success:
         logger.error("Failed to download ML artifacts. Exiting.")
         sys.exit(1)
@@ -13,6 +13,7 @@ export MLFLOW_TRACKING_USERNAME
 export MLFLOW_TRACKING_PASSWORD
 export MLFLOW_RUN_ID
 export ML_ARTIFACTS_DIR
+export ML_ARTIFACTS_CACHE_DIR # optional: mount a volume here so restarts with the same run ID skip the download
 
 echo "MLFLOW_TRACKING_URI: ${MLFLOW_TRACKING_URI}"
 echo "MLFLOW_RUN_ID: ${MLFLOW_RUN_ID}"
@@ -30,14 +31,14 @@ else
     echo "MLflow artifacts downloaded successfully."
 fi
 
-# Confirm downloaded files exist before starting the app
+# Confirm downloaded files exist before starting the app (same layout PredictionPipeline reads)
 echo "Verifying downloaded model and preprocessor files..."
-if [ ! -f "${ML_ARTIFACTS_DIR}/model.joblib" ]; then
-    echo "ERROR: model.joblib not found after download!"
+if [ ! -f "${ML_ARTIFACTS_DIR}/model/model.joblib" ]; then
+    echo "ERROR: model/model.joblib not found after download!"
     exit 1
 fi
-if [ ! -f "${ML_ARTIFACTS_DIR}/preprocessor.joblib" ]; then
-    echo "ERROR: preprocessor.joblib not found after download!"
+if [ ! -f "${ML_ARTIFACTS_DIR}/preprocessor/preprocessor.joblib" ]; then
+    echo "ERROR: preprocessor/preprocessor.joblib not found after download!"
     exit 1
 fi
 echo "Model and preprocessor files confirmed."
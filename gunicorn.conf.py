@@ -0,0 +1,36 @@
+# Production ASGI serving: gunicorn manages N uvicorn worker processes.
+#   gunicorn -c gunicorn.conf.py asgi:app
+# The Flask app can be preforked the same way with sync workers:
+#   gunicorn -c gunicorn.conf.py -k sync app:app
+# Per-process RSS/PSS of a running server: python -m MLProject.serving.process_memory <master pid>
+import gc
+import multiprocessing
+from MLProject.config.configuration import ConfigurationManager
+from MLProject.serving.process_memory import read_process_memory
+
+serving_config = ConfigurationManager().get_serving_config()
+
+bind = f"{serving_config.host}:{serving_config.port}"
+workers = serving_config.workers or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import asgi.py (and load the model) once in the master before forking the workers
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+
+
+def when_ready(server):
+    # Runs in the master after asgi.py (model + preprocessor) was preloaded and before any worker
+    # is forked. Freezing moves every object allocated so far into a permanent generation that the
+    # cyclic GC never scans, so the workers' collections don't write to (and un-share) those pages.
+    gc.freeze()
+    memory = read_process_memory()
+    server.log.info(f"gc.freeze(): {gc.get_freeze_count()} objects frozen in the master"
+                    + (f", RSS {memory['rss'] / 2**20:.0f} MB" if memory else ""))
+
+
+def post_worker_init(worker):
+    memory = read_process_memory()
+    if memory:
+        worker.log.info(f"Worker {worker.pid} ready: RSS {memory['rss'] / 2**20:.0f} MB, "
+                        f"PSS {memory['pss'] / 2**20:.0f} MB, private {(memory['private_clean'] + memory['private_dirty']) / 2**20:.0f} MB")
@@ -1,4 +1,6 @@
 from MLProject import logger
+from MLProject.config.configuration import ConfigurationManager
+from MLProject.utils.run_profiler import profiler
 from MLProject.pipeline.data_ingestion_01 import DataIngestionTrainingPipeline
 from MLProject.pipeline.data_validation_02 import DataValidationTrainingPipeline
 from MLProject.pipeline.data_transformation_03 import DataTransformationTrainingPipeline
@@ -6,53 +8,26 @@ from MLProject.pipeline.model_trainer_04 import ModelTrainerTrainingPipeline
 from MLProject.pipeline.model_evaluation_05 import ModelEvaluationTrainingPipeline
 
 
-STAGE_NAME = "Data Ingestion Stage"
-try:
-    logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
-    obj = DataIngestionTrainingPipeline()
-    obj.main()
-    logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
-
-STAGE_NAME = "Data Validation Stage"
-try:
-    logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
-    obj = DataValidationTrainingPipeline()
-    obj.main()
-    logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
-
-STAGE_NAME = "Data Transformation Stage"
-try:
-    logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
-    obj = DataTransformationTrainingPipeline()
-    obj.main()
-    logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
-
-STAGE_NAME = "Model Trainer Stage"
-try:
-    logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
-    obj = ModelTrainerTrainingPipeline()
-    obj.main()
-    logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
-
+STAGES = [
+    ("Data Ingestion Stage", DataIngestionTrainingPipeline),
+    ("Data Validation Stage", DataValidationTrainingPipeline),
+    ("Data Transformation Stage", DataTransformationTrainingPipeline),
+    ("Model Trainer Stage", ModelTrainerTrainingPipeline),
+    ("Model Evaluation Stage", ModelEvaluationTrainingPipeline),
+]
 
-STAGE_NAME = "Model Evaluation Stage"
+run_report_config = ConfigurationManager().get_run_report_config()
 try:
-    logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
-    obj = ModelEvaluationTrainingPipeline()
-    obj.main()
-    logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
\ No newline at end of file
+    for STAGE_NAME, stage_pipeline in STAGES:
+        try:
+            logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
+            with profiler.step(STAGE_NAME):
+                obj = stage_pipeline()
+                obj.main()
+            logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+        except Exception as e:
+            logger.exception(e)
+            raise e
+finally:
+    # Also written when a stage fails, so a slow or broken run can be inspected
+    profiler.finish(run_report_config.report_file, run_report_config.log_to_mlflow)
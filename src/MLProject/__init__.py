@@ -1,21 +1,13 @@
 import os
-import sys
 import logging
-
-logging_str = "[%(asctime)s: %(levelname)s: %(module)s: %(message)s]"
+from MLProject.utils.structured_logging import configure_logging
 
 log_dir = "logs"
 log_filepath = os.path.join(log_dir, "running_logs.log")
 os.makedirs(log_dir, exist_ok=True)
 
-logging.basicConfig(
-    level = logging.INFO,
-    format = logging_str,
-
-    handlers=[
-        logging.FileHandler(log_filepath),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# JSON lines to the log file and text to stdout, written by a background thread
+# so logging never blocks a request on disk I/O (see utils/structured_logging.py)
+log_writer = configure_logging(log_filepath)
 
 logger = logging.getLogger("MLProjectLogger")
@@ -3,6 +3,7 @@ import urllib.request as request
 import zipfile
 from MLProject import logger
 from MLProject.utils.common import get_size
+from MLProject.utils.run_profiler import profiler
 from pathlib import Path
 from MLProject.entity.config_entity import DataIngestionConfig
 
@@ -12,10 +13,11 @@ class DataIngestion:
 
     def download_file(self):
         if not os.path.exists(self.config.local_data_file):
-            filename, headers = request.urlretrieve(
-                url = self.config.source_URL,
-                filename = self.config.local_data_file
-            )
+            with profiler.step("download"):
+                filename, headers = request.urlretrieve(
+                    url = self.config.source_URL,
+                    filename = self.config.local_data_file
+                )
             logger.info(f"{filename} downloaded! with following info: \n{headers}")
         else:
             logger.info(f"File already exists of size: {get_size(Path(self.config.local_data_file))}")
@@ -31,5 +33,5 @@ class DataIngestion:
         unzip_path = self.config.unzip_dir
         os.makedirs(unzip_path, exist_ok=True)
 
-        with zipfile.ZipFile(self.config.local_data_file, 'r') as zip_ref:
+        with profiler.step("extract_zip"), zipfile.ZipFile(self.config.local_data_file, 'r') as zip_ref:
             zip_ref.extractall(unzip_path)
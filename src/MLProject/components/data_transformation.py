@@ -1,5 +1,7 @@
 import os
+import time
 import pandas as pd
+from pathlib import Path
 import numpy as np
 import joblib
 from sklearn.model_selection import train_test_split
@@ -9,8 +11,18 @@ from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from MLProject import logger
 from MLProject.entity.config_entity import DataTransformationConfig
+from MLProject.utils.compiled_preprocessor import compile_preprocessor
+from MLProject.utils.date_features import date_features
+from MLProject.utils.artifact_io import FrameWriter, save_frame
+from MLProject.utils.run_profiler import profiler
+from MLProject.utils.streaming_stats import ColumnHistograms, RunningMoments, iter_csv_chunks, schema_dtypes
 
 class DataTransformation:
+    # Rows used to fit the ColumnTransformer structure in streaming mode
+    STREAMING_SAMPLE_SIZE = 20000
+    # Outputs a successful run may lack: the preprocessor is not always compilable
+    OPTIONAL_OUTPUTS = ("compiled_preprocessor",)
+
     def __init__(self, config: DataTransformationConfig):
         self.config = config
 
@@ -57,10 +69,16 @@ class DataTransformation:
             ('scaler', StandardScaler())
         ])
 
-        categorical_pipeline = Pipeline(steps=[
-            ('imputer', SimpleImputer(strategy='most_frequent')),
-            ('onehot', OneHotEncoder(handle_unknown='ignore'))
-        ])
+        if self.config.categorical_encoding == 'native':
+            # CatBoost handles City itself; only impute so the raw category string reaches the model
+            categorical_pipeline = Pipeline(steps=[
+                ('imputer', SimpleImputer(strategy='most_frequent'))
+            ])
+        else:
+            categorical_pipeline = Pipeline(steps=[
+                ('imputer', SimpleImputer(strategy='most_frequent')),
+                ('onehot', OneHotEncoder(handle_unknown='ignore'))
+            ])
 
         # Separate numerical_cols into those that need log transform and those that don't
         num_cols_to_log = [col for col in numerical_cols if col in columns_to_log_transform]
@@ -71,6 +89,7 @@ class DataTransformation:
         logger.info(f"CT Config - num_cols_to_log (derived for CT): {num_cols_to_log}")
         logger.info(f"CT Config - num_cols_no_log (derived for CT): {num_cols_no_log}")
         logger.info(f"CT Config - categorical_cols (from params): {categorical_cols}")
+        logger.info(f"CT Config - categorical_encoding (from params): {self.config.categorical_encoding}")
 
         preprocessor = ColumnTransformer(
             transformers=[
@@ -83,41 +102,124 @@ class DataTransformation:
         
         return preprocessor
 
-    def initiate_data_transformation(self):
+    def cache_params(self) -> dict:
+        '''
+        Everything besides the raw CSV content that changes the outputs of this stage.
+        Used as part of the stage cache key.
+        '''
+        return {
+            "target_column": self.config.target_column,
+            "numerical_cols": list(self.config.numerical_cols),
+            "categorical_cols": list(self.config.categorical_cols),
+            "columns_to_log_transform": list(self.config.columns_to_log_transform),
+            "columns_to_drop_after_feature_eng": list(self.config.columns_to_drop_after_feature_eng),
+            "test_size": self.config.test_size,
+            "categorical_encoding": self.config.categorical_encoding,
+            "streaming": self.config.streaming,
+            # read_csv dtypes of the streaming path; the in-memory path lets pandas infer them
+            "schema_dtypes": schema_dtypes(self.config.all_schema) if self.config.streaming else None,
+            "artifact_format": self.config.artifact_format,
+            "export_csv": self.config.export_csv,
+        }
+
+    def output_paths(self) -> dict:
+        '''Files produced by this stage, keyed by their name inside a stage cache entry.'''
+        outputs = {
+            "train": self.config.train_data_path,
+            "test": self.config.test_data_path,
+            "preprocessor": Path(self.config.root_dir) / self.config.preprocessor_name,
+            "compiled_preprocessor": Path(self.config.root_dir) / self.config.compiled_preprocessor_name,
+        }
+        if self.config.export_csv:
+            outputs["train_csv"] = Path(self.config.train_data_path).with_suffix(".csv")
+            outputs["test_csv"] = Path(self.config.test_data_path).with_suffix(".csv")
+        return outputs
+
+    def prepare_features(self, data: pd.DataFrame):
+        '''
+        Row filtering and date feature engineering shared by the in-memory and the
+        streaming paths. Returns the feature frame X (before the ColumnTransformer)
+        and the target y.
+        '''
+        # 1. Drop rows with missing values in 'AQI' and 'AQI_Bucket'
+        data = data.dropna(subset=['AQI', 'AQI_Bucket'])
+
+        # Define target column
+        target_column_name = self.config.target_column
+
+        # Feature Engineering for Date
+        if 'Date' in data.columns:
+            data = data.copy()
+            # Same calendar lookup the serving pipelines use
+            for column, values in date_features(data['Date'].to_numpy()).items():
+                data[column] = values
+
+        # Create X and y AFTER date engineering, but BEFORE any other drops or log transforms
+        # that ColumnTransformer should handle.
+        X = data.drop(columns=[target_column_name, 'AQI_Bucket'], errors='ignore')
+        y = data[target_column_name]
+
+        # 'Xylene' and the original 'Date' column.
+        columns_to_drop_from_X = [col for col in self.config.columns_to_drop_after_feature_eng if col != 'AQI_Bucket']
+
+        # Drop specified columns from X (like Xylene, and the original Date if listed)
+        X = X.drop(columns=[col for col in columns_to_drop_from_X if col in X.columns], errors='ignore')
+        return X, y
+
+    def to_output_frame(self, preprocessor_obj: ColumnTransformer, X_transformed, y: pd.Series, index) -> pd.DataFrame:
+        '''Wraps ColumnTransformer output and the (log-transformed) target into the frame written as an artifact.'''
         try:
-            data = pd.read_csv(self.config.data_path)
-            logger.info(f"Original data loaded. Shape: {data.shape}")
+            # This works for sklearn >= 1.0
+            transformed_feature_names = preprocessor_obj.get_feature_names_out()
+        except AttributeError:
+            transformed_feature_names = [f'feature_{i}' for i in range(X_transformed.shape[1])]
 
-            # 1. Drop rows with missing values in 'AQI' and 'AQI_Bucket'
-            initial_rows = data.shape[0]
-            data.dropna(subset=['AQI', 'AQI_Bucket'], inplace=True)
-            logger.info(f"Dropped {initial_rows - data.shape[0]} rows with NaN in AQI or AQI_Bucket. New shape: {data.shape}")
+        X_df = pd.DataFrame(X_transformed, columns=transformed_feature_names, index=index)
 
-            # Define target column
-            target_column_name = self.config.target_column
-            
-            # Feature Engineering for Date 
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'], errors='coerce')
-                data['Year'] = data['Date'].dt.year
-                data['Month'] = data['Date'].dt.month
-                data['Day'] = data['Date'].dt.day
-                data['DayOfWeek'] = data['Date'].dt.dayofweek
-                data['IsWeekend'] = data['DayOfWeek'].isin([5, 6]).astype(int)
-                logger.info("Date features engineered.")
+        if self.config.categorical_encoding == 'native':
+            # The CT output is an object matrix when categories pass through; restore float columns
+            categorical_feature_names = list(X_df.columns[preprocessor_obj.output_indices_['cat']])
+            numeric_feature_names = [col for col in X_df.columns if col not in categorical_feature_names]
+            X_df = X_df.astype({col: 'float64' for col in numeric_feature_names})
 
-            
-            # Create X and y AFTER date engineering, but BEFORE any other drops or log transforms
-            # that ColumnTransformer should handle.
-            X = data.drop(columns=[target_column_name, 'AQI_Bucket'], errors='ignore') 
-            y = data[target_column_name]
+        if self.config.target_column in self.config.columns_to_log_transform:
+            y = np.log1p(y)
 
-            # 'Xylene' and the original 'Date' column.
-            columns_to_drop_from_X = [col for col in self.config.columns_to_drop_after_feature_eng if col != 'AQI_Bucket']
+        return pd.concat([X_df, y.to_frame(name=self.config.target_column)], axis=1) # explicit name
 
-            # Drop specified columns from X (like Xylene, and the original Date if listed)
-            X = X.drop(columns=[col for col in columns_to_drop_from_X if col in X.columns], errors='ignore')
-            logger.info(f"Columns explicitly dropped from features (X) before CT: {columns_to_drop_from_X}. New X shape: {X.shape}")
+    def save_preprocessor(self, preprocessor_obj: ColumnTransformer, parity_data: pd.DataFrame):
+        # Save the preprocessor object
+        with profiler.step("save_preprocessor"):
+            joblib.dump(preprocessor_obj, os.path.join(self.config.root_dir, self.config.preprocessor_name))
+        logger.info(f"Preprocessor object saved to {self.config.root_dir}/{self.config.preprocessor_name}")
+
+        # Compile the fitted preprocessor into flat NumPy parameters for the serving fast path.
+        # compile_preprocessor checks bit-identical parity against the ColumnTransformer on parity_data.
+        # A file from an earlier run must not survive a failed compile next to this preprocessor.
+        compiled_preprocessor_path = Path(self.config.root_dir) / self.config.compiled_preprocessor_name
+        compiled_preprocessor_path.unlink(missing_ok=True)
+        try:
+            with profiler.step("compile_preprocessor", rows=len(parity_data)):
+                compiled_preprocessor = compile_preprocessor(preprocessor_obj, data=parity_data)
+            compiled_preprocessor.save(compiled_preprocessor_path)
+            logger.info(f"Compiled preprocessor saved to {self.config.root_dir}/{self.config.compiled_preprocessor_name}")
+        except (ValueError, AssertionError) as e:
+            logger.warning(f"Preprocessor could not be compiled, serving will use the ColumnTransformer: {e}")
+
+    def initiate_data_transformation(self):
+        if self.config.streaming:
+            return self.initiate_streaming_data_transformation()
+
+        try:
+            with profiler.step("read_csv") as step:
+                data = pd.read_csv(self.config.data_path)
+                step.rows = len(data)
+            logger.info(f"Original data loaded. Shape: {data.shape}")
+
+            target_column_name = self.config.target_column
+            with profiler.step("prepare_features", rows=len(data)):
+                X, y = self.prepare_features(data)
+            logger.info(f"Dropped rows with NaN in AQI or AQI_Bucket and engineered date features. X shape: {X.shape}")
 
             # Now perform train-test split on the prepared X and y
             X_train, X_test, y_train, y_test = train_test_split(
@@ -131,52 +233,194 @@ class DataTransformation:
             logger.info(f"X_train columns before ColumnTransformer fit_transform: {list(X_train.columns)}")                                                                              
 
             # Fit and transform X_train
-            X_train_transformed = preprocessor_obj.fit_transform(X_train)
+            with profiler.step("fit_transform", rows=len(X_train)):
+                X_train_transformed = preprocessor_obj.fit_transform(X_train)
 
-            X_test_transformed = preprocessor_obj.transform(X_test)
+            with profiler.step("transform", rows=len(X_test)):
+                X_test_transformed = preprocessor_obj.transform(X_test)
             logger.info("ColumnTransformer fitted on X_train and transformed X_train, X_test.")
 
+            train_df = self.to_output_frame(preprocessor_obj, X_train_transformed, y_train, X_train.index)
+            test_df = self.to_output_frame(preprocessor_obj, X_test_transformed, y_test, X_test.index)
             if self.config.target_column in self.config.columns_to_log_transform:
-                logger.info(f"Applying log1p transformation to target column '{self.config.target_column}' in training and test sets.")
-                y_train = np.log1p(y_train)
-                y_test = np.log1p(y_test)
-
-            else:
-                logger.info(f"Target column '{self.config.target_column}' is NOT configured for log transformation.")
-
-            try:
-                # This works for sklearn >= 1.0
-                transformed_feature_names = preprocessor_obj.get_feature_names_out()
-            except AttributeError:
-                logger.warning("get_feature_names_out() not available. Transformed DataFrame column names might be generic.")
-                transformed_feature_names = [f'feature_{i}' for i in range(X_train_transformed.shape[1])]
-
-            # Convert transformed arrays back to DataFrames with proper column names
-            X_train_df = pd.DataFrame(X_train_transformed, columns=transformed_feature_names, index=X_train.index)
-            X_test_df = pd.DataFrame(X_test_transformed, columns=transformed_feature_names, index=X_test.index)
-
-            # Join X_train_df with y_train and X_test_df with y_test to create final train/test CSVs
-            # Ensure y_train/y_test are Series for concat. If they are already series, .to_frame() is fine.
-            train_df = pd.concat([X_train_df, y_train.to_frame(name=target_column_name)], axis=1) # explicit name
-            test_df = pd.concat([X_test_df, y_test.to_frame(name=target_column_name)], axis=1) # explicit name
+                logger.info(f"Applied log1p transformation to target column '{target_column_name}' in training and test sets.")
             
-            # Save the processed data
-            train_df.to_csv(self.config.train_data_path, index=False)
-            test_df.to_csv(self.config.test_data_path, index=False)
+            # Save the processed data in the configured binary format (CSV only as an optional export)
+            with profiler.step("save_frames", rows=len(train_df) + len(test_df)):
+                save_frame(train_df, self.config.train_data_path, self.config.artifact_format, export_csv=self.config.export_csv)
+                save_frame(test_df, self.config.test_data_path, self.config.artifact_format, export_csv=self.config.export_csv)
             logger.info(f"Transformed train data saved to {self.config.train_data_path}. Shape: {train_df.shape}")
             logger.info(f"Transformed test data saved to {self.config.test_data_path}. Shape: {test_df.shape}")
 
-            # Save the preprocessor object
-            joblib.dump(preprocessor_obj, os.path.join(self.config.root_dir, self.config.preprocessor_name))
-            logger.info(f"Preprocessor object saved to {self.config.root_dir}/{self.config.preprocessor_name}")
+            self.save_preprocessor(preprocessor_obj, parity_data=X_test)
 
             return (
                 X_train_transformed,
                 X_test_transformed,
-                y_train,
-                y_test
+                train_df[target_column_name],
+                test_df[target_column_name]
             )
 
         except Exception as e:
             logger.exception(f"An error occurred during data transformation: {e}")
-            raise e
\ No newline at end of file
+            raise e
+
+    def initiate_streaming_data_transformation(self):
+        '''
+        Chunked variant of initiate_data_transformation for CSVs that don't fit in
+        memory. Reads `chunk_size` rows at a time with the dtypes from schema.yaml
+        and makes three passes over the file:
+
+        1. split rows into train/test with a seeded RNG, count rows and categories,
+           and accumulate per-column moments of the values the scalers will see;
+        2. histogram the raw training values to get the imputer medians;
+        3. transform every chunk and append it to the train/test artifacts.
+
+        The ColumnTransformer is fitted on a bounded sample (which always contains
+        every category, so the one-hot layout matches the full data) and then its
+        imputer and scaler statistics are replaced by the ones computed over the
+        whole training set. Peak memory is bounded by the chunk and sample sizes.
+        Unlike the in-memory path, the split is a per-row Bernoulli draw rather than
+        train_test_split, so its row assignment differs.
+        '''
+        try:
+            dtypes = schema_dtypes(self.config.all_schema)
+            chunk_size = self.config.chunk_size
+            log_cols = [col for col in self.config.numerical_cols if col in self.config.columns_to_log_transform]
+            std_cols = [col for col in self.config.numerical_cols if col not in self.config.columns_to_log_transform]
+            numeric_cols = log_cols + std_cols
+            log_mask = np.array([col in log_cols for col in numeric_cols])
+            categorical_cols = list(self.config.categorical_cols)
+
+            def chunks_with_split():
+                split_rng = np.random.default_rng(42)
+                for chunk in iter_csv_chunks(self.config.data_path, chunk_size, dtype=dtypes):
+                    X, y = self.prepare_features(chunk)
+                    if len(X):
+                        yield X, y, split_rng.random(len(X)) < self.config.test_size
+
+            # Pass 1: counts, moments, categories and the structural sample
+            with profiler.step("streaming_pass_1") as step:
+                start = time.perf_counter()
+                sample_rng = np.random.default_rng(43)
+                raw_moments = RunningMoments(len(numeric_cols))
+                scaled_moments = RunningMoments(len(numeric_cols))
+                category_counts = {col: pd.Series(dtype='int64') for col in categorical_cols}
+                text_lengths = {col: 1 for col in categorical_cols}
+                first_category_rows, sample, sample_keys = [], None, None
+                n_train = n_test = 0
+                for X, _, is_test in chunks_with_split():
+                    X_train = X[~is_test]
+                    n_train += len(X_train)
+                    n_test += int(is_test.sum())
+                    for col in categorical_cols:
+                        lengths = X[col].dropna().astype(str).str.len()
+                        text_lengths[col] = max(text_lengths[col], int(lengths.max()) if len(lengths) else 1)
+                    if not len(X_train):
+                        continue
+
+                    values = X_train[numeric_cols].to_numpy(dtype=np.float64)
+                    raw_moments.update(values)
+                    with np.errstate(invalid='ignore'):
+                        scaled_moments.update(np.where(log_mask, np.log1p(values), values))
+
+                    for col in categorical_cols:
+                        counts = X_train[col].value_counts()
+                        unseen = X_train[X_train[col].isin(counts.index.difference(category_counts[col].index))]
+                        first_category_rows.append(unseen.drop_duplicates(subset=[col]))
+                        category_counts[col] = category_counts[col].add(counts, fill_value=0).astype('int64')
+
+                    # Bottom-k sampling: keep the rows with the smallest random keys seen so far
+                    keys = sample_rng.random(len(X_train))
+                    sample = X_train if sample is None else pd.concat([sample, X_train])
+                    sample_keys = keys if sample_keys is None else np.concatenate([sample_keys, keys])
+                    keep = np.argsort(sample_keys, kind='stable')[:self.STREAMING_SAMPLE_SIZE]
+                    sample, sample_keys = sample.iloc[keep], sample_keys[keep]
+                step.rows = n_train + n_test
+            if n_train == 0:
+                raise ValueError(f"No training rows left in {self.config.data_path} after dropping missing targets.")
+            logger.info(f"Streaming pass 1 done in {time.perf_counter() - start:.1f}s: {n_train} train rows, {n_test} test rows.")
+
+            empty_cols = [col for col, count in zip(numeric_cols, raw_moments.count) if count == 0]
+            if empty_cols:
+                raise ValueError(f"Numerical columns without any value in the training data: {empty_cols}")
+
+            # Pass 2: medians from histograms of the raw training values
+            with profiler.step("streaming_pass_2", rows=n_train + n_test):
+                start = time.perf_counter()
+                histograms = ColumnHistograms(raw_moments.min, raw_moments.max, raw_moments.integral)
+                for X, _, is_test in chunks_with_split():
+                    histograms.update(X.loc[~is_test, numeric_cols].to_numpy(dtype=np.float64))
+            medians = histograms.medians()
+            logger.info(f"Streaming pass 2 done in {time.perf_counter() - start:.1f}s: imputer medians {dict(zip(numeric_cols, medians))}")
+
+            # Scaler statistics over imputed values: missing entries all take the (transformed) median
+            fill = np.where(log_mask, np.log1p(medians), medians)
+            n_present = scaled_moments.count
+            n_missing = n_train - n_present
+            mean = (n_present * scaled_moments.mean + n_missing * fill) / n_train
+            var = (scaled_moments.m2 + n_present * (scaled_moments.mean - mean) ** 2 + n_missing * (fill - mean) ** 2) / n_train
+            scale = np.where(var > 0, np.sqrt(var), 1.0)
+
+            # Fit the ColumnTransformer structure on the sample, then install the full-data statistics
+            structure_sample = pd.concat(first_category_rows + [sample])
+            # A column that happens to be all-NaN in the sample would be dropped by SimpleImputer
+            sample_empty = [col for col in numeric_cols if structure_sample[col].isna().all()]
+            structure_sample.iloc[:1, [structure_sample.columns.get_loc(col) for col in sample_empty]] = \
+                [medians[numeric_cols.index(col)] for col in sample_empty]
+            preprocessor_obj = self.get_data_transformer_object()
+            with profiler.step("fit_structure_sample", rows=len(structure_sample)):
+                preprocessor_obj.fit(structure_sample)
+            for name, columns in (('num_log', log_cols), ('num_std', std_cols)):
+                if not columns:
+                    continue
+                positions = [numeric_cols.index(col) for col in columns]
+                pipeline = preprocessor_obj.named_transformers_[name]
+                pipeline.named_steps['imputer'].statistics_ = medians[positions]
+                scaler = pipeline.named_steps['scaler']
+                scaler.mean_, scaler.var_, scaler.scale_ = mean[positions], var[positions], scale[positions]
+                scaler.n_samples_seen_ = n_train
+            if categorical_cols:
+                cat_pipeline = preprocessor_obj.named_transformers_['cat']
+                # Ties resolve to the smallest value, like SimpleImputer(strategy='most_frequent')
+                cat_pipeline.named_steps['imputer'].statistics_ = np.array(
+                    [category_counts[col].sort_index().idxmax() for col in categorical_cols], dtype=object)
+                if 'onehot' in cat_pipeline.named_steps:
+                    for col, categories in zip(categorical_cols, cat_pipeline.named_steps['onehot'].categories_):
+                        if set(categories) != set(category_counts[col].index):
+                            raise ValueError(f"Structural sample is missing categories of '{col}'.")
+            logger.info(f"ColumnTransformer fitted on a {len(structure_sample)}-row sample with full-data statistics installed.")
+
+            # Pass 3: transform and append chunk by chunk
+            with profiler.step("streaming_pass_3", rows=n_train + n_test):
+                start = time.perf_counter()
+                output_columns = list(self.to_output_frame(
+                    preprocessor_obj, preprocessor_obj.transform(structure_sample.iloc[:1]),
+                    pd.Series([0.0], index=structure_sample.index[:1]), structure_sample.index[:1]).columns)
+                output_text_lengths = {}
+                if categorical_cols:
+                    cat_positions = range(len(output_columns) - 1)[preprocessor_obj.output_indices_['cat']]
+                    if self.config.categorical_encoding == 'native':
+                        output_text_lengths = {output_columns[pos]: text_lengths[col] for pos, col in zip(cat_positions, categorical_cols)}
+                writers = {
+                    False: FrameWriter(self.config.train_data_path, self.config.artifact_format, n_rows=n_train,
+                                       export_csv=self.config.export_csv, text_lengths=output_text_lengths),
+                    True: FrameWriter(self.config.test_data_path, self.config.artifact_format, n_rows=n_test,
+                                      export_csv=self.config.export_csv, text_lengths=output_text_lengths),
+                }
+                for X, y, is_test in chunks_with_split():
+                    for split, writer in writers.items():
+                        mask = is_test == split
+                        if mask.any():
+                            X_split = X[mask]
+                            writer.write(self.to_output_frame(preprocessor_obj, preprocessor_obj.transform(X_split), y[mask], X_split.index))
+                for writer in writers.values():
+                    writer.close()
+            logger.info(f"Streaming pass 3 done in {time.perf_counter() - start:.1f}s: transformed data saved to "
+                        f"{self.config.train_data_path} and {self.config.test_data_path}.")
+
+            self.save_preprocessor(preprocessor_obj, parity_data=structure_sample)
+
+        except Exception as e:
+            logger.exception(f"An error occurred during streaming data transformation: {e}")
+            raise e
@@ -1,70 +1,250 @@
+import io
 import os
+import json
+import hashlib
+import numpy as np
 import pandas as pd
+from pathlib import Path
 from MLProject import logger
+from MLProject.constants import POLLUTANT_CONSTRAINTS, MIN_DATE, MAX_DATE
 from MLProject.entity.config_entity import DataValidationConfig
+from MLProject.utils.common import get_file_hash, save_json
+from MLProject.utils.run_profiler import profiler
+from MLProject.utils.streaming_stats import HashingReader, RunningMoments, iter_csv_chunks, schema_dtypes
 from box import ConfigBox
 
+# Distinct values tracked per text column before the profile just reports "more than"
+MAX_TRACKED_CATEGORIES = 1000
+
+
+class DataProfile:
+    """
+    Accumulates a per-column profile chunk by chunk: declared vs. parsed dtype,
+    null counts, values that fail to parse, min/max/mean/std and the number of
+    values outside the physical ranges in POLLUTANT_CONSTRAINTS (or outside
+    MIN_DATE..MAX_DATE for Date). Every statistic is a vectorized operation
+    over the chunk, so the file is profiled in a single read.
+    """
+
+    def __init__(self, schema: dict, columns: list):
+        self.schema = {str(col): str(dtype) for col, dtype in schema.items() if col in columns}
+        self.numeric_cols = [col for col, dtype in self.schema.items() if dtype != "object"]
+        self.text_cols = [col for col, dtype in self.schema.items() if dtype == "object"]
+        self.n_rows = 0
+        self.null_counts = dict.fromkeys(self.schema, 0)
+        self.invalid_counts = dict.fromkeys(self.schema, 0)
+        self.invalid_examples = {col: [] for col in self.schema}
+        self.moments = RunningMoments(len(self.numeric_cols))
+        self.lower = np.array([POLLUTANT_CONSTRAINTS.get(col, {}).get("min", -np.inf) for col in self.numeric_cols])
+        self.upper = np.array([POLLUTANT_CONSTRAINTS.get(col, {}).get("max", np.inf) for col in self.numeric_cols])
+        self.below_min = np.zeros(len(self.numeric_cols), dtype=np.int64)
+        self.above_max = np.zeros(len(self.numeric_cols), dtype=np.int64)
+        self.categories = {col: set() for col in self.text_cols}
+        self.date_range = [None, None]
+        self.dates_out_of_range = 0
+
+    def _record_invalid(self, col: str, raw: pd.Series, parsed: pd.Series):
+        invalid = raw.notna() & parsed.isna()
+        n_invalid = int(invalid.sum())
+        if n_invalid:
+            self.invalid_counts[col] += n_invalid
+            examples = self.invalid_examples[col]
+            examples.extend(raw[invalid].astype(str).unique()[:5 - len(examples)].tolist())
+
+    def update(self, chunk: pd.DataFrame):
+        self.n_rows += len(chunk)
+        for col, count in chunk[list(self.schema)].isna().sum().items():
+            self.null_counts[col] += int(count)
+
+        numeric = chunk[self.numeric_cols]
+        for col in self.numeric_cols:
+            if not pd.api.types.is_numeric_dtype(numeric[col]):
+                parsed = pd.to_numeric(numeric[col], errors="coerce")
+                self._record_invalid(col, numeric[col], parsed)
+                numeric = numeric.assign(**{col: parsed})
+        values = numeric.to_numpy(dtype=np.float64)
+        self.moments.update(values)
+        self.below_min += (values < self.lower).sum(axis=0)
+        self.above_max += (values > self.upper).sum(axis=0)
+
+        for col in self.text_cols:
+            if col == "Date":
+                dates = pd.to_datetime(chunk[col], errors="coerce")
+                self._record_invalid(col, chunk[col], dates)
+                if dates.notna().any():
+                    low, high = dates.min().date(), dates.max().date()
+                    self.date_range[0] = low if self.date_range[0] is None else min(self.date_range[0], low)
+                    self.date_range[1] = high if self.date_range[1] is None else max(self.date_range[1], high)
+                    self.dates_out_of_range += int(((dates < pd.Timestamp(MIN_DATE)) | (dates > pd.Timestamp(MAX_DATE))).sum())
+            elif len(self.categories[col]) <= MAX_TRACKED_CATEGORIES:
+                self.categories[col].update(chunk[col].dropna().unique().tolist())
+
+    def to_dict(self) -> dict:
+        columns = {}
+        for col, dtype in self.schema.items():
+            n_null = self.null_counts[col]
+            columns[col] = {
+                "declared_dtype": dtype,
+                "null_count": n_null,
+                "null_rate": n_null / self.n_rows if self.n_rows else 0.0,
+                "invalid_count": self.invalid_counts[col],
+                "invalid_examples": self.invalid_examples[col],
+            }
+        for j, col in enumerate(self.numeric_cols):
+            count = int(self.moments.count[j])
+            n_out = int(self.below_min[j] + self.above_max[j])
+            columns[col].update({
+                "min": float(self.moments.min[j]) if count else None,
+                "max": float(self.moments.max[j]) if count else None,
+                "mean": float(self.moments.mean[j]) if count else None,
+                "std": float(np.sqrt(self.moments.m2[j] / count)) if count else None,
+                "range": [float(self.lower[j]), float(self.upper[j])] if col in POLLUTANT_CONSTRAINTS else None,
+                "below_min": int(self.below_min[j]),
+                "above_max": int(self.above_max[j]),
+                "out_of_range_rate": n_out / count if count else 0.0,
+            })
+        for col in self.text_cols:
+            if col == "Date":
+                columns[col].update({
+                    "min": str(self.date_range[0]) if self.date_range[0] else None,
+                    "max": str(self.date_range[1]) if self.date_range[1] else None,
+                    "range": [str(MIN_DATE), str(MAX_DATE)],
+                    "out_of_range_count": self.dates_out_of_range,
+                })
+            else:
+                n_unique = len(self.categories[col])
+                columns[col]["n_unique"] = n_unique if n_unique <= MAX_TRACKED_CATEGORIES else f">{MAX_TRACKED_CATEGORIES}"
+        return {"n_rows": self.n_rows, "columns": columns}
+
+
 class DataValidation:
     def __init__(self, config: DataValidationConfig):
         self.config = config
 
+    def validation_fingerprint(self) -> str:
+        '''Hash of everything besides the CSV content that affects the validation outcome.'''
+        material = {
+            "schema": dict(self.config.all_schema),
+            "pollutant_constraints": POLLUTANT_CONSTRAINTS,
+            "date_range": [str(MIN_DATE), str(MAX_DATE)],
+            "max_null_rate": self.config.max_null_rate,
+            "max_out_of_range_rate": self.config.max_out_of_range_rate,
+            "max_out_of_range_rate_by_column": self.config.max_out_of_range_rate_by_column,
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _cached_status(self, fingerprint: str):
+        '''
+        Returns the previous validation status when the CSV and the validation
+        settings are unchanged, else None. A size change is detected from stat
+        alone; otherwise the file is hashed, which is the only read needed.
+        '''
+        profile_path = Path(self.config.profile_file)
+        if not profile_path.exists() or not Path(self.config.STATUS_FILE).exists():
+            return None
+        with open(profile_path) as f:
+            previous = json.load(f)
+        if previous.get("fingerprint") != fingerprint or previous.get("size_bytes") != os.path.getsize(self.config.csv_file_path):
+            return None
+        if previous.get("sha256") != get_file_hash(Path(self.config.csv_file_path)):
+            return None
+        return previous["validation_status"]
+
+    def _write_status(self, validation_status: bool):
+        with open(self.config.STATUS_FILE, 'w') as f:
+            f.write(f"Validation status: {validation_status}")
+
     def validate_all_columns(self) -> bool:
         try:
             validation_status = True
-
-            data = pd.read_csv(self.config.csv_file_path)
-            logger.info(f"Data loaded from {self.config.csv_file_path}. Data columns: {list(data.columns)}")
-            
-            all_cols = set(data.columns)
-            logger.info(f"Set of columns from loaded data: {all_cols}") 
-
-            # Debugging the schema part
-            logger.info(f"Raw self.config.all_schema type: {type(self.config.all_schema)}") 
-            logger.info(f"Raw self.config.all_schema content: {self.config.all_schema}") 
+            errors, warnings = [], []
 
             if isinstance(self.config.all_schema, ConfigBox) or isinstance(self.config.all_schema, dict):
                 all_schema = set(self.config.all_schema.keys())
             else:
                 logger.error(f"self.config.all_schema is not a dict or ConfigBox: {type(self.config.all_schema)}")
                 validation_status = False
-                with open(self.config.STATUS_FILE, 'w') as f:
-                    f.write(f"Validation status: {validation_status}")
+                self._write_status(validation_status)
                 # Raising an error here stops further processing with an invalid schema
                 raise TypeError("Schema configuration is not in expected dictionary format.")
-            
-            logger.info(f"Set of columns from schema: {all_schema}") 
 
+            fingerprint = self.validation_fingerprint()
+            cached_status = self._cached_status(fingerprint)
+            if cached_status is not None:
+                self._write_status(cached_status)
+                logger.info(f"{self.config.csv_file_path} and validation settings unchanged since the last run "
+                            f"(profile {self.config.profile_file}); reusing validation status {cached_status}.")
+                return cached_status
+
+            # Only the header is needed for the column checks; the rows are streamed below
+            data_columns = list(pd.read_csv(self.config.csv_file_path, nrows=0).columns)
+            logger.info(f"Header read from {self.config.csv_file_path}. Data columns: {data_columns}")
+            all_cols = set(data_columns)
+            logger.info(f"Set of columns from schema: {all_schema}")
 
             # Check for missing columns in data compared to schema
             missing_in_data = all_schema - all_cols
             if missing_in_data:
-                logger.error(f"Validation Error: Columns missing in dataset (from schema): {missing_in_data}")
-                validation_status = False
-            
-            extra_in_data = all_cols - all_schema 
+                errors.append(f"Columns missing in dataset (from schema): {sorted(missing_in_data)}")
+
+            extra_in_data = all_cols - all_schema
             if extra_in_data:
-                logger.warning(f'Validation Warning: Extra columns found in dataset not in schema: {extra_in_data}')
-                # You might choose to set validation_status = False here if extra columns are critical errors
+                warnings.append(f"Extra columns found in dataset not in schema: {sorted(extra_in_data)}")
 
+            # Single pass over the rows: text columns are read as declared, numeric ones are left to
+            # inference so unparseable values can be counted. The file is hashed while pandas reads it.
+            profile = DataProfile(self.config.all_schema, data_columns)
+            reader = HashingReader(self.config.csv_file_path)
+            with profiler.step("profile_csv") as step, io.BufferedReader(reader) as handle:
+                for chunk in iter_csv_chunks(handle, self.config.chunk_size, dtype=schema_dtypes(self.config.all_schema, include_numeric=False)):
+                    profile.update(chunk)
+                file_hash = reader.hexdigest()
+                step.rows = profile.n_rows
+            report = profile.to_dict()
+            logger.info(f"Profiled {report['n_rows']} rows of {self.config.csv_file_path}.")
 
-            for col, dtype in self.config.all_schema.items():
-                if col in all_cols:
+            for col, stats in report["columns"].items():
+                if stats["invalid_count"]:
+                    errors.append(f"Column '{col}' expected {stats['declared_dtype']} but has {stats['invalid_count']} "
+                                  f"unparseable values, e.g. {stats['invalid_examples']}")
+                if stats["null_rate"] > self.config.max_null_rate:
+                    errors.append(f"Column '{col}' null rate {stats['null_rate']:.1%} exceeds {self.config.max_null_rate:.1%}")
+                out_of_range_rate = stats.get("out_of_range_rate", 0.0)
+                max_out_of_range_rate = self.config.max_out_of_range_rate_by_column.get(col, self.config.max_out_of_range_rate)
+                if out_of_range_rate > max_out_of_range_rate:
+                    errors.append(f"Column '{col}' has {out_of_range_rate:.1%} of values outside {stats['range']} "
+                                  f"(limit {max_out_of_range_rate:.1%})")
+                elif out_of_range_rate:
+                    warnings.append(f"Column '{col}' has {stats['below_min']} values below and {stats['above_max']} "
+                                    f"above the physical range {stats['range']}")
+                if stats.get("out_of_range_count"):
+                    warnings.append(f"Column '{col}' has {stats['out_of_range_count']} dates outside {stats['range']}")
 
-                    pass
-                else:
-                    logger.error(f"Validation Error: Schema column '{col}' not found in dataset. (Detailed check)")
-                    validation_status = False 
+            for message in warnings:
+                logger.warning(f"Validation Warning: {message}")
+            for message in errors:
+                logger.error(f"Validation Error: {message}")
+            validation_status = not errors
+
+            save_json(Path(self.config.profile_file), {
+                "file": str(self.config.csv_file_path),
+                "sha256": file_hash,
+                "size_bytes": os.path.getsize(self.config.csv_file_path),
+                "fingerprint": fingerprint,
+                "validation_status": validation_status,
+                "errors": errors,
+                "warnings": warnings,
+                **report,
+            })
+            self._write_status(validation_status)
 
-            with open(self.config.STATUS_FILE, 'w') as f:
-                f.write(f"Validation status: {validation_status}")
-            
             if validation_status:
                 logger.info("Data validation completed: Schema validation successful.") # Improved log message
             else:
                 logger.error("Data validation completed: Schema validation FAILED. Check logs for details.") # Improved log message
 
             return validation_status
-            
+
         except Exception as e:
             logger.exception(f"An error occurred during data validation: {e}") # Changed to logger.exception for full traceback
-            raise e
\ No newline at end of file
+            raise e
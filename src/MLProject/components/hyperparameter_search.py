@@ -0,0 +1,252 @@
+import os
+import json
+import math
+import time
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from joblib import Parallel, delayed
+from catboost import CatBoostRegressor, Pool
+from sklearn.model_selection import KFold, ParameterSampler
+from sklearn.metrics import get_scorer
+from MLProject import logger
+
+# Per-process cache of quantized CatBoost Pools, keyed by (data signature, fold, border_count).
+# Pools cannot be pickled, so each joblib worker builds them once and reuses them for every
+# trial it runs; loky keeps workers alive across rungs.
+_POOL_CACHE: Dict[tuple, tuple] = {}
+_POOL_CACHE_MAX_ENTRIES = 32
+
+
+def _fold_pools(data_key: str, fold_index: int, X: np.ndarray, y: np.ndarray, train_index: np.ndarray,
+                valid_index: np.ndarray, cat_features: List[int], border_count: Optional[int]):
+    key = (data_key, fold_index, border_count)
+    pools = _POOL_CACHE.get(key)
+    if pools is None:
+        if len(_POOL_CACHE) >= _POOL_CACHE_MAX_ENTRIES:
+            _POOL_CACHE.clear()
+        train_pool = Pool(X[train_index], y[train_index], cat_features=cat_features)
+        # Quantize once; later trials with the same border_count skip feature binning entirely
+        if border_count is not None:
+            train_pool.quantize(border_count=border_count)
+        else:
+            train_pool.quantize()
+        valid_pool = Pool(X[valid_index], cat_features=cat_features)
+        pools = _POOL_CACHE[key] = (train_pool, valid_pool)
+    return pools
+
+
+def _fit_and_score_trial(params: Dict[str, Any], iterations: int, X: np.ndarray, y: np.ndarray,
+                         folds: List, scoring: str, thread_count: int, base_params: Dict[str, Any],
+                         cat_features: Optional[List[int]] = None, data_key: str = "") -> Dict[str, Any]:
+    '''Cross-validates one candidate at one iteration budget. Runs inside a joblib worker.'''
+    scorer = get_scorer(scoring)
+    scores, fit_times, score_times = [], [], []
+    for fold_index, (train_index, valid_index) in enumerate(folds):
+        if cat_features:
+            # Native categorical mode: fit on pre-built, pre-quantized Pools
+            fit_params = {k: v for k, v in params.items() if k != "border_count"}
+            train_data, valid_data = _fold_pools(data_key, fold_index, X, y, train_index, valid_index,
+                                                 cat_features, params.get("border_count"))
+            model = CatBoostRegressor(**base_params, **fit_params, iterations=iterations, thread_count=thread_count)
+            start = time.perf_counter()
+            model.fit(train_data)
+        else:
+            valid_data = X[valid_index]
+            model = CatBoostRegressor(**base_params, **params, iterations=iterations, thread_count=thread_count)
+            start = time.perf_counter()
+            model.fit(X[train_index], y[train_index])
+        fit_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scores.append(float(scorer(model, valid_data, y[valid_index])))
+        score_times.append(time.perf_counter() - start)
+
+    return {
+        "mean_score": float(np.mean(scores)),
+        "std_score": float(np.std(scores)),
+        "fold_scores": scores,
+        "fit_time": float(np.sum(fit_times)),
+        "score_time": float(np.sum(score_times)),
+    }
+
+
+class SuccessiveHalvingSearch:
+    """
+    Parallel, resumable hyperparameter search for CatBoostRegressor.
+
+    Candidates are sampled like RandomizedSearchCV, but the number of boosting
+    iterations is treated as the budget: every candidate is first
+    cross-validated with `min_iterations`, then only the best 1/halving_factor
+    move on to a budget `halving_factor` times larger, until `max_iterations`.
+    Bad candidates are therefore pruned after a fraction of the full cost.
+
+    Trials run in `n_jobs` joblib workers with `thread_count` CatBoost threads
+    each (n_jobs=-1 uses every core: cpu_count // thread_count workers). Each
+    finished trial is appended to a JSONL checkpoint, so an interrupted search
+    resumes and only re-runs trials that had not completed.
+
+    With `cat_features` (column indices) the data is handed to CatBoost as
+    native categorical features through Pools that each worker builds and
+    quantizes once per fold and border_count, then reuses across trials.
+    """
+
+    def __init__(self, param_distributions: Dict[str, List[Any]], n_candidates: int, cv_folds: int,
+                 scoring: str, min_iterations: int, max_iterations: int, halving_factor: int,
+                 n_jobs: int, thread_count: int, checkpoint_path: Path,
+                 base_params: Optional[Dict[str, Any]] = None, random_state: int = 42,
+                 cat_features: Optional[List[int]] = None,
+                 on_trial_complete: Optional[Callable[[int, Dict[str, Any]], None]] = None):
+        if halving_factor < 2:
+            raise ValueError("halving_factor must be at least 2")
+        if not 0 < min_iterations <= max_iterations:
+            raise ValueError("min_iterations must be positive and not larger than max_iterations")
+
+        self.param_distributions = {k: v for k, v in param_distributions.items() if k != "iterations"}
+        self.n_candidates = n_candidates
+        self.cv_folds = cv_folds
+        self.scoring = scoring
+        self.min_iterations = min_iterations
+        self.max_iterations = max_iterations
+        self.halving_factor = halving_factor
+        self.thread_count = max(1, thread_count)
+        self.n_jobs = self._resolve_n_jobs(n_jobs, self.thread_count)
+        self.checkpoint_path = Path(checkpoint_path)
+        self.base_params = base_params or {}
+        self.random_state = random_state
+        self.cat_features = list(cat_features) if cat_features else None
+        self.on_trial_complete = on_trial_complete
+
+        self.trials_: List[Dict[str, Any]] = []
+        self.best_params_: Dict[str, Any] = {}
+        self.best_score_: float = float("nan")
+
+    @staticmethod
+    def _resolve_n_jobs(n_jobs: int, thread_count: int) -> int:
+        cpu_count = os.cpu_count() or 1
+        if n_jobs is None or n_jobs <= 0:
+            return max(1, cpu_count // thread_count)
+        return n_jobs
+
+    def iteration_budgets(self) -> List[int]:
+        budgets = []
+        budget = self.min_iterations
+        while budget < self.max_iterations:
+            budgets.append(int(budget))
+            budget *= self.halving_factor
+        budgets.append(int(self.max_iterations))
+        return budgets
+
+    def _signature(self, X: np.ndarray, y: np.ndarray) -> str:
+        '''Identifies the search setup so a checkpoint from a different search is never reused.'''
+        material = {
+            "param_distributions": self.param_distributions,
+            "n_candidates": self.n_candidates,
+            "cv_folds": self.cv_folds,
+            "scoring": self.scoring,
+            "budgets": self.iteration_budgets(),
+            "base_params": self.base_params,
+            "random_state": self.random_state,
+            "cat_features": self.cat_features,
+            "data_shape": list(X.shape),
+            # Cheap data fingerprint: a strided sample rather than hashing the whole matrix
+            "data_sample": hashlib.sha256(str(X[::max(1, len(X) // 1000)].tolist()).encode("utf-8")
+                                          + np.ascontiguousarray(y[::max(1, len(y) // 1000)]).tobytes()).hexdigest(),
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _load_checkpoint(self, signature: str) -> Dict[str, Dict[str, Any]]:
+        if not self.checkpoint_path.exists():
+            return {}
+        completed = {}
+        with open(self.checkpoint_path) as f:
+            lines = [line for line in f if line.strip()]
+        if not lines or json.loads(lines[0]).get("signature") != signature:
+            stale_path = self.checkpoint_path.with_suffix(".stale.jsonl")
+            os.replace(self.checkpoint_path, stale_path)
+            logger.info(f"Search checkpoint belongs to a different search setup, moved it to {stale_path}.")
+            return {}
+        for line in lines[1:]:
+            try:
+                trial = json.loads(line)
+            except json.JSONDecodeError:
+                break # Partially written last line from an interrupted run
+            completed[trial["trial_key"]] = trial
+        logger.info(f"Resuming hyperparameter search: {len(completed)} completed trials loaded from {self.checkpoint_path}.")
+        return completed
+
+    def _append_checkpoint(self, record: Dict[str, Any]):
+        with open(self.checkpoint_path, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _trial_key(params: Dict[str, Any], iterations: int) -> str:
+        return hashlib.sha256(json.dumps({"params": params, "iterations": iterations}, sort_keys=True, default=str)
+                              .encode("utf-8")).hexdigest()[:16]
+
+    def fit(self, X, y) -> "SuccessiveHalvingSearch":
+        X = np.asarray(X)
+        y = np.asarray(y)
+        os.makedirs(self.checkpoint_path.parent, exist_ok=True)
+
+        signature = self._signature(X, y)
+        completed = self._load_checkpoint(signature)
+        if not self.checkpoint_path.exists():
+            self._append_checkpoint({"signature": signature})
+
+        folds = list(KFold(n_splits=self.cv_folds).split(X))
+        candidates = [
+            {k: (v.item() if isinstance(v, np.generic) else v) for k, v in params.items()}
+            for params in ParameterSampler(self.param_distributions, n_iter=self.n_candidates, random_state=self.random_state)
+        ]
+        surviving = list(range(len(candidates)))
+        budgets = self.iteration_budgets()
+        logger.info(f"Successive halving over {len(candidates)} candidates, budgets {budgets}, "
+                    f"{self.n_jobs} parallel trials x {self.thread_count} CatBoost threads.")
+
+        for rung, iterations in enumerate(budgets):
+            rung_results = {}
+            pending = []
+            for candidate_id in surviving:
+                trial_key = self._trial_key(candidates[candidate_id], iterations)
+                if trial_key in completed:
+                    rung_results[candidate_id] = completed[trial_key]
+                else:
+                    pending.append((candidate_id, trial_key))
+
+            rung_start = time.perf_counter()
+            if pending:
+                # Generator output lets us checkpoint every trial as soon as it finishes
+                results = Parallel(n_jobs=self.n_jobs, return_as="generator")(
+                    delayed(_fit_and_score_trial)(candidates[candidate_id], iterations, X, y, folds,
+                                                  self.scoring, self.thread_count, self.base_params,
+                                                  self.cat_features, signature)
+                    for candidate_id, _ in pending
+                )
+                for (candidate_id, trial_key), result in zip(pending, results):
+                    record = {"trial_key": trial_key, "candidate": candidate_id, "rung": rung,
+                              "iterations": iterations, "params": candidates[candidate_id], **result}
+                    self._append_checkpoint(record)
+                    rung_results[candidate_id] = record
+
+            for candidate_id in surviving:
+                trial = dict(rung_results[candidate_id], rung=rung)
+                self.trials_.append(trial)
+                if self.on_trial_complete is not None:
+                    self.on_trial_complete(len(self.trials_) - 1, trial)
+
+            ranked = sorted(surviving, key=lambda candidate_id: rung_results[candidate_id]["mean_score"], reverse=True)
+            best_id = ranked[0]
+            self.best_params_ = dict(candidates[best_id], iterations=iterations)
+            self.best_score_ = rung_results[best_id]["mean_score"]
+            logger.info(f"Rung {rung} ({iterations} iterations): {len(surviving)} candidates, "
+                        f"{len(pending)} trained in {time.perf_counter() - rung_start:.1f}s, "
+                        f"best {self.scoring}={self.best_score_:.4f}")
+
+            n_keep = max(1, math.ceil(len(surviving) / self.halving_factor))
+            surviving = ranked[:n_keep]
+
+        return self
@@ -1,78 +1,132 @@
 import os
+import re
 import pandas as pd
 import numpy as np # Ensure numpy is imported
 import joblib
-import mlflow
-# Removed mlflow.sklearn as its direct log_model causing issues is replaced
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from MLProject import logger
-from MLProject.utils.common import save_json # Ensure save_json is imported
+from MLProject.utils.common import save_json, get_aqi_buckets # Ensure save_json is imported
 from MLProject.entity.config_entity import ModelEvaluationConfig
+from MLProject.utils.artifact_io import load_features_and_target
+from MLProject.utils.run_profiler import profiler
+from MLProject.utils.segment_metrics import METRICS, segment_metrics
 from pathlib import Path # Ensure Path is imported
 
+if TYPE_CHECKING: # annotation only; sklearn loads with the pickled preprocessor
+    from sklearn.compose import ColumnTransformer
+
 class ModelEvaluation:
     def __init__(self, config: ModelEvaluationConfig):
         self.config = config
 
-    def eval_metrics(self, actual, pred):
-        rmse = np.sqrt(mean_squared_error(actual, pred))
-        mae = mean_absolute_error(actual, pred)
-        r2 = r2_score(actual, pred)
-        return rmse, mae, r2
+    def raw_feature_values(self, test_x: pd.DataFrame, preprocessor: "ColumnTransformer", column: str) -> np.ndarray:
+        '''
+        Recovers one input feature of every test row from the transformed
+        features (the artifacts hold no raw columns): the category of a one-hot
+        block (or the category itself with native encoding), or a numeric
+        column with the scaler (and log1p) undone, rounded to an integer.
+        '''
+        for name, transformer, columns in preprocessor.transformers_:
+            columns = list(columns) if not isinstance(columns, str) else [columns]
+            if name == "remainder" or column not in columns:
+                continue
+            position = columns.index(column)
+            block = preprocessor.output_indices_[name]
+            steps = dict(transformer.steps)
+
+            if "onehot" in steps:
+                categories = steps["onehot"].categories_
+                start = block.start + sum(len(c) for c in categories[:position])
+                one_hot = test_x.iloc[:, start:start + len(categories[position])].to_numpy(dtype=np.float64)
+                # Categories unseen in training are all-zero rows (handle_unknown='ignore')
+                return np.where(one_hot.any(axis=1), categories[position].astype(str)[one_hot.argmax(axis=1)], "unknown")
+            if "scaler" in steps:
+                scaler = steps["scaler"]
+                values = test_x.iloc[:, block.start + position].to_numpy(dtype=np.float64) * scaler.scale_[position] + scaler.mean_[position]
+                if "log1p" in steps:
+                    values = np.expm1(values)
+                return np.rint(values).astype(np.int64)
+            return test_x.iloc[:, block.start + position].to_numpy().astype(str) # passed through (native categories)
+
+        raise ValueError(f"Segment column '{column}' is not an input of the preprocessor")
+
+    def metric_key(self, *parts) -> str:
+        '''MLflow metric name such as "City/Delhi/rmse"; characters MLflow rejects become "_".'''
+        return "/".join(re.sub(r"[^\w\-. ]", "_", str(part)) for part in parts)
 
     def log_into_mlflow(self):
-        test_data = pd.read_csv(self.config.test_data_path)
-        model = joblib.load(self.config.model_path) # This will load the CatBoost model
-
-        test_x = test_data.drop([self.config.target_column], axis=1)
-        test_y = test_data[self.config.target_column] 
-
-        # Apply inverse log1p transformation to actuals and predictions for evaluation if target was transformed
-        # Ensure consistency with DataTransformation stage for AQI
-        if self.config.target_column in self.config.all_params and self.config.target_column in self.config.columns_to_log_transform:
-            # Assuming self.config.columns_to_log_transform is available via ConfigBox correctly
-            # Check if target_column is in the list of columns that were log-transformed during data_transformation
-            logger.info("Raw model predictions (log-transformed) obtained.")
-            # For evaluation, inverse transform both test_y and model predictions back to original scale
-            predicted_qualities_raw = model.predict(test_x)
-            
-            # Since eval_metrics expects original scale, apply inverse transform if target was logged
-            test_y_original_scale = np.expm1(test_y)
-            predicted_qualities_original_scale = np.expm1(predicted_qualities_raw)
-            logger.info("Inverse log1p transformation applied to both actuals and predictions for evaluation.")
+        with profiler.step("load_data_and_model") as step:
+            test_x, test_y = load_features_and_target(self.config.test_data_path, self.config.target_column)
+            model = joblib.load(self.config.model_path) # This will load the CatBoost model
+            preprocessor = joblib.load(self.config.preprocessor_path)
+            step.rows = len(test_x)
 
-            # Use original scale for metrics calculation
-            (rmse, mae, r2) = self.eval_metrics(test_y_original_scale, predicted_qualities_original_scale)
-        else:
-            # If target was not log-transformed, use raw predictions and actuals
+        with profiler.step("predict", rows=len(test_x)):
             predicted_qualities = model.predict(test_x)
-            (rmse, mae, r2) = self.eval_metrics(test_y, predicted_qualities)
 
+        # Evaluate in the original AQI scale, consistent with DataTransformation: inverse log1p of
+        # both the actuals and the predictions when the target was log-transformed
+        actual = np.asarray(test_y, dtype=np.float64)
+        predicted = np.asarray(predicted_qualities, dtype=np.float64)
+        if self.config.target_log_transformed:
+            actual, predicted = np.expm1(actual), np.expm1(predicted)
+            logger.info("Inverse log1p transformation applied to both actuals and predictions for evaluation.")
+
+        with profiler.step("segment_metrics", rows=len(actual)):
+            segments = {column: self.raw_feature_values(test_x, preprocessor, column) for column in self.config.segment_by}
+            actual_buckets = get_aqi_buckets(actual)
+            segments["AQI_Bucket"] = actual_buckets
+            # Predictions are bucketed as served: rounded to 2 decimals first
+            evaluation = segment_metrics(actual, predicted, segments,
+                                         n_resamples=self.config.bootstrap_resamples,
+                                         confidence_level=self.config.confidence_level,
+                                         n_jobs=self.config.n_jobs,
+                                         random_state=self.config.random_state,
+                                         actual_buckets=actual_buckets,
+                                         predicted_buckets=get_aqi_buckets(np.round(predicted, 2)))
+
+        overall = evaluation["overall"]
+        logger.info(f"Test metrics: rmse {overall['rmse']:.3f}, mae {overall['mae']:.3f}, r2 {overall['r2']:.4f}, "
+                    f"bucket accuracy {overall['bucket_accuracy']:.4f} over {overall['n']} rows")
+
+        # Overall metrics stay top-level keys of metrics.json; the per-segment ones go under "segments"
+        scores = {**overall, **{key: value for key, value in evaluation.items() if key != "overall"}}
+        save_json(path=Path(self.config.metric_file_name), data=scores)
+        logger.info(f"Metrics saved locally to {self.config.metric_file_name}")
+
+        import mlflow # Lazy: importing mlflow alone takes seconds
 
         mlflow.set_registry_uri(self.config.mlflow_uri)
         tracking_url_type_store = urlparse(mlflow.get_tracking_uri()).scheme
 
-        with mlflow.start_run(): # Note: this will create a nested run if called from main.py's run
+        with profiler.step("mlflow_logging"), mlflow.start_run(): # Note: this will create a nested run if called from main.py's run
             # You can also use mlflow.active_run() to get the existing run if main.py is already active
-            
-            scores = {"rmse": rmse, "mae": mae, "r2": r2}
-            save_json(path=Path(self.config.metric_file_name), data=scores)
-            logger.info(f"Metrics saved locally to {self.config.metric_file_name}")
 
             mlflow.log_params(self.config.all_params) # Logs parameters from params.yaml
             logger.info("Model parameters logged to MLflow.")
 
-            mlflow.log_metric("rmse", rmse)
-            mlflow.log_metric("r2", r2)
-            mlflow.log_metric("mae", mae)
-            logger.info("Metrics logged to MLflow.")
+            metrics = {}
+            for metric in METRICS:
+                if overall[metric] is not None:
+                    metrics[metric] = overall[metric]
+                low, high = overall.get(f"{metric}_ci", (None, None))
+                if low is not None and high is not None:
+                    metrics[f"{metric}_ci_low"], metrics[f"{metric}_ci_high"] = low, high
+            for segment, entries in evaluation["segments"].items():
+                for label, entry in entries.items():
+                    for metric in METRICS:
+                        if entry[metric] is not None:
+                            metrics[self.metric_key(segment, label, metric)] = entry[metric]
+            mlflow.log_metrics(metrics)
+            mlflow.log_dict(scores, "evaluation/metrics.json") # includes the per-segment intervals
+            logger.info(f"{len(metrics)} metrics and evaluation/metrics.json logged to MLflow.")
 
             # --- FIX FOR "unsupported endpoint" ERROR IN MODEL EVALUATION ---
             # Instead of mlflow.sklearn.log_model with registered_model_name,
             # log the model.joblib as a generic artifact.
             # model_path comes from config, so it's the path to the saved .joblib file.
-            mlflow.log_artifact(local_path=str(self.config.model_path), artifact_path="evaluated_model") 
+            mlflow.log_artifact(local_path=str(self.config.model_path), artifact_path="evaluated_model")
             logger.info("Model logged as MLflow artifact (under 'evaluated_model' path).")
             # The model is also logged by model_trainer. This one is for evaluation context.
 
@@ -82,4 +136,3 @@ class ModelEvaluation:
             # if Path(preprocessor_path).exists():
             #     mlflow.log_artifact(local_path=str(preprocessor_path), artifact_path="evaluated_preprocessor")
             #     logger.info("Preprocessor logged as MLflow artifact (under 'evaluated_preprocessor' path).")
-
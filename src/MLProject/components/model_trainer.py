@@ -1,12 +1,12 @@
 import pandas as pd
 import os
 import joblib
-import mlflow
-import mlflow.sklearn # Still needed for other mlflow.sklearn functionalities potentially
-from catboost import CatBoostRegressor
-from sklearn.model_selection import RandomizedSearchCV 
 from MLProject import logger
 from MLProject.entity.config_entity import ModelTrainerConfig
+from MLProject.utils.artifact_io import load_features_and_target
+from MLProject.utils.model_export import export_standalone_model
+from MLProject.utils.common import get_file_hash
+from MLProject.utils.run_profiler import profiler
 from pathlib import Path # Ensure Path is imported for correct path handling
 
 class ModelTrainer:
@@ -14,13 +14,21 @@ class ModelTrainer:
         self.config = config
 
     def train(self):
-        train_data = pd.read_csv(self.config.train_data_path)
-        test_data = pd.read_csv(self.config.test_data_path) 
-
-        train_x = train_data.drop([self.config.target_column], axis=1)
-        test_x = test_data.drop([self.config.target_column], axis=1)
-        train_y = train_data[self.config.target_column]
-        test_y = test_data[self.config.target_column]
+        # Heavy dependencies are imported on first use so importing this module stays cheap
+        import mlflow
+        from catboost import CatBoostRegressor, Pool
+
+        # Memory-mapped, zero-copy views for npy artifacts
+        with profiler.step("load_data") as step:
+            train_x, train_y = load_features_and_target(self.config.train_data_path, self.config.target_column)
+            test_x, test_y = load_features_and_target(self.config.test_data_path, self.config.target_column)
+            step.rows = len(train_x) + len(test_x)
+
+        # Non-numeric columns only exist in the native categorical mode (the imputed City strings)
+        cat_feature_names = [col for col in train_x.columns if not pd.api.types.is_numeric_dtype(train_x[col])]
+        cat_feature_indices = [train_x.columns.get_loc(col) for col in cat_feature_names]
+        if cat_feature_names:
+            logger.info(f"Training with native CatBoost categorical features: {cat_feature_names}")
 
         # Define parameter distribution for RandomizedSearchCV
         param_dist = {
@@ -46,22 +54,75 @@ class ModelTrainer:
         with mlflow.start_run() as run:
             run_id = run.info.run_id # Get the current run ID
             logger.info(f"MLflow Run ID: {run_id}")
+            profiler.mlflow_run_id = run_id # the run report's metrics are logged to this run
+
+            if self.config.perform_tuning and self.config.search_strategy == "successive_halving":
+                logger.info("Starting successive halving search for CatBoostRegressor...")
+                from MLProject.components.hyperparameter_search import SuccessiveHalvingSearch
+
+                def log_trial(trial_index, trial):
+                    # Per-trial timings and scores, indexed by trial number
+                    mlflow.log_metrics({
+                        f"trial_cv_score_{self.config.scoring_metric}": trial["mean_score"],
+                        "trial_cv_score_std": trial["std_score"],
+                        "trial_fit_time_s": trial["fit_time"],
+                        "trial_score_time_s": trial["score_time"],
+                        "trial_iterations": trial["iterations"],
+                        "trial_rung": trial["rung"],
+                    }, step=trial_index)
+
+                search = SuccessiveHalvingSearch(
+                    param_distributions=param_dist,
+                    n_candidates=self.config.n_iter_search,
+                    cv_folds=self.config.cv_folds,
+                    scoring=self.config.scoring_metric,
+                    min_iterations=self.config.min_iterations,
+                    max_iterations=self.config.max_iterations,
+                    halving_factor=self.config.halving_factor,
+                    n_jobs=self.config.n_jobs,
+                    thread_count=self.config.thread_count_per_trial,
+                    checkpoint_path=self.config.search_checkpoint_path,
+                    base_params=base_model.get_params(),
+                    random_state=42,
+                    cat_features=cat_feature_indices,
+                    on_trial_complete=log_trial
+                )
+                with profiler.step("successive_halving_search", rows=len(train_x)):
+                    search.fit(train_x, train_y)
+
+                best_params = search.best_params_
+                best_score = search.best_score_
+                logger.info(f"Successive halving completed. Best parameters: {best_params}")
+                logger.info(f"Best CV {self.config.scoring_metric} score: {best_score:.4f}")
 
-            if self.config.perform_tuning:
+                # Refit the winner on the full training set using every core
+                best_model = base_model.set_params(**best_params)
+                with profiler.step("refit", rows=len(train_x)):
+                    best_model.fit(Pool(train_x, train_y, cat_features=cat_feature_indices or None))
+
+                mlflow.log_params(best_params)
+                mlflow.log_metric(f"best_cv_score_{self.config.scoring_metric}", best_score)
+                mlflow.log_metric("search_trials", len(search.trials_))
+                logger.info("Logged best parameters and best CV score to MLflow.")
+
+            elif self.config.perform_tuning:
                 logger.info("Starting RandomizedSearchCV for CatBoostRegressor...")
+                from sklearn.model_selection import RandomizedSearchCV
                 random_search = RandomizedSearchCV(
-                    estimator=base_model,
+                    estimator=base_model.set_params(thread_count=self.config.thread_count_per_trial,
+                                                    cat_features=cat_feature_names or None),
                     param_distributions=param_dist,
                     n_iter=self.config.n_iter_search,
                     cv=self.config.cv_folds,
                     scoring=self.config.scoring_metric,
-                    n_jobs=2, # Using n_jobs=2 as discussed for stability
+                    n_jobs=self.config.n_jobs,
                     verbose=1,
                     random_state=42,
                     refit=True 
                 )
 
-                random_search.fit(train_x, train_y) 
+                with profiler.step("randomized_search", rows=len(train_x)):
+                    random_search.fit(train_x, train_y) # refit=True: includes the refit of the best candidate
 
                 best_model = random_search.best_estimator_
                 best_params = random_search.best_params_
@@ -77,7 +138,8 @@ class ModelTrainer:
             else: # If tuning is disabled
                 logger.info("Tuning is disabled. Training CatBoostRegressor with default parameters...")
                 best_model = base_model.set_params(**self.config.params)
-                best_model.fit(train_x, train_y)
+                with profiler.step("fit", rows=len(train_x)):
+                    best_model.fit(Pool(train_x, train_y, cat_features=cat_feature_indices or None))
                 best_params = self.config.params
 
                 mlflow.log_params(best_params)
@@ -85,22 +147,50 @@ class ModelTrainer:
 
             # Save the model and preprocessor locally first (for joblib load in pipeline/local testing)
             model_save_path = Path(self.config.root_dir) / self.config.model_name # Use Path object for joining
-            joblib.dump(best_model, model_save_path)
+            with profiler.step("save_model"):
+                joblib.dump(best_model, model_save_path)
             logger.info(f"Trained model saved locally to {model_save_path}")
 
+            # Pickle-free export (CatBoost formats + compiled preprocessing) for MLProject.serving.standalone_model
+            with profiler.step("export_standalone_model"):
+                export_manifest = export_standalone_model(
+                    best_model,
+                    export_dir=self.config.export_dir,
+                    compiled_preprocessor_path=self.config.compiled_preprocessor_path,
+                    target_log_transformed=self.config.target_log_transformed,
+                    formats=self.config.export_formats,
+                    cat_feature_indices=cat_feature_indices,
+                    pool=Pool(train_x, train_y, cat_features=cat_feature_indices) if cat_feature_indices else None,
+                    parity_features=test_x.head(1000)
+                )
+
             # NEW: Load the preprocessor that was saved by DataTransformation stage
             # Ensure self.config.root_dir is a Path object, then use its methods
             preprocessor_path = self.config.root_dir.parent / "data_transformation" / "preprocessor.joblib"
             preprocessor_obj = joblib.load(preprocessor_path) # Load the preprocessor
 
-            # --- FIX FOR "unsupported endpoint" ERROR ---
-            # Instead of mlflow.sklearn.log_model, log the joblib file as a generic artifact.
-            # This avoids interaction with the Model Registry endpoint which may be unsupported.
-            mlflow.log_artifact(local_path=str(model_save_path), artifact_path="model") # Log the model.joblib
-            logger.info("Trained model logged as MLflow artifact (under 'model' path).")
-
-            # Log the preprocessor as a separate artifact
-            mlflow.log_artifact(local_path=str(preprocessor_path), artifact_path="preprocessor") # Log the preprocessor.joblib
-            logger.info("Preprocessor logged as MLflow artifact (under 'preprocessor' path).")
+            with profiler.step("mlflow_upload"):
+                # --- FIX FOR "unsupported endpoint" ERROR ---
+                # Instead of mlflow.sklearn.log_model, log the joblib file as a generic artifact.
+                # This avoids interaction with the Model Registry endpoint which may be unsupported.
+                mlflow.log_artifact(local_path=str(model_save_path), artifact_path="model") # Log the model.joblib
+                logger.info("Trained model logged as MLflow artifact (under 'model' path).")
+
+                # Log the preprocessor as a separate artifact
+                mlflow.log_artifact(local_path=str(preprocessor_path), artifact_path="preprocessor") # Log the preprocessor.joblib
+                logger.info("Preprocessor logged as MLflow artifact (under 'preprocessor' path).")
+
+                if export_manifest is not None:
+                    mlflow.log_artifacts(str(self.config.export_dir), artifact_path="standalone")
+                    logger.info("Standalone model export logged as MLflow artifacts (under 'standalone' path).")
+
+                # sha256 of every logged file, verified by download_ml_artifacts.py after downloading
+                checksums = {f"model/{model_save_path.name}": get_file_hash(model_save_path),
+                             f"preprocessor/{preprocessor_path.name}": get_file_hash(preprocessor_path)}
+                if export_manifest is not None:
+                    for export_file in sorted(Path(self.config.export_dir).iterdir()):
+                        checksums[f"standalone/{export_file.name}"] = get_file_hash(export_file)
+                mlflow.log_dict(checksums, "checksums.json")
+                logger.info(f"Checksums of {len(checksums)} artifact files logged as checksums.json.")
 
         logger.info("Model training stage completed successfully.")
@@ -4,7 +4,10 @@ from MLProject.entity.config_entity import (DataIngestionConfig,
                                             DataValidationConfig,
                                             DataTransformationConfig,
                                             ModelTrainerConfig,
-                                            ModelEvaluationConfig)
+                                            ModelEvaluationConfig,
+                                            RunReportConfig,
+                                            ServingConfig,
+                                            BatchScoringConfig)
 from MLProject import logger
 from pathlib import Path # Import Path
 
@@ -46,7 +49,12 @@ class ConfigurationManager:
             root_dir=Path(config.root_dir), # Cast to Path
             STATUS_FILE=Path(config.STATUS_FILE), # Cast to Path
             csv_file_path=Path(config.csv_file_path), # Cast to Path
-            all_schema=schema
+            all_schema=schema,
+            chunk_size=int(config.chunk_size),
+            profile_file=Path(config.profile_file),
+            max_null_rate=float(config.max_null_rate),
+            max_out_of_range_rate=float(config.max_out_of_range_rate),
+            max_out_of_range_rate_by_column={str(col): float(rate) for col, rate in (config.max_out_of_range_rate_by_column or {}).items()}
         )
 
         return data_validation_config
@@ -62,14 +70,23 @@ class ConfigurationManager:
             root_dir=Path(config.root_dir), # Cast to Path
             data_path=Path(config.data_path), # Cast to Path
             preprocessor_name=config.preprocessor_name,
+            compiled_preprocessor_name=config.compiled_preprocessor_name,
             train_data_path=Path(config.train_data_path), # Cast to Path
             test_data_path=Path(config.test_data_path), # Cast to Path
             target_column=schema.name,
             numerical_cols=params.numerical_cols,
             categorical_cols=params.categorical_cols,
+            categorical_encoding=params.categorical_encoding,
             columns_to_log_transform=params.columns_to_log_transform,
             columns_to_drop_after_feature_eng=params.columns_to_drop_after_feature_eng,
-            test_size=params.test_size
+            test_size=params.test_size,
+            artifact_format=config.artifact_format,
+            export_csv=config.export_csv,
+            use_cache=config.use_cache,
+            cache_dir=Path(config.cache_dir),
+            streaming=config.streaming,
+            chunk_size=int(config.chunk_size),
+            all_schema=self.schema.COLUMNS
         )
 
         return data_transformation_config
@@ -93,7 +110,18 @@ class ConfigurationManager:
             perform_tuning = tuning_params.perform_tuning,
             n_iter_search = tuning_params.n_iter_search,
             cv_folds = tuning_params.cv_folds,
-            scoring_metric = tuning_params.scoring_metric
+            scoring_metric = tuning_params.scoring_metric,
+            search_strategy = tuning_params.search_strategy,
+            n_jobs = tuning_params.n_jobs,
+            thread_count_per_trial = tuning_params.thread_count_per_trial,
+            min_iterations = tuning_params.min_iterations,
+            max_iterations = tuning_params.max_iterations,
+            halving_factor = tuning_params.halving_factor,
+            search_checkpoint_path = Path(config.search_checkpoint_path),
+            compiled_preprocessor_path = Path(config.compiled_preprocessor_path),
+            export_dir = Path(config.export_dir),
+            export_formats = list(config.export_formats),
+            target_log_transformed = schema.name in self.params.data_transformation.columns_to_log_transform
         )
 
         return model_trainer_config
@@ -102,6 +130,7 @@ class ConfigurationManager:
     def get_model_evaluation_config(self) -> ModelEvaluationConfig:
         config = self.config.model_evaluation
         params = self.params.model_trainer.CatBoostRegressor 
+        evaluation_params = self.params.model_evaluation
         schema = self.schema.TARGET_COLUMN
 
         create_directories([config.root_dir])
@@ -110,10 +139,74 @@ class ConfigurationManager:
             root_dir=Path(config.root_dir), # Cast to Path
             test_data_path=Path(config.test_data_path), # Cast to Path
             model_path = Path(config.model_path), # Cast to Path
+            preprocessor_path=Path(config.preprocessor_path),
             all_params=params, 
             metric_file_name=Path(config.metric_file_name), # Cast to Path
             target_column=schema.name,
-            mlflow_uri="https://dagshub.com/tanayatipre8/End-to-End-Machine-Learning-Project-with-MLFlow.mlflow"
+            target_log_transformed=schema.name in self.params.data_transformation.columns_to_log_transform,
+            mlflow_uri="https://dagshub.com/tanayatipre8/End-to-End-Machine-Learning-Project-with-MLFlow.mlflow",
+            segment_by=list(evaluation_params.segment_by),
+            bootstrap_resamples=int(evaluation_params.bootstrap_resamples),
+            confidence_level=float(evaluation_params.confidence_level),
+            n_jobs=int(evaluation_params.n_jobs),
+            random_state=int(evaluation_params.random_state)
         )
 
         return model_evaluation_config
+
+
+    def get_run_report_config(self) -> RunReportConfig:
+        config = self.config.run_report
+
+        run_report_config = RunReportConfig(
+            report_file=Path(config.report_file),
+            log_to_mlflow=bool(config.log_to_mlflow)
+        )
+
+        return run_report_config
+
+
+    def get_serving_config(self) -> ServingConfig:
+        config = self.config.serving
+
+        serving_config = ServingConfig(
+            micro_batching=config.micro_batching,
+            max_batch_size=int(config.max_batch_size),
+            max_wait_ms=float(config.max_wait_ms),
+            compiled_preprocessor=config.compiled_preprocessor,
+            standalone_model=config.standalone_model,
+            prediction_cache=config.prediction_cache,
+            prediction_cache_size=int(config.prediction_cache_size),
+            prediction_cache_ttl_s=float(config.prediction_cache_ttl_s),
+            prediction_cache_path=Path(config.prediction_cache_path) if config.prediction_cache_path else None,
+            hot_reload=config.hot_reload,
+            hot_reload_interval_s=float(config.hot_reload_interval_s),
+            shadow_artifacts_dir=Path(config.shadow_artifacts_dir) if config.shadow_artifacts_dir else None,
+            shadow_fraction=float(config.shadow_fraction),
+            shadow_max_queue=int(config.shadow_max_queue),
+            shadow_window=int(config.shadow_window),
+            shadow_log_every=int(config.shadow_log_every),
+            log_payload_sample_rate=float(config.log_payload_sample_rate),
+            host=config.host,
+            port=int(config.port),
+            workers=int(config.workers),
+            inference_threads=int(config.inference_threads),
+            max_concurrent_requests=int(config.max_concurrent_requests),
+            max_queued_requests=int(config.max_queued_requests),
+            queue_timeout_s=float(config.queue_timeout_s)
+        )
+
+        return serving_config
+
+
+    def get_batch_scoring_config(self) -> BatchScoringConfig:
+        config = self.config.batch_scoring
+
+        batch_scoring_config = BatchScoringConfig(
+            input_schema=dict(self.schema.COLUMNS),
+            chunk_size=int(config.chunk_size),
+            workers=int(config.workers),
+            max_chunks_in_flight=int(config.max_chunks_in_flight)
+        )
+
+        return batch_scoring_config
@@ -1,5 +1,36 @@
 from pathlib import Path
+from datetime import date
 
 CONFIG_FILE_PATH = Path("config/config.yaml")
 PARAMS_FILE_PATH = Path("params.yaml")
-SCHEMA_FILE_PATH = Path("schema.yaml")
\ No newline at end of file
+SCHEMA_FILE_PATH = Path("schema.yaml")
+
+# Pollutant constraints for server-side validation
+POLLUTANT_CONSTRAINTS = {
+    'PM2.5': {'min': 0.0, 'max': 1000.0, 'unit': 'µg/m³'},
+    'PM10': {'min': 0.0, 'max': 2000.0, 'unit': 'µg/m³'},
+    'NO': {'min': 0.0, 'max': 250.0, 'unit': 'µg/m³'},
+    'NO2': {'min': 1.0, 'max': 250.0, 'unit': 'µg/m³'},
+    'NOx': {'min': 1.0, 'max': 500.0, 'unit': 'µg/m³'},
+    'NH3': {'min': 0.0, 'max': 300.0, 'unit': 'µg/m³'},
+    'CO': {'min': 0.0, 'max': 20.0, 'unit': 'µg/m³'}, # Changed min from 30.0 to 5.0
+    'SO2': {'min': 1.0, 'max': 150.0, 'unit': 'µg/m³'},
+    'O3': {'min': 1.0, 'max': 150.0, 'unit': 'µg/m³'},
+    'Benzene': {'min': 0.0, 'max': 60.0, 'unit': 'µg/m³'},
+    'Toluene': {'min': 1.0, 'max': 120.0, 'unit': 'µg/m³'}, # Widened range from 7.3-369.0
+    'Xylene': {'min': 1.0, 'max': 60.0, 'unit': 'µg/m³'}, # Widened range from 3.0-380.0
+}
+
+# Date constraints for server-side validation
+MIN_DATE = date(2015, 1, 1)
+MAX_DATE = date(2020, 12, 31)
+
+# AQI bucket upper bounds (inclusive), in ascending order
+AQI_BUCKETS = [
+    (0, 50, "Good"),
+    (51, 100, "Satisfactory"),
+    (101, 200, "Moderate"),
+    (201, 300, "Poor"),
+    (301, 400, "Very Poor"),
+    (401, 500, "Severe"),
+]
@@ -15,20 +15,34 @@ class DataValidationConfig:
     STATUS_FILE: str
     csv_file_path: Path
     all_schema: dict
+    chunk_size: int
+    profile_file: Path
+    max_null_rate: float
+    max_out_of_range_rate: float
+    max_out_of_range_rate_by_column: Dict[str, float]
 
 @dataclass(frozen=True)
 class DataTransformationConfig:
     root_dir: Path
     data_path: Path
     preprocessor_name: str
+    compiled_preprocessor_name: str
     train_data_path: Path
     test_data_path: Path
     target_column: str
     numerical_cols: List[str]
     categorical_cols: List[str]
+    categorical_encoding: str
     columns_to_log_transform: List[str]
     columns_to_drop_after_feature_eng: List[str]
     test_size: float
+    artifact_format: str
+    export_csv: bool
+    use_cache: bool
+    cache_dir: Path
+    streaming: bool
+    chunk_size: int
+    all_schema: dict
 
 @dataclass(frozen=True)
 class ModelTrainerConfig:
@@ -43,13 +57,70 @@ class ModelTrainerConfig:
     n_iter_search: int
     cv_folds: int
     scoring_metric: str
+    search_strategy: str
+    n_jobs: int
+    thread_count_per_trial: int
+    min_iterations: int
+    max_iterations: int
+    halving_factor: int
+    search_checkpoint_path: Path
+    compiled_preprocessor_path: Path
+    export_dir: Path
+    export_formats: List[str]
+    target_log_transformed: bool
 
 @dataclass(frozen=True)
 class ModelEvaluationConfig:
     root_dir: Path
     test_data_path: Path
     model_path: Path
+    preprocessor_path: Path
     all_params: dict
     metric_file_name: Path
     target_column: str
-    mlflow_uri: str
\ No newline at end of file
+    target_log_transformed: bool
+    mlflow_uri: str
+    segment_by: list
+    bootstrap_resamples: int
+    confidence_level: float
+    n_jobs: int
+    random_state: int
+
+@dataclass(frozen=True)
+class RunReportConfig:
+    report_file: Path
+    log_to_mlflow: bool
+
+@dataclass(frozen=True)
+class ServingConfig:
+    micro_batching: bool
+    max_batch_size: int
+    max_wait_ms: float
+    compiled_preprocessor: bool
+    standalone_model: bool
+    prediction_cache: bool
+    prediction_cache_size: int
+    prediction_cache_ttl_s: float
+    prediction_cache_path: Path
+    hot_reload: bool
+    hot_reload_interval_s: float
+    shadow_artifacts_dir: Path
+    shadow_fraction: float
+    shadow_max_queue: int
+    shadow_window: int
+    shadow_log_every: int
+    log_payload_sample_rate: float
+    host: str
+    port: int
+    workers: int
+    inference_threads: int
+    max_concurrent_requests: int
+    max_queued_requests: int
+    queue_timeout_s: float
+
+@dataclass(frozen=True)
+class BatchScoringConfig:
+    input_schema: dict
+    chunk_size: int
+    workers: int
+    max_chunks_in_flight: int
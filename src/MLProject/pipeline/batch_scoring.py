@@ -0,0 +1,277 @@
+"""
+Offline scoring of raw station readings (the city_day.csv columns) for
+historical backfills:
+
+    python -m MLProject.pipeline.batch_scoring readings.csv predictions.csv
+    python -m MLProject.pipeline.batch_scoring readings.parquet predictions.parquet --resume
+
+The input (CSV or Parquet) is streamed in chunks of batch_scoring.chunk_size
+rows. The PredictionPipeline, or the StandaloneModel with --standalone, is
+loaded once, before the scoring processes are forked, so they share it
+copy-on-write like the gunicorn workers instead of each unpickling it. Only
+max_chunks_in_flight chunks are read ahead of the writer, so memory is
+bounded by the chunk size, not by the input size.
+
+Every input row is written out in input order with predicted_AQI and
+predicted_AQI_Bucket, rounded and bucketed as the API does. Chunks are
+appended to a CSV file, or written as numbered part files of a Parquet
+dataset directory. After each chunk the output is synced to disk and
+<output>.checkpoint.json records the rows done; --resume continues from
+there after a crash or an interrupt, dropping anything written after the
+checkpoint. Throughput is logged per chunk and for the whole run.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+import numpy as np
+import pandas as pd
+from MLProject import logger
+from MLProject.config.configuration import ConfigurationManager
+from MLProject.utils.common import get_aqi_buckets
+from MLProject.utils.run_profiler import peak_rss_bytes
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+PREDICTION_COLUMN = "predicted_AQI"
+BUCKET_COLUMN = "predicted_AQI_Bucket"
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+# Pipeline of this process; set in the parent before the pool forks, so the workers inherit it
+_pipeline = None
+
+
+def _load_pipeline(standalone_model: bool, artifacts_dir: Optional[Path]):
+    global _pipeline
+    if _pipeline is None: # Already there in forked workers; only spawned ones load their own
+        from MLProject.serving.model_registry import ModelRegistry
+        _pipeline = ModelRegistry.load_model(standalone_model, artifacts_dir)
+    return _pipeline
+
+
+def _predict_chunk(frame: pd.DataFrame) -> np.ndarray:
+    return _pipeline.predict(frame)
+
+
+def is_parquet(path: Path) -> bool:
+    return Path(path).suffix.lower() in PARQUET_SUFFIXES
+
+
+def read_chunks(input_path: Path, chunk_size: int, start_row: int = 0,
+                schema: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+    '''
+    Yields the input from row start_row on in frames of at most chunk_size
+    rows; the rows before start_row are skipped, not converted. CSV columns
+    listed in schema get their schema dtype in every chunk, so a chunk in which
+    a column happens to be all missing does not change its type.
+    '''
+    if is_parquet(input_path):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(input_path)
+        # Whole row groups are skipped through the footer metadata, the rest of the offset by slicing
+        first_group, skip = 0, start_row
+        while first_group < parquet_file.num_row_groups and skip >= parquet_file.metadata.row_group(first_group).num_rows:
+            skip -= parquet_file.metadata.row_group(first_group).num_rows
+            first_group += 1
+        if first_group == parquet_file.num_row_groups:
+            return
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=range(first_group, parquet_file.num_row_groups)):
+            if skip:
+                batch, skip = batch.slice(min(skip, batch.num_rows)), max(0, skip - batch.num_rows)
+            if batch.num_rows:
+                yield batch.to_pandas()
+        return
+
+    columns = pd.read_csv(input_path, nrows=0).columns.tolist()
+    dtypes = {column: dtype for column, dtype in (schema or {}).items() if column in columns}
+    # An integer skiprows (plus the header line) lets the C parser skip the rows without converting them
+    for chunk in pd.read_csv(input_path, chunksize=chunk_size, skiprows=start_row + 1, header=None,
+                             names=columns, dtype=dtypes):
+        if len(chunk):
+            yield chunk
+
+
+class _CsvOutput:
+    '''Appends chunks to one CSV file; on resume it is first cut back to the size of the checkpoint.'''
+
+    def __init__(self, path: Path, checkpoint: Optional[Dict[str, Any]]):
+        self.path = path
+        if checkpoint:
+            os.truncate(path, checkpoint["output_bytes"])
+        self.file = open(path, "a" if checkpoint else "w", newline="", encoding="utf-8")
+        self.write_header = not checkpoint
+
+    def write(self, frame: pd.DataFrame, chunk_index: int) -> Dict[str, Any]:
+        frame.to_csv(self.file, header=self.write_header, index=False)
+        self.write_header = False
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"output_bytes": os.fstat(self.file.fileno()).st_size}
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetOutput:
+    '''One part file per chunk in a directory that pandas/pyarrow read as a single dataset.'''
+
+    def __init__(self, path: Path, checkpoint: Optional[Dict[str, Any]]):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        chunks_done = checkpoint["chunks_done"] if checkpoint else 0
+        for part in self.path.glob("part-*.parquet"):
+            if int(part.stem.split("-")[1]) >= chunks_done: # written after the checkpoint
+                part.unlink()
+
+    def write(self, frame: pd.DataFrame, chunk_index: int) -> Dict[str, Any]:
+        part = self.path / f"part-{chunk_index:06d}.parquet"
+        temporary = part.with_suffix(".tmp")
+        # Text columns as strings even when a chunk has only missing values, so the parts share one schema
+        frame.astype({column: "string" for column in frame.columns if frame[column].dtype == object}) \
+             .to_parquet(temporary, index=False)
+        os.replace(temporary, part)
+        return {}
+
+    def close(self):
+        pass
+
+
+def _read_checkpoint(checkpoint_path: Path, input_path: Path, model_version: str) -> Dict[str, Any]:
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["input"] != str(input_path.resolve()):
+        raise ValueError(f"{checkpoint_path} belongs to input {checkpoint['input']}, not {input_path.resolve()}")
+    if checkpoint["model_version"] != model_version:
+        # One backfill must not mix predictions of two models
+        raise ValueError(f"{checkpoint_path} was written with model version {checkpoint['model_version']}, "
+                         f"the loaded model is {model_version}. Start a new output instead of resuming.")
+    return checkpoint
+
+
+def _write_checkpoint(checkpoint_path: Path, checkpoint: Dict[str, Any]):
+    temporary = checkpoint_path.with_suffix(".tmp")
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, checkpoint_path) # atomic: a crash leaves the old or the new checkpoint
+
+
+def score_file(input_path: Path, output_path: Path, chunk_size: int, workers: int = 0,
+               max_chunks_in_flight: int = 0, resume: bool = False, start_row: int = 0,
+               standalone_model: bool = False, artifacts_dir: Optional[Path] = None,
+               schema: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    '''
+    Scores input_path into output_path (see the module docstring) and returns
+    the run summary: rows, seconds, rows/s and peak RSS of this process.
+    '''
+    input_path, output_path = Path(input_path), Path(output_path)
+    checkpoint_path = output_path.with_name(output_path.name + CHECKPOINT_SUFFIX)
+    workers = workers if workers > 0 else os.cpu_count() or 1
+    max_chunks_in_flight = max_chunks_in_flight if max_chunks_in_flight > 0 else 2 * workers
+
+    pipeline = _load_pipeline(standalone_model, artifacts_dir)
+    checkpoint = None
+    if resume and checkpoint_path.exists():
+        checkpoint = _read_checkpoint(checkpoint_path, input_path, pipeline.model_version)
+        start_row = checkpoint["next_row"]
+        logger.info(f"Resuming {output_path} at input row {start_row} ({checkpoint['rows_done']} rows already scored).")
+    elif output_path.exists():
+        raise FileExistsError(f"{output_path} exists; pass --resume to continue it or remove it first")
+
+    output = (_ParquetOutput if is_parquet(output_path) else _CsvOutput)(output_path, checkpoint)
+    state = checkpoint or {"input": str(input_path.resolve()), "model_version": pipeline.model_version,
+                           "chunks_done": 0, "rows_done": 0, "next_row": start_row}
+
+    pool = None
+    if workers > 1:
+        # fork shares the loaded pipeline with the workers; elsewhere each worker loads it once
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_load_pipeline,
+                                   initargs=(standalone_model, artifacts_dir))
+    logger.info(f"Scoring {input_path} from row {start_row} into {output_path}: chunks of {chunk_size} rows, "
+                f"{workers} process(es), model version {pipeline.model_version}.")
+
+    run = {"rows": 0, "chunks": 0} # scored by this invocation, for the throughput
+
+    def write(frame: pd.DataFrame, prediction: np.ndarray):
+        prediction = np.round(prediction, 2) # as returned by the API
+        frame = frame.assign(**{PREDICTION_COLUMN: prediction, BUCKET_COLUMN: get_aqi_buckets(prediction)})
+        state.update(output.write(frame, state["chunks_done"]))
+        state["chunks_done"] += 1
+        state["rows_done"] += len(frame)
+        state["next_row"] += len(frame)
+        _write_checkpoint(checkpoint_path, state)
+        run["rows"] += len(frame)
+        run["chunks"] += 1
+        logger.info(f"Chunk {state['chunks_done']}: {len(frame)} rows, {run['rows']} this run, "
+                    f"{run['rows'] / (time.perf_counter() - start):.0f} rows/s.")
+
+    start = time.perf_counter()
+    try:
+        pending = deque()
+        for frame in read_chunks(input_path, chunk_size, start_row, schema):
+            if pool is None:
+                write(frame, _predict_chunk(frame))
+                continue
+            pending.append((frame, pool.submit(_predict_chunk, frame)))
+            if len(pending) >= max_chunks_in_flight: # bounded read-ahead; results are written in input order
+                frame, future = pending.popleft()
+                write(frame, future.result())
+        while pending:
+            frame, future = pending.popleft()
+            write(frame, future.result())
+    except Exception as e:
+        logger.exception(f"Batch scoring stopped after {state['rows_done']} rows; rerun with --resume to continue: {e}")
+        raise e
+    finally:
+        output.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "input": str(input_path),
+        "output": str(output_path),
+        "rows": run["rows"],
+        "rows_total": state["rows_done"],
+        "chunks": run["chunks"],
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(run["rows"] / elapsed, 1) if elapsed > 0 else None,
+        "peak_rss_mb": round(peak_rss_bytes() / 2**20, 1),
+    }
+    logger.info(f"Batch scoring done: {summary['rows']} rows in {summary['seconds']}s ({summary['rows_per_s']} rows/s), "
+                f"{summary['rows_total']} rows in {output_path}, peak RSS {summary['peak_rss_mb']} MB.")
+    return summary
+
+
+def main():
+    config = ConfigurationManager().get_batch_scoring_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path, help="CSV or Parquet file of raw readings")
+    parser.add_argument("output", type=Path, help="CSV file, or Parquet dataset directory for a .parquet name")
+    parser.add_argument("--chunk-size", type=int, default=config.chunk_size)
+    parser.add_argument("--workers", type=int, default=config.workers, help="scoring processes; 0 = one per CPU core")
+    parser.add_argument("--max-chunks-in-flight", type=int, default=config.max_chunks_in_flight)
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint next to the output")
+    parser.add_argument("--start-row", type=int, default=0, help="first input row to score in a new output")
+    parser.add_argument("--standalone", action="store_true", help="score with the pickle-free StandaloneModel export")
+    parser.add_argument("--artifacts-dir", type=Path, default=None, help="default: ML_ARTIFACTS_DIR")
+    parser.add_argument("--report", default=None, help="optional JSON file for the run summary")
+    args = parser.parse_args()
+
+    summary = score_file(args.input, args.output, args.chunk_size, args.workers, args.max_chunks_in_flight,
+                         args.resume, args.start_row, args.standalone, args.artifacts_dir, config.input_schema)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
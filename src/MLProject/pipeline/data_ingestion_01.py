@@ -1,5 +1,4 @@
 from MLProject.config.configuration import ConfigurationManager
-from MLProject.components.data_ingestion import DataIngestion
 from MLProject import logger
 
 STAGE_NAME = "Data Ingestion Stage"
@@ -9,6 +8,8 @@ class DataIngestionTrainingPipeline:
         pass
 
     def main(self):
+        from MLProject.components.data_ingestion import DataIngestion # Lazy: only the stage that runs pays for its imports
+
         config = ConfigurationManager()
         data_ingestion_config = config.get_data_ingestion_config()
         data_ingestion = DataIngestion(data_ingestion_config)
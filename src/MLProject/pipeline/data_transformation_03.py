@@ -1,5 +1,5 @@
 from MLProject.config.configuration import ConfigurationManager
-from MLProject.components.data_transformation import DataTransformation
+from MLProject.utils.stage_cache import StageCache
 from MLProject import logger
 from pathlib import Path
 
@@ -11,6 +11,8 @@ class DataTransformationTrainingPipeline:
         pass
 
     def main(self):
+        from MLProject.components.data_transformation import DataTransformation # Lazy: pandas/sklearn load when the stage runs
+
         try:
             with open(Path("artifacts/data_validation/status.txt"), "r") as f:
                 status = f.read().split(" ")[-1]
@@ -19,7 +21,20 @@ class DataTransformationTrainingPipeline:
                 config = ConfigurationManager()
                 data_transformation_config = config.get_data_transformation_config()
                 data_transformation = DataTransformation(config=data_transformation_config)
-                data_transformation.initiate_data_transformation()
+
+                if not data_transformation_config.use_cache:
+                    data_transformation.initiate_data_transformation()
+                    return
+
+                # Skip the stage entirely when neither the raw CSV nor the transformation params changed
+                stage_cache = StageCache(data_transformation_config.cache_dir, stage_name="data_transformation")
+                cache_key = stage_cache.compute_key([data_transformation_config.data_path], data_transformation.cache_params())
+                output_paths = data_transformation.output_paths()
+                if not stage_cache.restore(cache_key, output_paths, optional=DataTransformation.OPTIONAL_OUTPUTS):
+                    # Also removes a compiled preprocessor of an earlier run, so store() never caches a stale one
+                    stage_cache.release(output_paths)
+                    data_transformation.initiate_data_transformation()
+                    stage_cache.store(cache_key, output_paths, metadata=data_transformation.cache_params())
             else:
                 raise Exception("You data schema is not valid. Data Transformation stage skipped.")
         
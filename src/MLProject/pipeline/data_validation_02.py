@@ -1,5 +1,4 @@
 from MLProject.config.configuration import ConfigurationManager
-from MLProject.components.data_validation import DataValidation
 from MLProject import logger
 from pathlib import Path
 
@@ -11,6 +10,8 @@ class DataValidationTrainingPipeline:
         pass
 
     def main(self):
+        from MLProject.components.data_validation import DataValidation # Lazy: pandas is only loaded when the stage runs
+
         config = ConfigurationManager()
         data_validation_config = config.get_data_validation_config()
         data_validation = DataValidation(config=data_validation_config)
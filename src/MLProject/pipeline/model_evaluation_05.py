@@ -1,5 +1,4 @@
 from MLProject.config.configuration import ConfigurationManager
-from MLProject.components.model_evaluation import ModelEvaluation
 from MLProject import logger
 
 STAGE_NAME = "Model Evaluation Stage"
@@ -9,6 +8,8 @@ class ModelEvaluationTrainingPipeline:
         pass
 
     def main(self):
+        from MLProject.components.model_evaluation import ModelEvaluation # Lazy: mlflow/sklearn load when the stage runs
+
         try: 
             config = ConfigurationManager()
             model_evaluation_config = config.get_model_evaluation_config()
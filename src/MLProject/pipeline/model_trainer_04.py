@@ -1,5 +1,4 @@
 from MLProject.config.configuration import ConfigurationManager
-from MLProject.components.model_trainer import ModelTrainer
 from MLProject import logger
 from pathlib import Path
 
@@ -10,6 +9,8 @@ class ModelTrainerTrainingPipeline:
         pass
 
     def main(self):
+        from MLProject.components.model_trainer import ModelTrainer # Lazy: catboost/mlflow load when the stage runs
+
         try:
             config = ConfigurationManager()
             model_trainer_config = config.get_model_trainer_config()
@@ -1,10 +1,17 @@
 import joblib
+import logging
+import time
 import numpy as np
 import pandas as pd
 import os
 from pathlib import Path # Ensure Path is imported
 from MLProject.config.configuration import ConfigurationManager 
 from MLProject.entity.config_entity import DataTransformationConfig 
+from MLProject.utils.compiled_preprocessor import compile_preprocessor
+from MLProject.utils.date_features import date_features
+from MLProject.serving.request_handling import records_to_frame
+from MLProject.serving.request_metrics import StepClock, prediction_step_metrics
+from MLProject.serving.standalone_model import artifact_version
 from MLProject import logger
 
 # Define the base directory where artifacts are expected to be downloaded inside the container
@@ -13,19 +20,36 @@ ML_ARTIFACTS_BASE_DIR = os.environ.get("ML_ARTIFACTS_DIR", "artifacts/downloaded
 
 
 class PredictionPipeline:
-    def __init__(self):
+    # Steps timed in aqi_prediction_step_seconds
+    STEPS = ("build_frame", "date_features", "reindex", "transform", "predict", "inverse_transform")
+
+    def __init__(self, artifacts_dir: Path = None):
         # ConfigurationManager is still used to get feature lists, etc., from params.yaml and schema.yaml
         self.config_manager = ConfigurationManager()
         self.data_transformation_config = self.config_manager.get_data_transformation_config() 
 
         # --- Load preprocessor and model from the downloaded artifact paths ---
         # Construct paths using the base directory set by the download script
-        preprocessor_path = Path(ML_ARTIFACTS_BASE_DIR) / "preprocessor" / "preprocessor.joblib" # MLflow saves artifacts in subdirectories
-        model_path = Path(ML_ARTIFACTS_BASE_DIR) / "model" / "model.joblib" # MLflow saves models in a 'model' subdirectory
+        # artifacts_dir lets a second pair (e.g. a shadow candidate from another run) be loaded side by side
+        artifacts_dir = Path(artifacts_dir or ML_ARTIFACTS_BASE_DIR)
+        preprocessor_path = artifacts_dir / "preprocessor" / "preprocessor.joblib" # MLflow saves artifacts in subdirectories
+        model_path = artifacts_dir / "model" / "model.joblib" # MLflow saves models in a 'model' subdirectory
 
         self.preprocessor = joblib.load(preprocessor_path) 
         self.model = joblib.load(model_path) 
-        logger.info(f"PredictionPipeline initialized: preprocessor loaded from {preprocessor_path}, model loaded from {model_path}.")
+        # Content hash of the loaded artifacts, scopes cached predictions to this model
+        self.model_version = artifact_version([preprocessor_path, model_path])
+        self.step_metrics = prediction_step_metrics(self.model_version, self.STEPS)
+        logger.info(f"PredictionPipeline initialized: preprocessor loaded from {preprocessor_path}, model loaded from {model_path} (version {self.model_version}).")
+
+        # NumPy fast path for the ColumnTransformer, verified bit-identical at load time
+        self.compiled_preprocessor = None
+        if self.config_manager.get_serving_config().compiled_preprocessor:
+            try:
+                self.compiled_preprocessor = compile_preprocessor(self.preprocessor)
+                logger.info("PredictionPipeline: using compiled NumPy preprocessor.")
+            except (ValueError, AssertionError) as e:
+                logger.warning(f"PredictionPipeline: preprocessor could not be compiled, using ColumnTransformer: {e}")
 
         # These lists are used for consistent column handling (reindexing) before CT
         numerical_cols_from_params = self.data_transformation_config.numerical_cols
@@ -50,60 +74,80 @@ class PredictionPipeline:
 
     def predict(self, raw_input_data: pd.DataFrame) -> np.ndarray:
         try:
+            clock = StepClock(self.step_metrics)
+            # f-strings are formatted even when DEBUG is off, and DataFrame reprs take milliseconds
+            debug = logger.isEnabledFor(logging.DEBUG)
             data_to_transform = raw_input_data.copy()
-            logger.info(f"Received raw input data for prediction. Shape: {data_to_transform.shape}")
 
-            logger.debug(f"PredictionPipeline: raw_input_data dtypes (from Flask form):\n{raw_input_data.dtypes}") 
-            logger.debug(f"PredictionPipeline: raw_input_data head (from Flask form):\n{raw_input_data.head()}") 
+            if debug:
+                logger.debug(f"Received raw input data for prediction. Shape: {data_to_transform.shape}")
+                logger.debug(f"PredictionPipeline: raw_input_data dtypes (from Flask form):\n{raw_input_data.dtypes}")
+                logger.debug(f"PredictionPipeline: raw_input_data head (from Flask form):\n{raw_input_data.head()}")
 
             # Date Feature Engineering - This MUST be consistent with training!
             if 'Date' in data_to_transform.columns:
-                data_to_transform['Date'] = pd.to_datetime(data_to_transform['Date'], errors='coerce')
-                data_to_transform['Year'] = data_to_transform['Date'].dt.year
-                data_to_transform['Month'] = data_to_transform['Date'].dt.month
-                data_to_transform['Day'] = data_to_transform['Date'].dt.day
-                data_to_transform['DayOfWeek'] = data_to_transform['Date'].dt.dayofweek
-                data_to_transform['IsWeekend'] = data_to_transform['DayOfWeek'].isin([5, 6]).astype(int)
+                for column, values in date_features(data_to_transform['Date'].to_numpy()).items():
+                    data_to_transform[column] = values
                 logger.debug("Date features engineered for prediction input.")
+            clock.lap("date_features")
 
             # Drop columns that were handled as non-features in training.
             columns_to_drop_from_X_pred = self.data_transformation_config.columns_to_drop_after_feature_eng.copy()
             if 'AQI_Bucket' in columns_to_drop_from_X_pred:
                 columns_to_drop_from_X_pred.remove('AQI_Bucket') 
             
-            for col in columns_to_drop_from_X_pred:
-                if col in data_to_transform.columns:
-                    data_to_transform = data_to_transform.drop(columns=[col])
-                    logger.debug(f"Dropped column '{col}' from prediction input.")
+            present_cols_to_drop = [col for col in columns_to_drop_from_X_pred if col in data_to_transform.columns]
+            if present_cols_to_drop:
+                # Single drop for the whole batch instead of one DataFrame copy per column
+                data_to_transform = data_to_transform.drop(columns=present_cols_to_drop)
+                logger.debug(f"Dropped columns {present_cols_to_drop} from prediction input.")
 
             # Debugging: Check data_to_transform state before reindex
-            logger.debug(f"PredictionPipeline: data_to_transform columns BEFORE reindex: {data_to_transform.columns.tolist()}")
-            logger.debug(f"PredictionPipeline: data_to_transform dtypes BEFORE reindex:\n{data_to_transform.dtypes}")
+            if debug:
+                logger.debug(f"PredictionPipeline: data_to_transform columns BEFORE reindex: {data_to_transform.columns.tolist()}")
+                logger.debug(f"PredictionPipeline: data_to_transform dtypes BEFORE reindex:\n{data_to_transform.dtypes}")
 
             # Reindex the DataFrame to match the EXACT columns and ORDER expected by the ColumnTransformer
             data_for_ct = data_to_transform.reindex(columns=self.all_expected_ct_columns_ordered)
-            
-            # Debugging: Check data_for_ct state after reindex
-            logger.debug(f"PredictionPipeline: data_for_ct columns AFTER reindex: {data_for_ct.columns.tolist()}")
-            logger.debug(f"PredictionPipeline: data_for_ct dtypes AFTER reindex:\n{data_for_ct.dtypes}")
-            logger.debug(f"PredictionPipeline: data_for_ct head AFTER reindex:\n{data_for_ct.head()}")
+            clock.lap("reindex")
 
-
-            transformed_data = self.preprocessor.transform(data_for_ct)
-            logger.info("Prediction input data transformed using loaded preprocessor.")
-            logger.debug(f"PredictionPipeline: Transformed data shape: {transformed_data.shape}")
-            logger.debug(f"PredictionPipeline: Transformed data sample (first 5 values): {transformed_data[0, :5]}") 
+            # Debugging: Check data_for_ct state after reindex
+            if debug:
+                logger.debug(f"PredictionPipeline: data_for_ct columns AFTER reindex: {data_for_ct.columns.tolist()}")
+                logger.debug(f"PredictionPipeline: data_for_ct dtypes AFTER reindex:\n{data_for_ct.dtypes}")
+                logger.debug(f"PredictionPipeline: data_for_ct head AFTER reindex:\n{data_for_ct.head()}")
+
+            if self.compiled_preprocessor is not None:
+                transformed_data = self.compiled_preprocessor.transform_frame(data_for_ct)
+            else:
+                transformed_data = self.preprocessor.transform(data_for_ct)
+            clock.lap("transform")
+            if debug:
+                logger.debug("Prediction input data transformed using loaded preprocessor.")
+                logger.debug(f"PredictionPipeline: Transformed data shape: {transformed_data.shape}")
+                logger.debug(f"PredictionPipeline: Transformed data sample (first 5 values): {transformed_data[0, :5]}")
 
             prediction = self.model.predict(transformed_data)
-            logger.info("Prediction made successfully.")
-            logger.debug(f"PredictionPipeline: Raw model prediction (before inverse transform): {prediction[0]}")
+            clock.lap("predict")
+            if debug:
+                logger.debug("Prediction made successfully.")
+                logger.debug(f"PredictionPipeline: Raw model prediction (before inverse transform): {prediction[0]}")
 
             if self.data_transformation_config.target_column in self.data_transformation_config.columns_to_log_transform:
                 prediction = np.expm1(prediction)
-                logger.info("Inverse log1p transformation applied to prediction.")
-                logger.debug(f"PredictionPipeline: Final prediction (after inverse transform): {prediction[0]}")
+                clock.lap("inverse_transform")
+                if debug:
+                    logger.debug("Inverse log1p transformation applied to prediction.")
+                    logger.debug(f"PredictionPipeline: Final prediction (after inverse transform): {prediction[0]}")
             return prediction
 
         except Exception as e:
             logger.exception(f"Error during prediction: {e}")
             raise e
+
+    def predict_records(self, records) -> np.ndarray:
+        '''Scores already validated request records (dicts of form/JSON fields).'''
+        start = time.perf_counter()
+        frame = records_to_frame(records)
+        self.step_metrics["build_frame"].observe(time.perf_counter() - start)
+        return self.predict(frame)
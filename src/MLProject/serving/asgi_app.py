@@ -0,0 +1,283 @@
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import jinja2
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from MLProject import logger
+from MLProject.config.configuration import ConfigurationManager
+from MLProject.entity.config_entity import ServingConfig
+from MLProject.serving.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from MLProject.serving.micro_batcher import MicroBatcher
+from MLProject.serving.hot_reload import ArtifactWatcher, ADMIN_TOKEN_HEADER, handle_reload_request, handle_model_status_request
+from MLProject.serving.shadow import handle_shadow_status_request
+from MLProject.serving.model_registry import model_registry
+from MLProject.serving.process_memory import observe_process_memory
+from MLProject.serving.request_metrics import RequestTracker
+from MLProject.serving.request_handling import validate_record, parse_batch_payload, score_records
+from MLProject.utils.common import get_aqi_bucket
+from MLProject.utils.structured_logging import log_sampled
+
+IN_FLIGHT = REGISTRY.gauge(
+    "aqi_asgi_inflight_predictions", "Prediction requests currently admitted by the ASGI concurrency limiter.")
+REJECTED = REGISTRY.counter(
+    "aqi_asgi_rejected_requests_total", "Prediction requests answered with 503 because the worker was saturated.")
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Admission control for prediction requests in one worker process.
+
+    At most max_concurrent requests run at once; up to max_queued more wait
+    (for at most queue_timeout_s) for a slot. Anything beyond that is rejected
+    immediately with Overloaded, which the routes turn into a 503 so load
+    balancers retry elsewhere instead of piling latency onto this worker.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout_s: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout_s = queue_timeout_s
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self._waiting >= self.max_queued:
+            REJECTED.inc()
+            raise Overloaded(f"{self.max_concurrent} predictions in flight and {self._waiting} queued")
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            REJECTED.inc()
+            raise Overloaded(f"no prediction slot freed up within {self.queue_timeout_s}s")
+        finally:
+            self._waiting -= 1
+        IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            IN_FLIGHT.dec()
+            self._semaphore.release()
+
+
+def _overloaded_response(e: Overloaded) -> JSONResponse:
+    logger.warning(f"Rejected prediction request, worker saturated: {e}")
+    return JSONResponse({"error": f"Server busy: {e}. Please retry."}, status_code=503, headers={"Retry-After": "1"})
+
+
+@jinja2.pass_context
+def _url_for(context: dict, name: str, **path_params) -> str:
+    # The templates are shared with the Flask app and use url_for('static', filename=...)
+    if "filename" in path_params:
+        path_params["path"] = path_params.pop("filename")
+    return str(context["request"].url_for(name, **path_params))
+
+
+def create_app(serving_config: ServingConfig = None, templates_dir: str = "templates", static_dir: str = "static") -> Starlette:
+    '''
+    Builds the ASGI version of app.py: the same `/` and `/predict` pages plus the
+    JSON APIs and /metrics. Inference never runs on the event loop. Single rows
+    go through the micro-batcher when it is enabled, and everything else is
+    scored in a bounded thread pool (CatBoost releases the GIL while predicting).
+
+    Thread pool, micro-batcher and artifact watcher are started in the lifespan
+    handler, i.e. in each worker after the fork, because threads do not
+    survive fork(). Model
+    artifacts are loaded at import time by the caller so a preloading process
+    manager shares them between workers.
+    '''
+    serving_config = serving_config or ConfigurationManager().get_serving_config()
+    templates = Jinja2Templates(directory=templates_dir)
+    templates.env.globals["url_for"] = _url_for
+    state = {}
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        state["executor"] = ThreadPoolExecutor(max_workers=serving_config.inference_threads, thread_name_prefix="aqi-inference")
+        state["limiter"] = ConcurrencyLimiter(serving_config.max_concurrent_requests,
+                                              serving_config.max_queued_requests, serving_config.queue_timeout_s)
+        state["micro_batcher"] = None
+        if serving_config.micro_batching:
+            state["micro_batcher"] = MicroBatcher(
+                predict_fn=lambda records: model_registry.get_pipeline().predict_records(records),
+                max_batch_size=serving_config.max_batch_size,
+                max_wait_ms=serving_config.max_wait_ms
+            )
+        state["artifact_watcher"] = None
+        if serving_config.hot_reload:
+            state["artifact_watcher"] = ArtifactWatcher(model_registry, interval_s=serving_config.hot_reload_interval_s)
+        logger.info(f"ASGI worker ready: {serving_config.inference_threads} inference threads, "
+                    f"max {serving_config.max_concurrent_requests} concurrent / {serving_config.max_queued_requests} queued predictions.")
+        try:
+            yield
+        finally:
+            if state["artifact_watcher"] is not None:
+                state["artifact_watcher"].close()
+            if state["micro_batcher"] is not None:
+                state["micro_batcher"].close()
+            state["executor"].shutdown(wait=True)
+
+    async def run_in_pool(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(state["executor"], fn, *args)
+
+    async def predict_single(raw_data) -> float:
+        '''Scores one validated record without blocking the event loop.'''
+        if state["micro_batcher"] is not None:
+            return await asyncio.wrap_future(state["micro_batcher"].submit(raw_data))
+        return await run_in_pool(lambda: model_registry.get_pipeline().predict_records([raw_data])[0])
+
+    async def homePage(request: Request):
+        logger.info("Home page requested.")
+        return templates.TemplateResponse(request, "index.html")
+
+    async def predictRoute(request: Request):
+        with RequestTracker("predict_form") as tracked:
+            try:
+                # Prepare data from form
+                raw_data = dict(await request.form())
+
+                # SERVER-SIDE VALIDATION
+                validation_errors = tracked.validate(validate_record, raw_data)
+
+                if validation_errors:
+                    tracked.outcome = "validation_error"
+                    logger.warning(f"Validation errors received: {'; '.join(validation_errors)}")
+                    return templates.TemplateResponse(request, 'results.html', {
+                        "prediction": "Validation Error",
+                        "aqi_bucket": "Input Error",
+                        "error_message": "Please correct the following issues:<br>" + "<br>".join(validation_errors)})
+
+                log_sampled(logger, serving_config.log_payload_sample_rate, "Received prediction request.", payload=raw_data)
+
+                async with state["limiter"].slot():
+                    predicted_aqi = await predict_single(raw_data)
+
+                # Round the predicted AQI for display
+                predicted_aqi_rounded = round(float(predicted_aqi), 2)
+                aqi_bucket = get_aqi_bucket(predicted_aqi_rounded)
+
+                logger.info("Prediction successful.", extra={"aqi": predicted_aqi_rounded, "aqi_bucket": aqi_bucket})
+
+                return templates.TemplateResponse(request, 'results.html', {
+                    "prediction": predicted_aqi_rounded, "aqi_bucket": aqi_bucket, "error_message": ""})
+
+            except Overloaded as e:
+                tracked.outcome = "rejected"
+                logger.warning(f"Rejected prediction request, worker saturated: {e}")
+                return templates.TemplateResponse(request, 'results.html', {
+                    "prediction": "Server busy",
+                    "aqi_bucket": "Please retry",
+                    "error_message": "The server is handling too many predictions right now. Please try again in a moment."},
+                    status_code=503, headers={"Retry-After": "1"})
+
+            except Exception as e:
+                tracked.outcome = "system_error"
+                logger.exception(f"Error occurred during prediction: {e}")
+                return templates.TemplateResponse(request, 'results.html', {
+                    "prediction": "Error during prediction.",
+                    "aqi_bucket": "System Error",
+                    "error_message": f"An unexpected error occurred: {e}. Please check server logs."})
+
+    async def predictJsonRoute(request: Request):
+        with RequestTracker("v1_predict") as tracked:
+            try:
+                raw_data = await request.json()
+            except ValueError:
+                raw_data = None
+            if not isinstance(raw_data, dict):
+                tracked.outcome = "validation_error"
+                return JSONResponse({"error": "Request body must be a JSON object."}, status_code=400)
+
+            validation_errors = tracked.validate(validate_record, raw_data)
+            if validation_errors:
+                tracked.outcome = "validation_error"
+                logger.warning(f"Validation errors received: {'; '.join(validation_errors)}")
+                return JSONResponse({"aqi": None, "aqi_bucket": None, "errors": validation_errors}, status_code=422)
+
+            try:
+                async with state["limiter"].slot():
+                    predicted_aqi_rounded = round(float(await predict_single(raw_data)), 2)
+                return JSONResponse({"aqi": predicted_aqi_rounded, "aqi_bucket": get_aqi_bucket(predicted_aqi_rounded), "errors": []})
+
+            except Overloaded as e:
+                tracked.outcome = "rejected"
+                return _overloaded_response(e)
+
+            except Exception as e:
+                tracked.outcome = "system_error"
+                logger.exception(f"Error occurred during prediction: {e}")
+                return JSONResponse({"error": f"An unexpected error occurred: {e}. Please check server logs."}, status_code=500)
+
+    async def predictBatchRoute(request: Request):
+        with RequestTracker("v1_predict_batch") as tracked:
+            try:
+                body = (await request.body()).decode("utf-8")
+                mimetype = request.headers.get("content-type", "").split(";")[0].strip()
+                records = parse_batch_payload(body, mimetype)
+            except (ValueError, UnicodeDecodeError) as e:
+                tracked.outcome = "validation_error"
+                logger.warning(f"Rejected batch prediction request: {e}")
+                return JSONResponse({"error": str(e)}, status_code=400)
+
+            try:
+                async with state["limiter"].slot():
+                    results, n_valid = await run_in_pool(score_records, records, model_registry.get_pipeline(), tracked)
+                logger.info(f"Batch prediction completed for {len(records)} records ({n_valid} valid).")
+                return JSONResponse({
+                    "n_records": len(records),
+                    "n_valid": n_valid,
+                    "n_invalid": len(records) - n_valid,
+                    "predictions": results
+                })
+
+            except Overloaded as e:
+                tracked.outcome = "rejected"
+                return _overloaded_response(e)
+
+            except Exception as e:
+                tracked.outcome = "system_error"
+                logger.exception(f"Error occurred during batch prediction: {e}")
+                return JSONResponse({"error": f"An unexpected error occurred: {e}. Please check server logs."}, status_code=500)
+
+    async def reloadRoute(request: Request):
+        wait = request.query_params.get("wait", "").lower() in ("1", "true")
+        # With wait the load and smoke prediction run in the pool, never on the event loop
+        payload, status = await run_in_pool(handle_reload_request, model_registry,
+                                            request.headers.get(ADMIN_TOKEN_HEADER), wait)
+        return JSONResponse(payload, status_code=status)
+
+    async def modelStatusRoute(request: Request):
+        payload, status = handle_model_status_request(model_registry, request.headers.get(ADMIN_TOKEN_HEADER))
+        return JSONResponse(payload, status_code=status)
+
+    async def shadowStatusRoute(request: Request):
+        payload, status = handle_shadow_status_request(model_registry, request.headers.get(ADMIN_TOKEN_HEADER))
+        return JSONResponse(payload, status_code=status)
+
+    async def metricsRoute(request: Request):
+        # Metrics are per worker process; scrape each worker (or run one worker per pod) for totals
+        observe_process_memory()
+        return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    routes = [
+        Route("/", homePage, methods=["GET"]),
+        Route("/predict", predictRoute, methods=["POST"]),
+        Route("/v1/predict", predictJsonRoute, methods=["POST"]),
+        Route("/v1/predict/batch", predictBatchRoute, methods=["POST"]),
+        Route("/admin/reload", reloadRoute, methods=["POST"]),
+        Route("/admin/model", modelStatusRoute, methods=["GET"]),
+        Route("/admin/shadow", shadowStatusRoute, methods=["GET"]),
+        Route("/metrics", metricsRoute, methods=["GET"]),
+        Mount("/static", app=StaticFiles(directory=static_dir), name="static"),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan)
@@ -0,0 +1,125 @@
+import hmac
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+from MLProject import logger
+
+# Shared secret for the /admin endpoints; they are disabled when it is not set
+ADMIN_TOKEN_ENV = "MODEL_ADMIN_TOKEN"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+ML_ARTIFACTS_DIR = Path(os.environ.get("ML_ARTIFACTS_DIR", "artifacts/downloaded_model"))
+
+
+def is_admin_request(token: Optional[str]) -> bool:
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+
+def artifacts_fingerprint(artifacts_dir: Path) -> Tuple[tuple, ...]:
+    '''
+    (relative path, mtime, size) of every file below artifacts_dir. Hidden
+    directories are skipped: download_ml_artifacts.py stages its downloads in
+    .temp_mlflow_download before moving them into place.
+    '''
+    entries = []
+    for root, dirs, files in os.walk(artifacts_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in files:
+            path = Path(root) / name
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue # removed while walking; the next poll sees the final state
+            entries.append((path.relative_to(artifacts_dir).as_posix(), stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries))
+
+
+class ArtifactWatcher:
+    """
+    Polls ML_ARTIFACTS_DIR and asks the ModelRegistry to reload when its
+    files change, e.g. after download_ml_artifacts.py was re-run with a new
+    MLFLOW_RUN_ID.
+
+    A change is only acted on once the directory looked the same on two
+    consecutive polls, so a download still in progress is never loaded. A
+    failed reload is not retried until the files change again. Every worker
+    process runs its own watcher (restarted after fork like the
+    MicroBatcher), so all workers of a preforked server pick up the new model.
+    """
+
+    def __init__(self, registry, artifacts_dir: Path = ML_ARTIFACTS_DIR, interval_s: float = 10.0):
+        self.registry = registry
+        self.artifacts_dir = Path(artifacts_dir)
+        self.interval_s = interval_s
+        self._seen = artifacts_fingerprint(self.artifacts_dir)
+        self._pending = None
+        self._closed = False
+        self._start()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+        logger.info(f"ArtifactWatcher polling {self.artifacts_dir} every {interval_s}s.")
+
+    def _start(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="aqi-artifact-watcher", daemon=True)
+        self._thread.start()
+
+    def _restart_after_fork(self):
+        if not self._closed:
+            self._start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.exception(f"ArtifactWatcher: polling {self.artifacts_dir} failed: {e}")
+
+    def poll(self):
+        fingerprint = artifacts_fingerprint(self.artifacts_dir)
+        if fingerprint == self._seen:
+            self._pending = None
+            return
+        if fingerprint != self._pending:
+            # Changed since the last poll: wait one more interval for the files to settle
+            self._pending = fingerprint
+            return
+        logger.info(f"ArtifactWatcher: artifacts in {self.artifacts_dir} changed, reloading the model.")
+        result = self.registry.reload()
+        if result["status"] != "in_progress":
+            self._seen = fingerprint
+        self._pending = None
+
+    def close(self):
+        self._closed = True
+        self._stop.set()
+        self._thread.join()
+
+
+def admin_forbidden() -> Tuple[dict, int]:
+    return {"error": f"Forbidden. Set {ADMIN_TOKEN_ENV} on the server and send it in the {ADMIN_TOKEN_HEADER} header."}, 403
+
+
+def handle_reload_request(registry, token: Optional[str], wait: bool) -> Tuple[dict, int]:
+    '''
+    POST /admin/reload for both apps: (JSON payload, HTTP status). Reloads
+    only the worker process that received the request; with several workers
+    drop the new artifacts into ML_ARTIFACTS_DIR and let the watchers pick
+    them up instead.
+    '''
+    if not is_admin_request(token):
+        return admin_forbidden()
+    if wait:
+        result = registry.reload()
+        return result, {"failed": 500, "in_progress": 409}.get(result["status"], 200)
+    started = registry.reload_in_background()
+    return {"status": "started" if started else "in_progress", "model_version": registry.model_version()}, 202
+
+
+def handle_model_status_request(registry, token: Optional[str]) -> Tuple[dict, int]:
+    '''GET /admin/model: the version being served and the outcome of the last reload.'''
+    if not is_admin_request(token):
+        return admin_forbidden()
+    return {"model_version": registry.model_version(), "last_reload": registry.last_reload, "pid": os.getpid()}, 200
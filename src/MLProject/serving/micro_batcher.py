@@ -0,0 +1,142 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, List
+import numpy as np
+from MLProject import logger
+from MLProject.serving.metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "aqi_microbatch_queue_depth", "Single-row requests waiting to be coalesced into a batch.")
+BATCH_SIZE = REGISTRY.histogram(
+    "aqi_microbatch_batch_size", "Number of rows scored per coalesced PredictionPipeline.predict call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+WAIT_SECONDS = REGISTRY.histogram(
+    "aqi_microbatch_wait_seconds", "Time a request spent queued before its batch was dispatched.")
+
+_SHUTDOWN = object()
+
+
+class _PendingRequest:
+    __slots__ = ("record", "future", "enqueued_at")
+
+    def __init__(self, record: Dict[str, Any]):
+        self.record = record
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row prediction requests into one batch.
+
+    Request threads call submit()/predict() with an already validated record;
+    a background dispatcher collects up to max_batch_size records, waiting at
+    most max_wait_ms after the first one arrived, scores them with a single
+    predict_fn(records) call and resolves each request's future with its own row.
+    If the batch call fails, its records are scored one by one, so only the
+    request whose record fails gets the exception.
+    """
+
+    def __init__(self, predict_fn: Callable[[List[Dict[str, Any]]], np.ndarray], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._closed = False
+        self._start()
+        # Threads do not survive fork(): a preforking server (gunicorn --preload) would otherwise
+        # hand its workers a batcher whose dispatcher is gone, so restart it in each child
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+        logger.info(f"MicroBatcher started (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}).")
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._dispatcher = threading.Thread(target=self._run, name="aqi-micro-batcher", daemon=True)
+        self._dispatcher.start()
+
+    def _restart_after_fork(self):
+        if not self._closed:
+            self._start()
+
+    def submit(self, record: Dict[str, Any]) -> Future:
+        pending = _PendingRequest(record)
+        QUEUE_DEPTH.inc()
+        self._queue.put(pending)
+        return pending.future
+
+    def predict(self, record: Dict[str, Any], timeout: float = None) -> float:
+        return self.submit(record).result(timeout=timeout)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(_SHUTDOWN)
+        self._dispatcher.join()
+
+    def _collect_batch(self, first: _PendingRequest) -> List[_PendingRequest]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _SHUTDOWN:
+                # Re-queue so the dispatcher loop exits after this batch
+                self._queue.put(_SHUTDOWN)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _SHUTDOWN:
+                return
+            batch = self._collect_batch(first)
+            QUEUE_DEPTH.dec(len(batch))
+
+            dispatched_at = time.perf_counter()
+            for pending in batch:
+                WAIT_SECONDS.observe(dispatched_at - pending.enqueued_at)
+            BATCH_SIZE.observe(len(batch))
+
+            self._score(batch)
+
+    def _score(self, batch: List[_PendingRequest]):
+        '''Resolves the future of every request in the batch; never raises, so the dispatcher keeps running.'''
+        try:
+            predictions = self.predict_fn([pending.record for pending in batch])
+            if len(predictions) != len(batch):
+                raise ValueError(f"predict_fn returned {len(predictions)} predictions for {len(batch)} records")
+            results = [float(prediction) for prediction in predictions]
+        except Exception as e:
+            if len(batch) == 1:
+                logger.exception(f"MicroBatcher: prediction failed: {e}")
+                self._resolve(batch[0], error=e)
+                return
+            # One bad record must not fail the unrelated requests it was coalesced with
+            logger.warning(f"MicroBatcher: batch of {len(batch)} failed ({e}), scoring its records one by one.")
+            results = None
+
+        if results is None:
+            for pending in batch:
+                self._score([pending])
+            return
+        for pending, result in zip(batch, results):
+            self._resolve(pending, result=result)
+
+    @staticmethod
+    def _resolve(pending: _PendingRequest, result: float = None, error: Exception = None):
+        try:
+            if error is not None:
+                pending.future.set_exception(error)
+            else:
+                pending.future.set_result(result)
+        except InvalidStateError:
+            pass # Cancelled by its caller (e.g. a disconnected ASGI client)
@@ -0,0 +1,183 @@
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from MLProject import logger
+from MLProject.config.configuration import ConfigurationManager
+from MLProject.serving.metrics import REGISTRY
+from MLProject.serving.request_metrics import set_model_info
+
+MODEL_RELOADS = REGISTRY.counter(
+    "aqi_model_reloads_total", "Model hot-reload attempts by result (reloaded, unchanged, failed).", labelnames=("result",))
+MODEL_LOADED_AT = REGISTRY.gauge(
+    "aqi_model_loaded_timestamp_seconds", "Unix time the serving pipeline of this worker was swapped in.")
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the loaded PredictionPipeline.
+
+    The preprocessor and model are unpickled once per worker process and the
+    same PredictionPipeline instance is shared by every request thread
+    (ColumnTransformer.transform and CatBoostRegressor.predict are read-only).
+    With serving.standalone_model enabled a StandaloneModel built from the
+    pickle-free export is loaded instead; it has the same predict() interface.
+
+    With serving.prediction_cache enabled the pipeline is wrapped in a
+    CachedPipeline. The cache outlives the pipeline and is re-scoped to the
+    model version of every pipeline swapped in, so new artifacts never see
+    stale predictions. With serving.shadow_artifacts_dir set, a candidate
+    model from that directory is loaded alongside and scored on a sample of
+    the traffic off the request path (ShadowedPipeline).
+
+    reload() loads the artifacts currently on disk next to the serving
+    pipeline, checks them with a smoke prediction and swaps the reference.
+    Requests that already hold the old pipeline finish on it; every request
+    after the swap gets the new, already warmed-up one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._pipeline = None
+        self._prediction_cache = None
+        self._shadow_scorer = None
+        self.last_reload = None
+
+    @staticmethod
+    def load_model(standalone_model: bool, artifacts_dir: Path = None):
+        # Imported lazily so a standalone worker never loads joblib/sklearn/catboost
+        if standalone_model:
+            from MLProject.serving.standalone_model import StandaloneModel, STANDALONE_MODEL_DIR
+            return StandaloneModel.load(Path(artifacts_dir) / "standalone" if artifacts_dir else STANDALONE_MODEL_DIR)
+        from MLProject.pipeline.prediction import PredictionPipeline
+        return PredictionPipeline(artifacts_dir)
+
+    def load_pipeline(self):
+        serving_config = ConfigurationManager().get_serving_config()
+        pipeline = self.load_model(serving_config.standalone_model)
+
+        if serving_config.shadow_artifacts_dir:
+            try:
+                candidate = self.load_model(serving_config.standalone_model, serving_config.shadow_artifacts_dir)
+            except Exception as e:
+                # The candidate is optional: serve the primary model without shadowing
+                logger.exception(f"ModelRegistry: candidate model in {serving_config.shadow_artifacts_dir} could not be loaded: {e}")
+            else:
+                from MLProject.serving.shadow import ShadowedPipeline, ShadowScorer
+                if self._shadow_scorer is None:
+                    self._shadow_scorer = ShadowScorer(serving_config.shadow_fraction, serving_config.shadow_max_queue,
+                                                       serving_config.shadow_window, serving_config.shadow_log_every)
+                pipeline = ShadowedPipeline(pipeline, candidate, self._shadow_scorer)
+                logger.info(f"ModelRegistry: shadowing {serving_config.shadow_fraction:.0%} of predictions "
+                            f"with candidate version {candidate.model_version}.")
+
+        # Outermost, so cache hits are neither rescored nor mirrored to the candidate
+        if serving_config.prediction_cache:
+            from MLProject.serving.prediction_cache import CachedPipeline, PredictionCache
+            if self._prediction_cache is None:
+                self._prediction_cache = PredictionCache(serving_config.prediction_cache_size,
+                                                         serving_config.prediction_cache_ttl_s,
+                                                         serving_config.prediction_cache_path)
+            pipeline = CachedPipeline(pipeline, self._prediction_cache)
+        return pipeline
+
+    def _activate(self, pipeline):
+        # Caller holds self._lock
+        if self._prediction_cache is not None:
+            self._prediction_cache.set_model_version(pipeline.model_version)
+        set_model_info(pipeline.model_version, self.model_version())
+        self._pipeline = pipeline
+        MODEL_LOADED_AT.set(time.time())
+
+    def get_pipeline(self):
+        pipeline = self._pipeline
+        if pipeline is None:
+            with self._lock:
+                # Double-checked so concurrent first requests only load once
+                if self._pipeline is None:
+                    self._activate(self.load_pipeline())
+                    logger.info("ModelRegistry: prediction pipeline loaded.")
+                pipeline = self._pipeline
+        return pipeline
+
+    def is_loaded(self) -> bool:
+        return self._pipeline is not None
+
+    def model_version(self):
+        pipeline = self._pipeline
+        return pipeline.model_version if pipeline is not None else None
+
+    def shadow_summary(self):
+        return self._shadow_scorer.summary() if self._shadow_scorer is not None else None
+
+    def reload(self) -> dict:
+        '''
+        Loads and smoke-tests the artifacts on disk, then swaps them in.
+        Only one reload runs at a time; a concurrent call returns
+        status "in_progress" immediately. If loading or the smoke prediction
+        fails the current pipeline keeps serving.
+
+        Returns:
+            dict: status (reloaded, unchanged, failed, in_progress), model versions and load time
+        '''
+        if not self._reload_lock.acquire(blocking=False):
+            return {"status": "in_progress", "model_version": self.model_version()}
+        try:
+            start = time.perf_counter()
+            previous_version = self.model_version()
+            try:
+                candidate = self.load_pipeline()
+                self.smoke_test(candidate)
+            except Exception as e:
+                logger.exception(f"ModelRegistry: reload failed, still serving model version {previous_version}: {e}")
+                result = {"status": "failed", "model_version": previous_version, "error": str(e)}
+            else:
+                if candidate.model_version == previous_version:
+                    result = {"status": "unchanged", "model_version": previous_version}
+                else:
+                    with self._lock:
+                        self._activate(candidate)
+                    result = {"status": "reloaded", "model_version": candidate.model_version,
+                              "previous_version": previous_version}
+                    logger.info(f"ModelRegistry: swapped model version {previous_version} for {candidate.model_version}.")
+            result["load_s"] = round(time.perf_counter() - start, 3)
+            result["finished_at"] = time.time()
+            MODEL_RELOADS.labels(result=result["status"]).inc()
+            self.last_reload = result
+            return result
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self) -> bool:
+        '''Starts reload() in a daemon thread; False if a reload is already running.'''
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name="aqi-model-reload", daemon=True).start()
+        return True
+
+    def smoke_test(self, pipeline):
+        '''Raises if the pipeline cannot score the warm-up record (this also warms it up).'''
+        prediction = np.asarray(pipeline.predict_records([self.warm_up_record()]), dtype=np.float64)
+        if prediction.shape != (1,) or not np.isfinite(prediction).all():
+            raise ValueError(f"Smoke prediction returned {prediction!r}")
+
+    def warm_up(self):
+        '''
+        Loads the artifacts and runs one dummy prediction so that lazy
+        initialisation inside sklearn/CatBoost happens before the first
+        real request is served.
+        '''
+        pipeline = self.get_pipeline()
+        self.smoke_test(pipeline)
+        logger.info("ModelRegistry: warm-up prediction completed.")
+        return pipeline
+
+    @staticmethod
+    def warm_up_record() -> dict:
+        # Pollutants left out so the imputers run as well
+        return {'City': 'Delhi', 'Date': '2020-01-01'}
+
+
+# Single registry shared by every request handled in this process
+model_registry = ModelRegistry()
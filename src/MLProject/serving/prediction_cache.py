@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+import numpy as np
+from MLProject import logger
+from MLProject.constants import POLLUTANT_CONSTRAINTS
+from MLProject.serving.metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "aqi_prediction_cache_requests_total", "Prediction cache lookups per tier (memory, shared) and result (hit, miss).",
+    labelnames=("tier", "result"))
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "aqi_prediction_cache_hit_ratio", "Share of records answered from the prediction cache since the worker started.")
+CACHE_ENTRIES = REGISTRY.gauge(
+    "aqi_prediction_cache_entries", "Entries held in this worker's in-memory prediction cache.")
+CACHE_EVICTIONS = REGISTRY.counter(
+    "aqi_prediction_cache_evictions_total", "In-memory prediction cache entries evicted because the cache was full.")
+
+_KEY_COLUMNS = list(POLLUTANT_CONSTRAINTS.keys())
+
+
+def _is_missing(value) -> bool:
+    return value is None or value == "" or (isinstance(value, float) and value != value)
+
+
+def canonical_key(record: Dict[str, Any]) -> tuple:
+    '''
+    Cache key of a validated record: only the fields the pipelines read, with
+    equivalent spellings collapsed ("120", "120.0" and 120 are the same
+    reading, as are "" and a missing field). City is kept verbatim, as a
+    string, because an unseen spelling is a different category for the model.
+    Raises ValueError or TypeError if a reading is not a number.
+    '''
+    date = record.get('Date')
+    if not _is_missing(date):
+        try:
+            date = datetime.strptime(str(date), '%Y-%m-%d').date().isoformat()
+        except ValueError:
+            date = str(date)
+    city = record.get('City')
+    return (None if _is_missing(city) else str(city), date) + tuple(
+        None if _is_missing(record.get(column)) else float(record.get(column)) for column in _KEY_COLUMNS)
+
+
+class _SharedStore:
+    """
+    SQLite table shared by the worker processes of one host. Connections are
+    opened lazily per process (a connection must not cross fork()), and any
+    SQLite error is logged and treated as a miss, so a locked or broken
+    store never fails a prediction.
+    """
+
+    def __init__(self, path: Path, max_entries: int, ttl_s: float):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._writes_since_prune = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path), timeout=0.05, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=OFF")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, model_version TEXT NOT NULL, "
+                "value REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def digest(key: tuple) -> str:
+        return hashlib.blake2b(json.dumps(key).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_many(self, digests: Sequence[str], model_version: str) -> Dict[str, float]:
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                rows = connection.execute(
+                    f"SELECT key, value FROM predictions WHERE model_version = ? AND expires_at > ? "
+                    f"AND key IN ({','.join('?' * len(digests))})", [model_version, now, *digests]).fetchall()
+                if rows:
+                    connection.executemany("UPDATE predictions SET accessed_at = ? WHERE key = ?", [(now, key) for key, _ in rows])
+            return dict(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared prediction cache {self.path} unavailable, treating as miss: {e}")
+            return {}
+
+    def put_many(self, items: Dict[str, float], model_version: str):
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                    [(key, model_version, value, now + self.ttl_s, now) for key, value in items.items()])
+                self._writes_since_prune += len(items)
+                if self._writes_since_prune >= max(self.max_entries // 10, 1):
+                    self._prune(connection, model_version, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write to shared prediction cache {self.path}: {e}")
+
+    def _prune(self, connection: sqlite3.Connection, model_version: str, now: float):
+        # Expired rows, rows of other model versions, then the least recently used beyond max_entries
+        connection.execute("DELETE FROM predictions WHERE expires_at <= ? OR model_version != ?", (now, model_version))
+        connection.execute(
+            "DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,))
+        self._writes_since_prune = 0
+
+    def invalidate(self, model_version: str):
+        try:
+            with self._lock:
+                self._connect().execute("DELETE FROM predictions WHERE model_version != ?", (model_version,))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not invalidate shared prediction cache {self.path}: {e}")
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of predicted AQI values keyed on the canonical
+    input record, scoped to one model version.
+
+    The in-memory tier is per process; the optional shared tier is a SQLite
+    file used by every worker on the host, so a reading scored by one worker
+    is a hit for the others. set_model_version() is called whenever new
+    artifacts are swapped in and drops everything cached for other versions;
+    lookups and writes from any other version (a pipeline still finishing
+    in-flight requests, or one being smoke-tested) bypass the cache.
+    """
+
+    def __init__(self, max_entries: int = 100000, ttl_s: float = 3600.0, shared_path: Optional[Path] = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.model_version = None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = _SharedStore(shared_path, max_entries, ttl_s) if shared_path else None
+        self.hits = 0
+        self.misses = 0
+
+    def set_model_version(self, model_version: str):
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            self._entries.clear()
+            self.model_version = model_version
+            CACHE_ENTRIES.set(0)
+        if self._shared is not None:
+            self._shared.invalidate(model_version)
+        logger.info(f"PredictionCache: scoped to model version {model_version}.")
+
+    def get_many(self, keys: Sequence[tuple], model_version: str) -> List[Optional[float]]:
+        now = time.monotonic()
+        results: List[Optional[float]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            if model_version != self.model_version:
+                return results
+            for position, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    results[position] = entry[0]
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    missing.append(position)
+        CACHE_REQUESTS.labels(tier="memory", result="hit").inc(len(keys) - len(missing))
+        CACHE_REQUESTS.labels(tier="memory", result="miss").inc(len(missing))
+
+        if missing and self._shared is not None:
+            digests = {position: self._shared.digest(keys[position]) for position in missing}
+            found = self._shared.get_many(list(set(digests.values())), model_version)
+            promoted = {}
+            for position in missing:
+                value = found.get(digests[position])
+                if value is not None:
+                    results[position] = value
+                    promoted[keys[position]] = value
+            n_shared_hits = sum(results[position] is not None for position in missing)
+            CACHE_REQUESTS.labels(tier="shared", result="hit").inc(n_shared_hits)
+            CACHE_REQUESTS.labels(tier="shared", result="miss").inc(len(missing) - n_shared_hits)
+            if promoted:
+                self._put_local(promoted, model_version)
+
+        n_hits = sum(value is not None for value in results)
+        with self._lock:
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+            CACHE_HIT_RATIO.set(self.hits / max(self.hits + self.misses, 1))
+        return results
+
+    def _put_local(self, items: Dict[tuple, float], model_version: str):
+        expires_at = time.monotonic() + self.ttl_s
+        with self._lock:
+            if model_version != self.model_version:
+                return
+            for key, value in items.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            n_evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                n_evicted += 1
+            CACHE_ENTRIES.set(len(self._entries))
+        if n_evicted:
+            CACHE_EVICTIONS.inc(n_evicted)
+
+    def put_many(self, items: Dict[tuple, float], model_version: str):
+        if model_version != self.model_version:
+            return
+        self._put_local(items, model_version)
+        if self._shared is not None:
+            self._shared.put_many({self._shared.digest(key): value for key, value in items.items()}, model_version)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"model_version": self.model_version, "entries": len(self._entries), "hits": self.hits,
+                    "misses": self.misses, "hit_ratio": self.hits / max(self.hits + self.misses, 1)}
+
+
+class CachedPipeline:
+    """
+    Wraps a loaded pipeline (PredictionPipeline or StandaloneModel) so that
+    predict_records() only runs feature engineering and inference for records
+    not in the cache. Identical readings within one batch are scored once.
+    predict() on a DataFrame is passed through uncached.
+    """
+
+    def __init__(self, pipeline, cache: PredictionCache):
+        self.pipeline = pipeline
+        self.cache = cache
+
+    @property
+    def model_version(self) -> str:
+        return self.pipeline.model_version
+
+    def predict(self, raw_input_data) -> np.ndarray:
+        return self.pipeline.predict(raw_input_data)
+
+    @staticmethod
+    def _key(record: Dict[str, Any]) -> Optional[tuple]:
+        try:
+            return canonical_key(record)
+        except (TypeError, ValueError):
+            return None # Not cached; scoring decides what happens to it
+
+    def predict_records(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        keys = [self._key(record) for record in records]
+        cacheable = [position for position, key in enumerate(keys) if key is not None]
+        cached: List[Optional[float]] = [None] * len(records)
+        for position, value in zip(cacheable, self.cache.get_many([keys[position] for position in cacheable], self.model_version)):
+            cached[position] = value
+        predictions = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+
+        # First record per distinct uncached key, plus every record without a key
+        to_score: Dict[tuple, int] = {}
+        uncacheable = []
+        for position, value in enumerate(cached):
+            if keys[position] is None:
+                uncacheable.append(position)
+            elif value is None:
+                to_score.setdefault(keys[position], position)
+        if to_score or uncacheable:
+            scored = self.pipeline.predict_records([records[position] for position in [*to_score.values(), *uncacheable]])
+            new_items = {key: float(value) for key, value in zip(to_score, scored)}
+            self.cache.put_many(new_items, self.model_version)
+            for position, value in enumerate(cached):
+                if value is None and keys[position] is not None:
+                    predictions[position] = new_items[keys[position]]
+            predictions[uncacheable] = np.asarray(scored, dtype=np.float64)[len(to_score):]
+        return predictions
@@ -0,0 +1,99 @@
+"""
+Per-process memory accounting for preforked serving workers (Linux only).
+
+RSS counts every resident page a process maps, so with N workers sharing
+copy-on-write model pages the RSS sum overstates real usage by up to N times.
+PSS divides each shared page by the number of processes mapping it, so the
+PSS sum over the master and its workers is the actual footprint.
+
+    python -m MLProject.serving.process_memory <master_pid>
+"""
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+from MLProject.serving.metrics import REGISTRY
+
+PROCESS_RSS = REGISTRY.gauge(
+    "aqi_process_resident_memory_bytes", "Resident set size of this serving process, shared pages counted in full.")
+PROCESS_PSS = REGISTRY.gauge(
+    "aqi_process_proportional_memory_bytes", "Proportional set size of this serving process (shared pages split between sharers).")
+
+_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def read_process_memory(pid: Optional[int] = None) -> Optional[Dict[str, int]]:
+    '''
+    RSS, PSS and shared/private page totals in bytes, from /proc/<pid>/smaps_rollup
+    (or the slower per-mapping smaps on kernels before 4.14). None when /proc is
+    unavailable, e.g. on macOS.
+    '''
+    proc_dir = Path("/proc") / str(pid or os.getpid())
+    for name in ("smaps_rollup", "smaps"):
+        try:
+            with open(proc_dir / name) as f:
+                lines = f.readlines()
+        except OSError:
+            continue
+        memory = dict.fromkeys(_FIELDS.values(), 0)
+        for line in lines:
+            key, _, value = line.partition(":")
+            if key in _FIELDS:
+                memory[_FIELDS[key]] += int(value.split()[0]) * 1024
+        return memory
+    return None
+
+
+def observe_process_memory():
+    '''Refreshes the RSS/PSS gauges of the current process; called when /metrics is scraped.'''
+    memory = read_process_memory()
+    if memory is not None:
+        PROCESS_RSS.set(memory["rss"])
+        PROCESS_PSS.set(memory["pss"])
+
+
+def child_pids(pid: int) -> List[int]:
+    '''Direct children of pid (e.g. the workers of a gunicorn master).'''
+    children = []
+    for task in (Path("/proc") / str(pid) / "task").glob("*"):
+        try:
+            children.extend(int(child) for child in (task / "children").read_text().split())
+        except OSError:
+            continue
+    return sorted(set(children))
+
+
+def memory_report(master_pid: int) -> List[Dict[str, int]]:
+    '''One row per process (master first, then workers) plus a "total" row.'''
+    rows = []
+    for role, pid in [("master", master_pid)] + [("worker", child) for child in child_pids(master_pid)]:
+        memory = read_process_memory(pid)
+        if memory is not None:
+            rows.append({"role": role, "pid": pid, **memory})
+    if rows:
+        rows.append({"role": "total", "pid": 0, **{key: sum(row[key] for row in rows) for key in _FIELDS.values()}})
+    return rows
+
+
+def format_report(rows: List[Dict[str, int]]) -> str:
+    mb = 1024 * 1024
+    lines = [f"{'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}{'private MB':>12}"]
+    for row in rows:
+        shared = (row["shared_clean"] + row["shared_dirty"]) / mb
+        private = (row["private_clean"] + row["private_dirty"]) / mb
+        lines.append(f"{row['role']:<8}{row['pid'] or '':>8}{row['rss'] / mb:>10.1f}{row['pss'] / mb:>10.1f}"
+                     f"{shared:>11.1f}{private:>12.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    print(format_report(memory_report(int(sys.argv[1]))))
@@ -0,0 +1,144 @@
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from MLProject.constants import POLLUTANT_CONSTRAINTS, MIN_DATE, MAX_DATE
+from MLProject.utils.common import get_aqi_bucket
+
+POLLUTANT_COLUMNS = list(POLLUTANT_CONSTRAINTS.keys())
+
+
+def _is_missing(value) -> bool:
+    return value is None or value == ""
+
+
+def validate_record(raw_data: Dict[str, Any]) -> List[str]:
+    '''
+    Server-side validation of a single reading (form fields or JSON object).
+    Returns the list of human readable validation errors, empty if valid.
+    '''
+    validation_errors = []
+
+    # Validate City: it is a model category and part of the prediction cache key, so it must be a name
+    city = raw_data.get('City')
+    if _is_missing(city) or (isinstance(city, str) and not city.strip()):
+        validation_errors.append("City is required.")
+    elif not isinstance(city, str):
+        validation_errors.append("City must be a city name.")
+
+    # Validate Date
+    input_date_str = raw_data.get('Date')
+    if _is_missing(input_date_str):
+        validation_errors.append("Date is required.")
+    else:
+        try:
+            input_date = datetime.strptime(str(input_date_str), '%Y-%m-%d').date()
+            if not (MIN_DATE <= input_date <= MAX_DATE):
+                validation_errors.append(f"Date must be between {MIN_DATE.strftime('%Y-%m-%d')} and {MAX_DATE.strftime('%Y-%m-%d')}.")
+        except ValueError:
+            validation_errors.append("Invalid Date format. Please use YYYY-MM-DD.")
+
+    # Validate Pollutants
+    for pollutant, constraints in POLLUTANT_CONSTRAINTS.items():
+        value_str = raw_data.get(pollutant)
+        if not _is_missing(value_str):
+            try:
+                if isinstance(value_str, bool): # float(True) would accept JSON booleans as readings
+                    raise TypeError(pollutant)
+                value = float(value_str)
+                if not (constraints['min'] <= value <= constraints['max']):
+                    validation_errors.append(f"{pollutant} must be between {constraints['min']} and {constraints['max']} {constraints['unit']}.")
+            except (TypeError, ValueError):
+                validation_errors.append(f"Invalid value for {pollutant}. Please enter a number.")
+
+    return validation_errors
+
+
+def records_to_frame(records: List[Dict[str, Any]]):
+    '''
+    Builds the raw input DataFrame expected by PredictionPipeline from already
+    validated records. Missing pollutant readings become NaN so the fitted
+    imputers handle them exactly like in training.
+    '''
+    import pandas as pd # Lazy: a standalone serving worker never builds DataFrames
+
+    data_for_pipeline = {
+        'City': [record.get('City') for record in records],
+        'Date': [record.get('Date') for record in records], # Pass string; PredictionPipeline will parse
+    }
+    for pollutant in POLLUTANT_COLUMNS:
+        data_for_pipeline[pollutant] = np.array(
+            [np.nan if _is_missing(record.get(pollutant)) else float(record.get(pollutant)) for record in records],
+            dtype=np.float64
+        )
+    return pd.DataFrame(data_for_pipeline)
+
+
+def parse_batch_payload(body: str, mimetype: str = "") -> List[Dict[str, Any]]:
+    '''
+    Parses a batch request body. Accepts a JSON array of objects, a JSON object
+    with a "records" array, or NDJSON (one JSON object per line).
+    Raises ValueError if the payload cannot be interpreted.
+    '''
+    if not body or not body.strip():
+        raise ValueError("Request body is empty.")
+
+    if mimetype not in ("application/x-ndjson", "application/jsonl"):
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            payload = None # Not a single JSON document, try NDJSON below
+        if isinstance(payload, dict) and isinstance(payload.get('records'), list):
+            payload = payload['records']
+        if isinstance(payload, list):
+            if not all(isinstance(record, dict) for record in payload):
+                raise ValueError("Every record must be a JSON object.")
+            return payload
+        if isinstance(payload, dict):
+            return [payload]
+
+    records = []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e.msg}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {line_number} is not a JSON object.")
+        records.append(record)
+    return records
+
+
+def score_records(records: List[Dict[str, Any]], pipeline, tracked=None) -> Tuple[List[Dict[str, Any]], int]:
+    '''
+    Validates every record and scores all valid ones with a single
+    pipeline.predict_records call, so date engineering, reindex,
+    preprocessor.transform and model.predict run once per batch.
+    The validation time of the whole batch is reported to `tracked`
+    (a RequestTracker) when given.
+
+    Returns the per-record results (in input order) and the number of valid records.
+    '''
+    start = time.perf_counter()
+    results = []
+    valid_records = []
+    valid_positions = []
+    for index, record in enumerate(records):
+        errors = validate_record(record)
+        results.append({"index": index, "aqi": None, "aqi_bucket": None, "errors": errors})
+        if not errors:
+            valid_records.append(record)
+            valid_positions.append(index)
+    if tracked is not None:
+        tracked.observe_validation(time.perf_counter() - start)
+
+    if valid_records:
+        predictions = pipeline.predict_records(valid_records)
+        for position, predicted_aqi in zip(valid_positions, np.round(predictions, 2).tolist()):
+            results[position]["aqi"] = predicted_aqi
+            results[position]["aqi_bucket"] = get_aqi_bucket(predicted_aqi)
+
+    return results, len(valid_records)
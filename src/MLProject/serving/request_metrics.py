@@ -0,0 +1,126 @@
+"""
+Request-path metrics shared by the Flask and ASGI apps and both pipelines.
+
+- aqi_requests_total / aqi_request_duration_seconds by route and outcome
+  (success, validation_error, system_error, rejected)
+- aqi_requests_in_flight by route
+- aqi_request_validation_seconds: server-side validation of one request
+- aqi_prediction_step_seconds by step and model_version: date features,
+  reindex, preprocessor transform, model predict, expm1, ... per predict call
+- aqi_model_info{model_version}: 1 for the version this worker serves
+
+Label children are resolved once (per route, per pipeline instance), so a
+request only pays for perf_counter() calls and a few histogram observations:
+a few microseconds in total, cheap enough to stay on in production.
+"""
+import time
+from typing import Dict, Iterable
+from MLProject.serving.metrics import REGISTRY
+
+OUTCOMES = ("success", "validation_error", "system_error", "rejected")
+
+REQUESTS = REGISTRY.counter(
+    "aqi_requests_total", "Prediction requests by route and outcome (success, validation_error, system_error, rejected).",
+    labelnames=("route", "outcome"))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "aqi_request_duration_seconds", "End-to-end handling time of prediction requests by route and outcome.",
+    labelnames=("route", "outcome"))
+IN_FLIGHT_REQUESTS = REGISTRY.gauge(
+    "aqi_requests_in_flight", "Prediction requests currently being handled by this worker.", labelnames=("route",))
+VALIDATION_SECONDS = REGISTRY.histogram(
+    "aqi_request_validation_seconds", "Server-side validation time of the records of one request.", labelnames=("route",))
+PREDICTION_STEP_SECONDS = REGISTRY.histogram(
+    "aqi_prediction_step_seconds", "Time per step of one PredictionPipeline / StandaloneModel predict call.",
+    labelnames=("step", "model_version"))
+MODEL_INFO = REGISTRY.gauge(
+    "aqi_model_info", "1 for the model version this worker is serving, 0 for versions it served before.",
+    labelnames=("model_version",))
+
+_route_children = {}
+
+
+def _children_for(route: str):
+    children = _route_children.get(route)
+    if children is None:
+        children = _route_children.setdefault(route, (
+            IN_FLIGHT_REQUESTS.labels(route=route),
+            VALIDATION_SECONDS.labels(route=route),
+            {outcome: (REQUESTS.labels(route=route, outcome=outcome), REQUEST_SECONDS.labels(route=route, outcome=outcome))
+             for outcome in OUTCOMES},
+        ))
+    return children
+
+
+class RequestTracker:
+    """
+    Times one request and counts it under its outcome:
+
+        with RequestTracker("v1_predict") as tracked:
+            errors = tracked.validate(validate_record, raw_data)
+            if errors:
+                tracked.outcome = "validation_error"
+                ...
+
+    The outcome defaults to success; an exception escaping the block counts
+    as system_error. Routes that catch errors themselves set the outcome.
+    """
+    __slots__ = ("outcome", "_in_flight", "_validation", "_by_outcome", "_start")
+
+    def __init__(self, route: str):
+        self.outcome = "success"
+        self._in_flight, self._validation, self._by_outcome = _children_for(route)
+
+    def __enter__(self) -> "RequestTracker":
+        self._in_flight.inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        self._in_flight.dec()
+        if exc_type is not None:
+            self.outcome = "system_error"
+        count, duration = self._by_outcome[self.outcome]
+        count.inc()
+        duration.observe(elapsed)
+        return False
+
+    def validate(self, validate_fn, *args):
+        start = time.perf_counter()
+        try:
+            return validate_fn(*args)
+        finally:
+            self._validation.observe(time.perf_counter() - start)
+
+    def observe_validation(self, seconds: float):
+        self._validation.observe(seconds)
+
+
+def prediction_step_metrics(model_version: str, steps: Iterable[str]) -> Dict[str, object]:
+    '''Histogram children of aqi_prediction_step_seconds for one loaded pipeline.'''
+    model_version = model_version or "unknown"
+    return {step: PREDICTION_STEP_SECONDS.labels(step=step, model_version=model_version) for step in steps}
+
+
+class StepClock:
+    """
+    Lap timer for one predict call: lap(step) observes the time since the
+    previous lap (or since the clock was created) under that step.
+    """
+    __slots__ = ("_children", "_last")
+
+    def __init__(self, children: Dict[str, object]):
+        self._children = children
+        self._last = time.perf_counter()
+
+    def lap(self, step: str):
+        now = time.perf_counter()
+        self._children[step].observe(now - self._last)
+        self._last = now
+
+
+def set_model_info(model_version: str, previous_version: str = None):
+    '''Marks the version this worker serves; called whenever a pipeline is swapped in.'''
+    if previous_version and previous_version != model_version:
+        MODEL_INFO.labels(model_version=previous_version).set(0)
+    MODEL_INFO.labels(model_version=model_version or "unknown").set(1)
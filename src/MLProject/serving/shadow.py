@@ -0,0 +1,190 @@
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from MLProject import logger
+from MLProject.serving.hot_reload import admin_forbidden, is_admin_request
+from MLProject.serving.metrics import REGISTRY
+from MLProject.utils.common import get_aqi_bucket
+
+SHADOW_REQUESTS = REGISTRY.counter(
+    "aqi_shadow_requests_total", "Predictions mirrored to the candidate model by result (scored, dropped, failed).",
+    labelnames=("result",))
+SHADOW_LATENCY = REGISTRY.histogram(
+    "aqi_shadow_latency_seconds", "predict_records latency of the primary and the candidate model on the same records.",
+    labelnames=("model",))
+SHADOW_ABS_DELTA = REGISTRY.histogram(
+    "aqi_shadow_abs_delta", "Absolute difference between candidate and primary AQI per record.",
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 200))
+SHADOW_BUCKET_MISMATCHES = REGISTRY.counter(
+    "aqi_shadow_bucket_mismatches_total", "Records for which the candidate model predicts a different AQI bucket.")
+
+_SHUTDOWN = object()
+
+
+class ShadowScorer:
+    """
+    Scores a sample of the served traffic with a candidate model off the
+    request path.
+
+    Request threads only flip a coin and put (records, primary predictions,
+    primary latency) on a bounded queue; a single background thread runs the
+    candidate and records latency and prediction deltas. When the queue is
+    full the sample is dropped, so a slow candidate can never add latency to
+    real requests. There is no ground truth at serving time: accuracy is
+    compared as AQI deltas and AQI bucket agreement with the primary model.
+    """
+
+    def __init__(self, fraction: float, max_queue: int = 256, window: int = 2000, log_every: int = 500):
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("fraction must be between 0 and 1")
+        self.fraction = fraction
+        self.max_queue = max_queue
+        self.log_every = log_every
+        self._stats_lock = threading.Lock()
+        self._window = window
+        self._versions = None
+        self._reset_stats()
+        self._closed = False
+        self._start()
+        # Threads do not survive fork(): restart the scorer in every preforked worker
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+        logger.info(f"ShadowScorer started (fraction={fraction}, max_queue={max_queue}).")
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = threading.Thread(target=self._run, name="aqi-shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def _restart_after_fork(self):
+        if not self._closed:
+            self._start()
+
+    def _reset_stats(self):
+        self._latencies = {"primary": deque(maxlen=self._window), "candidate": deque(maxlen=self._window)}
+        self._deltas = deque(maxlen=self._window)
+        self._bucket_mismatches = deque(maxlen=self._window)
+        self._n_scored = 0
+        self._n_dropped = 0
+        self._n_failed = 0
+
+    def submit(self, pipelines: tuple, records: List[Dict[str, Any]], primary_predictions: np.ndarray, primary_latency_s: float):
+        '''Samples the request; pipelines is the (primary, candidate) pair that produced / will score it.'''
+        if random.random() >= self.fraction:
+            return
+        try:
+            self._queue.put_nowait((pipelines, records, np.asarray(primary_predictions, dtype=np.float64), primary_latency_s))
+        except queue.Full:
+            SHADOW_REQUESTS.labels(result="dropped").inc()
+            with self._stats_lock:
+                self._n_dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _SHUTDOWN:
+                return
+            try:
+                self._score(*item)
+            except Exception as e:
+                SHADOW_REQUESTS.labels(result="failed").inc()
+                with self._stats_lock:
+                    self._n_failed += 1
+                logger.warning(f"ShadowScorer: candidate prediction failed: {e}")
+
+    def _score(self, pipelines, records, primary_predictions, primary_latency_s):
+        primary, candidate = pipelines
+        start = time.perf_counter()
+        candidate_predictions = np.asarray(candidate.predict_records(records), dtype=np.float64)
+        candidate_latency_s = time.perf_counter() - start
+
+        deltas = np.abs(candidate_predictions - primary_predictions)
+        mismatches = [get_aqi_bucket(round(float(c), 2)) != get_aqi_bucket(round(float(p), 2))
+                      for c, p in zip(candidate_predictions, primary_predictions)]
+        SHADOW_REQUESTS.labels(result="scored").inc()
+        SHADOW_LATENCY.labels(model="primary").observe(primary_latency_s)
+        SHADOW_LATENCY.labels(model="candidate").observe(candidate_latency_s)
+        for delta in deltas:
+            SHADOW_ABS_DELTA.observe(float(delta))
+        SHADOW_BUCKET_MISMATCHES.inc(sum(mismatches))
+
+        with self._stats_lock:
+            versions = (primary.model_version, candidate.model_version)
+            if versions != self._versions:
+                # New primary or candidate loaded: compare the new pair from scratch
+                self._versions = versions
+                self._reset_stats()
+            self._latencies["primary"].append(primary_latency_s)
+            self._latencies["candidate"].append(candidate_latency_s)
+            self._deltas.extend(deltas.tolist())
+            self._bucket_mismatches.extend(mismatches)
+            self._n_scored += 1
+            log_now = self.log_every and self._n_scored % self.log_every == 0
+        if log_now:
+            logger.info(f"ShadowScorer: {self.summary()}")
+
+    def summary(self) -> Dict[str, Any]:
+        '''Latency percentiles per model and prediction deltas over the recent window.'''
+        with self._stats_lock:
+            latencies = {model: np.array(values) for model, values in self._latencies.items()}
+            deltas = np.array(self._deltas)
+            mismatches = np.array(self._bucket_mismatches, dtype=bool)
+            summary = {"primary_version": self._versions[0] if self._versions else None,
+                       "candidate_version": self._versions[1] if self._versions else None,
+                       "scored": self._n_scored, "dropped": self._n_dropped, "failed": self._n_failed,
+                       "fraction": self.fraction}
+        for model, values in latencies.items():
+            if len(values):
+                p50, p95, p99 = (float(value) * 1000 for value in np.percentile(values, [50, 95, 99]))
+                summary[f"{model}_latency_ms"] = {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)}
+        if len(deltas):
+            summary["abs_delta"] = {"mean": round(float(deltas.mean()), 3), "p95": round(float(np.percentile(deltas, 95)), 3),
+                                    "max": round(float(deltas.max()), 3)}
+            summary["bucket_agreement"] = round(1.0 - float(mismatches.mean()), 4)
+        return summary
+
+    def close(self):
+        self._closed = True
+        self._queue.put(_SHUTDOWN)
+        self._thread.join()
+
+
+class ShadowedPipeline:
+    """
+    Serves predictions from the primary pipeline and mirrors a sample of the
+    records to a candidate pipeline through the ShadowScorer. Both are loaded
+    together, so a hot reload swaps the pair atomically.
+    """
+
+    def __init__(self, primary, candidate, scorer: ShadowScorer):
+        self.primary = primary
+        self.candidate = candidate
+        self.scorer = scorer
+
+    @property
+    def model_version(self) -> str:
+        return self.primary.model_version
+
+    def predict(self, raw_input_data) -> np.ndarray:
+        return self.primary.predict(raw_input_data)
+
+    def predict_records(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        start = time.perf_counter()
+        predictions = self.primary.predict_records(records)
+        self.scorer.submit((self.primary, self.candidate), records, predictions, time.perf_counter() - start)
+        return predictions
+
+
+def handle_shadow_status_request(registry, token: Optional[str]) -> Tuple[dict, int]:
+    '''GET /admin/shadow: primary vs candidate comparison of this worker.'''
+    if not is_admin_request(token):
+        return admin_forbidden()
+    summary = registry.shadow_summary()
+    if summary is None:
+        return {"error": "No candidate model is loaded (serving.shadow_artifacts_dir)."}, 404
+    return summary, 200
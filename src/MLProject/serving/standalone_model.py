@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+import numpy as np
+from MLProject import logger
+from MLProject.utils.compiled_preprocessor import CompiledPreprocessor
+from MLProject.utils.date_features import date_features
+from MLProject.serving.request_metrics import StepClock, prediction_step_metrics
+
+# NOTE: like compiled_preprocessor, this module must only depend on NumPy at
+# import time. A worker serving the standalone export never imports pandas,
+# sklearn, joblib, mlflow or catboost (catboost is only loaded lazily for
+# models the NumPy applier cannot evaluate, e.g. native categorical features).
+
+EXPORT_MANIFEST_NAME = "export_manifest.json"
+
+# Where download_ml_artifacts.py places the exported model inside the container
+STANDALONE_MODEL_DIR = Path(os.environ.get("ML_ARTIFACTS_DIR", "artifacts/downloaded_model")) / "standalone"
+
+
+def artifact_version(paths: Sequence[Path]) -> str:
+    '''Short content hash identifying a set of loaded artifact files (used to scope prediction caches).'''
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class ObliviousTreeEnsemble:
+    """
+    NumPy evaluator for a CatBoost model exported with save_model(format="json").
+
+    CatBoost's default trees are oblivious: every level of a tree tests the same
+    (feature, border) pair, so the leaf index is just the bit pattern of the
+    depth comparisons `x[feature] > border` (bit i = level i). Features and
+    borders are compared as float32, exactly like CatBoost's own quantization,
+    and the prediction is scale * sum(leaf values) + bias.
+
+    Each distinct (feature, border) split is compared once per row, and leaf
+    indices are assembled level by level as uint16 arrays laid out trees x rows,
+    which keeps every step a contiguous NumPy operation.
+
+    Raises ValueError from from_json() for anything else (categorical / CTR
+    splits, non-symmetric trees, multi-dimensional outputs) so callers can fall
+    back to the CatBoost applier.
+    """
+
+    def __init__(self, split_features: List[np.ndarray], split_borders: List[np.ndarray],
+                 split_nan_true: List[np.ndarray], leaf_values: List[np.ndarray], scale: float, bias: float,
+                 n_features: int, block_rows: int = 4096):
+        # Distinct splits over all trees; a split is identified by its feature and the border's float32 bits
+        keys = np.concatenate([np.stack([np.asarray(features, dtype=np.int64).ravel(),
+                                         np.asarray(borders, dtype=np.float32).view(np.int32).ravel().astype(np.int64),
+                                         np.asarray(nan_true, dtype=np.int64).ravel()], axis=1)
+                               for features, borders, nan_true in zip(split_features, split_borders, split_nan_true)]
+                              or [np.zeros((0, 3), dtype=np.int64)])
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        self.split_features = unique_keys[:, 0].astype(np.intp)
+        self.split_borders = unique_keys[:, 1].astype(np.int32).view(np.float32)[:, None]
+        self.split_nan_true = unique_keys[:, 2].astype(bool)[:, None] if unique_keys[:, 2].any() else None
+
+        # One group of trees per depth: split ids (depth, trees) and leaf values flattened with per-tree offsets
+        self.groups = []
+        start = 0
+        for features, leaves in zip(split_features, leaf_values):
+            n_trees, depth = np.asarray(features).shape
+            if depth > 16:
+                raise ValueError(f"Tree depth {depth} exceeds the maximum of 16.")
+            self.groups.append({
+                "split_ids": np.ascontiguousarray(inverse.ravel()[start:start + n_trees * depth].reshape(n_trees, depth).T),
+                "leaf_values": np.asarray(leaves, dtype=np.float64).ravel(),
+                "leaf_offsets": (np.arange(n_trees, dtype=np.intp) << depth)[:, None],
+            })
+            start += n_trees * depth
+        self.scale = float(scale)
+        self.bias = float(bias)
+        self.n_features = int(n_features)
+        self.block_rows = int(block_rows)
+
+    @classmethod
+    def from_json(cls, path: Path) -> "ObliviousTreeEnsemble":
+        with open(path) as f:
+            model = json.load(f)
+        if "oblivious_trees" not in model:
+            raise ValueError("Only symmetric (oblivious) CatBoost trees can be evaluated without catboost.")
+        features_info = model.get("features_info", {})
+        if set(features_info) - {"float_features"}:
+            raise ValueError(f"Model uses non-float features ({sorted(set(features_info) - {'float_features'})}).")
+
+        float_features = sorted(features_info.get("float_features", []), key=lambda feature: feature["feature_index"])
+        flat_index = {feature["feature_index"]: feature["flat_feature_index"] for feature in float_features}
+        nan_as_true = {feature["feature_index"]: feature.get("nan_value_treatment") == "AsTrue" for feature in float_features}
+        n_features = max(flat_index.values()) + 1 if flat_index else 0
+
+        by_depth: Dict[int, List[tuple]] = {}
+        for tree in model["oblivious_trees"]:
+            splits = tree.get("splits") or []
+            if any(split.get("split_type") != "FloatFeature" for split in splits):
+                raise ValueError("Model contains categorical (one-hot or CTR) splits.")
+            if len(tree["leaf_values"]) != 1 << len(splits):
+                raise ValueError("Only single-output models can be evaluated without catboost.")
+            features = [flat_index[split["float_feature_index"]] for split in splits]
+            borders = [split["border"] for split in splits]
+            nan_true = [nan_as_true[split["float_feature_index"]] for split in splits]
+            by_depth.setdefault(len(splits), []).append((features, borders, nan_true, tree["leaf_values"]))
+
+        groups = [by_depth[depth] for depth in sorted(by_depth)]
+        scale, bias = model.get("scale_and_bias", [1.0, [0.0]])
+        if isinstance(bias, list):
+            if len(bias) > 1:
+                raise ValueError("Only single-output models can be evaluated without catboost.")
+            bias = bias[0] if bias else 0.0
+        return cls(
+            split_features=[np.array([tree[0] for tree in group], dtype=np.intp).reshape(len(group), -1) for group in groups],
+            split_borders=[np.array([tree[1] for tree in group], dtype=np.float32).reshape(len(group), -1) for group in groups],
+            split_nan_true=[np.array([tree[2] for tree in group], dtype=bool).reshape(len(group), -1) for group in groups],
+            leaf_values=[np.array([tree[3] for tree in group], dtype=np.float64) for group in groups],
+            scale=scale, bias=bias, n_features=n_features
+        )
+
+    @property
+    def tree_count(self) -> int:
+        return sum(len(group["leaf_offsets"]) for group in self.groups)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if features.shape[1] < self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {features.shape[1]}")
+
+        raw = np.zeros(features.shape[0], dtype=np.float64)
+        for start in range(0, features.shape[0], self.block_rows):
+            values = np.ascontiguousarray(features[start:start + self.block_rows].T)[self.split_features] # (splits, rows)
+            passed = values > self.split_borders
+            if self.split_nan_true is not None:
+                passed |= np.isnan(values) & self.split_nan_true
+            passed = passed.astype(np.uint16)
+            total = raw[start:start + self.block_rows]
+            for group in self.groups:
+                split_ids = group["split_ids"]
+                if not len(split_ids):
+                    total += group["leaf_values"].sum()
+                    continue
+                leaf_index = passed[split_ids[0]] # (trees, rows)
+                for level in range(1, len(split_ids)):
+                    leaf_index |= passed[split_ids[level]] << np.uint16(level)
+                total += group["leaf_values"][leaf_index + group["leaf_offsets"]].sum(axis=0)
+        return self.scale * raw + self.bias
+
+
+class CatBoostApplier:
+    """Fallback for exports the NumPy evaluator rejects: CatBoost's own applier on the .cbm file."""
+
+    def __init__(self, model_path: Path):
+        from catboost import CatBoost # Lazy: pulls in pandas and friends
+
+        self.model = CatBoost()
+        self.model.load_model(str(model_path), format="cbm")
+
+    @property
+    def tree_count(self) -> int:
+        return self.model.tree_count_
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict(features, prediction_type="RawFormulaVal"), dtype=np.float64)
+
+
+def load_model_applier(export_dir: Path, manifest: Dict[str, Any] = None):
+    '''
+    NumPy evaluator for the JSON export when possible, else the CatBoost
+    applier on the .cbm file.
+    '''
+    export_dir = Path(export_dir)
+    if manifest is None:
+        with open(export_dir / EXPORT_MANIFEST_NAME) as f:
+            manifest = json.load(f)
+    files = manifest["files"]
+    if "json" in files and not manifest.get("categorical_feature_indices"):
+        try:
+            return ObliviousTreeEnsemble.from_json(export_dir / files["json"])
+        except ValueError as e:
+            logger.warning(f"JSON export cannot be evaluated with NumPy, falling back to catboost: {e}")
+    return CatBoostApplier(export_dir / files["cbm"])
+
+
+def _to_float(values: Sequence[Any]) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([np.nan if value is None or value == "" else float(value) for value in values], dtype=np.float64)
+
+
+class StandaloneModel:
+    """
+    Drop-in replacement for PredictionPipeline built only from the standalone
+    export written at the end of ModelTrainer.train: the CatBoost model
+    (JSON / .cbm) and the compiled preprocessing parameters (.npz).
+
+    predict() accepts the raw input DataFrame PredictionPipeline takes, or a
+    list of record dicts, and returns AQI in the original scale.
+    """
+
+    # Steps timed in aqi_prediction_step_seconds
+    STEPS = ("date_features", "build_features", "transform", "predict", "inverse_transform")
+
+    def __init__(self, preprocessor: CompiledPreprocessor, model, target_log_transformed: bool, model_version: str = None):
+        self.compiled_preprocessor = preprocessor
+        self.model = model
+        self.target_log_transformed = target_log_transformed
+        self.model_version = model_version
+        self.step_metrics = prediction_step_metrics(model_version, self.STEPS)
+
+    @classmethod
+    def load(cls, export_dir: Path = STANDALONE_MODEL_DIR) -> "StandaloneModel":
+        export_dir = Path(export_dir)
+        with open(export_dir / EXPORT_MANIFEST_NAME) as f:
+            manifest = json.load(f)
+        preprocessor = CompiledPreprocessor.load(export_dir / manifest["preprocessor"])
+        model = load_model_applier(export_dir, manifest)
+        model_version = artifact_version([export_dir / EXPORT_MANIFEST_NAME, export_dir / manifest["preprocessor"],
+                                          export_dir / manifest["files"]["cbm"]])
+        logger.info(f"StandaloneModel loaded from {export_dir}: {type(model).__name__} with {model.tree_count} trees, version {model_version}.")
+        return cls(preprocessor, model, bool(manifest["target_log_transformed"]), model_version)
+
+    def predict(self, raw_input_data) -> np.ndarray:
+        try:
+            clock = StepClock(self.step_metrics)
+            if isinstance(raw_input_data, list):
+                n_rows = len(raw_input_data)
+                columns = {column: [record.get(column) for record in raw_input_data]
+                           for column in self.compiled_preprocessor.input_columns + ["Date"]}
+            else:
+                n_rows = len(raw_input_data)
+                columns = {column: raw_input_data[column].to_numpy() for column in raw_input_data.columns}
+
+            derived = date_features(columns["Date"]) if columns.get("Date") is not None else {}
+            clock.lap("date_features")
+            numeric = np.full((n_rows, len(self.compiled_preprocessor.numeric_columns)), np.nan)
+            for position, column in enumerate(self.compiled_preprocessor.numeric_columns):
+                if column in derived:
+                    numeric[:, position] = derived[column]
+                elif columns.get(column) is not None:
+                    numeric[:, position] = _to_float(columns[column])
+            categorical = [columns[column] if columns.get(column) is not None else [None] * n_rows
+                           for column in self.compiled_preprocessor.categorical_columns]
+            clock.lap("build_features")
+
+            features = self.compiled_preprocessor.transform(numeric, categorical)
+            clock.lap("transform")
+            prediction = self.model.predict(features)
+            clock.lap("predict")
+            if self.target_log_transformed:
+                prediction = np.expm1(prediction)
+                clock.lap("inverse_transform")
+            return prediction
+
+        except Exception as e:
+            logger.exception(f"Error during standalone prediction: {e}")
+            raise e
+
+    def predict_records(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        '''Scores already validated request records without building a DataFrame.'''
+        return self.predict(list(records))
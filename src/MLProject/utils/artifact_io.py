@@ -0,0 +1,193 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from MLProject import logger
+
+SUPPORTED_FORMATS = ("npy", "parquet", "csv")
+
+MANIFEST_NAME = "manifest.json"
+FEATURES_NPY_NAME = "features.npy"
+PARQUET_NAME = "data.parquet"
+CSV_NAME = "data.csv"
+
+
+def _extra_column_file(position: int) -> str:
+    return f"column_{position}.npy"
+
+
+class FrameWriter:
+    """
+    Writes an inter-stage table as an artifact directory `path/` holding the data
+    file(s) and a manifest with the column order, dtypes and format, one chunk
+    at a time so a table larger than memory can be produced incrementally.
+
+    - npy: float columns as one C-contiguous float64 matrix (`features.npy`) that
+      readers memory-map; any non-numeric column is stored as its own fixed-width
+      unicode `.npy` so no pickling is involved. The total row count must be known
+      up front (`n_rows`); text widths default to the longest value in the first
+      chunk unless `text_lengths` gives them per column.
+    - parquet: a single `data.parquet` file with one row group per chunk (requires pyarrow).
+    - csv: a single `data.csv`, kept for compatibility and inspection.
+
+    With export_csv=True a `<path>.csv` copy is written next to the directory.
+    """
+
+    def __init__(self, path: Path, artifact_format: str = "npy", n_rows: Optional[int] = None,
+                 export_csv: bool = False, text_lengths: Optional[Dict[str, int]] = None):
+        if artifact_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported artifact format '{artifact_format}'. Expected one of {SUPPORTED_FORMATS}.")
+        if artifact_format == "npy" and n_rows is None:
+            raise ValueError("The npy artifact format needs the total number of rows up front.")
+
+        self.path = Path(path)
+        self.artifact_format = artifact_format
+        self.n_rows = n_rows
+        self.export_csv = export_csv
+        self.text_lengths = text_lengths or {}
+        self.rows_written = 0
+        self.columns = None
+        self._arrays = {}
+        self._parquet_writer = None
+
+        if self.path.exists():
+            shutil.rmtree(self.path) if self.path.is_dir() else self.path.unlink()
+        os.makedirs(self.path, exist_ok=True)
+        if export_csv and self.path.with_suffix(".csv").exists():
+            self.path.with_suffix(".csv").unlink()
+
+    def _open_npy(self, data: pd.DataFrame):
+        self.numeric_positions = [i for i, column in enumerate(data.columns) if pd.api.types.is_numeric_dtype(data[column])]
+        self.extra_positions = [i for i in range(len(self.columns)) if i not in self.numeric_positions]
+        # Plain appends after an .npy header rather than a writable memmap, so written
+        # pages don't stay resident in this process
+        self._arrays["features"] = self._open_npy_file(FEATURES_NPY_NAME, np.dtype(np.float64),
+                                                        (self.n_rows, len(self.numeric_positions)))
+        for position in self.extra_positions:
+            column = self.columns[position]
+            width = self.text_lengths.get(column) or max(1, int(data.iloc[:, position].astype(str).str.len().max()))
+            self._arrays[position] = self._open_npy_file(_extra_column_file(position), np.dtype(f"<U{width}"), (self.n_rows,))
+
+    def _open_npy_file(self, name: str, dtype: np.dtype, shape: tuple):
+        f = open(self.path / name, "wb")
+        np.lib.format.write_array_header_1_0(f, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                 "fortran_order": False, "shape": shape})
+        return f, dtype
+
+    def write(self, data: pd.DataFrame):
+        if self.columns is None:
+            self.columns = [str(column) for column in data.columns]
+            if self.artifact_format == "npy":
+                self._open_npy(data)
+        elif [str(column) for column in data.columns] != self.columns:
+            raise ValueError(f"Chunk columns {list(data.columns)} do not match the artifact columns {self.columns}.")
+
+        start, stop = self.rows_written, self.rows_written + len(data)
+        if self.artifact_format == "npy":
+            if stop > self.n_rows:
+                raise ValueError(f"Writing more rows than the {self.n_rows} declared for {self.path}.")
+            f, dtype = self._arrays["features"]
+            f.write(np.ascontiguousarray(data.iloc[:, self.numeric_positions].to_numpy(dtype=dtype)).tobytes())
+            for position in self.extra_positions:
+                f, dtype = self._arrays[position]
+                f.write(data.iloc[:, position].astype(str).to_numpy(dtype=dtype).tobytes())
+        elif self.artifact_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path / PARQUET_NAME, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            data.to_csv(self.path / CSV_NAME, mode="a", header=start == 0, index=False)
+
+        if self.export_csv:
+            data.to_csv(self.path.with_suffix(".csv"), mode="a", header=start == 0, index=False)
+        self.rows_written = stop
+
+    def close(self) -> Path:
+        if self.n_rows is not None and self.rows_written != self.n_rows:
+            raise ValueError(f"{self.path}: expected {self.n_rows} rows, {self.rows_written} were written.")
+
+        manifest = {"format": self.artifact_format, "columns": self.columns or [], "n_rows": int(self.rows_written)}
+        if self.artifact_format == "npy":
+            for f, _ in self._arrays.values():
+                f.close()
+            self._arrays = {}
+            manifest["numeric_positions"] = self.numeric_positions
+            manifest["extra_positions"] = self.extra_positions
+            manifest["dtype"] = "float64"
+        elif self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+        with open(self.path / MANIFEST_NAME, "w") as f:
+            json.dump(manifest, f, indent=4)
+
+        if self.export_csv:
+            logger.info(f"CSV export written to {self.path.with_suffix('.csv')}")
+        logger.info(f"Saved {self.artifact_format} artifact to {self.path}. Shape: ({self.rows_written}, {len(manifest['columns'])})")
+        return self.path
+
+
+def save_frame(data: pd.DataFrame, path: Path, artifact_format: str = "npy", export_csv: bool = False) -> Path:
+    '''Writes an in-memory table as an artifact directory in one chunk (see FrameWriter for the layout).'''
+    writer = FrameWriter(path, artifact_format, n_rows=len(data), export_csv=export_csv)
+    writer.write(data)
+    return writer.close()
+
+
+def read_manifest(path: Path) -> dict:
+    with open(Path(path) / MANIFEST_NAME) as f:
+        return json.load(f)
+
+
+def load_frame(path: Path, mmap: bool = True) -> pd.DataFrame:
+    '''
+    Loads an artifact written by save_frame. npy artifacts are memory-mapped and
+    wrapped without copying when every column is numeric. A plain `.csv` file
+    path is still accepted for artifacts produced before the binary formats.
+    '''
+    path = Path(path)
+    if path.is_file():
+        return pd.read_csv(path)
+
+    manifest = read_manifest(path)
+    artifact_format = manifest["format"]
+    if artifact_format == "parquet":
+        return pd.read_parquet(path / PARQUET_NAME)
+    if artifact_format == "csv":
+        return pd.read_csv(path / CSV_NAME)
+
+    features = np.load(path / FEATURES_NPY_NAME, mmap_mode="r" if mmap else None)
+    columns = manifest["columns"]
+    numeric_columns = [columns[i] for i in manifest["numeric_positions"]]
+    data = pd.DataFrame(features, columns=numeric_columns, copy=False)
+    for position in manifest["extra_positions"]:
+        # Plain object dtype so CatBoost recognises the column as categorical strings
+        data.insert(position, columns[position], pd.Series(np.load(path / _extra_column_file(position)), dtype=object))
+    return data
+
+
+def load_features_and_target(path: Path, target_column: str, mmap: bool = True) -> Tuple[pd.DataFrame, pd.Series]:
+    '''
+    Splits an artifact into features and target. For all-numeric npy artifacts
+    with the target stored last (the layout DataTransformation writes) both are
+    views on the memory-mapped matrix, so nothing is copied until a consumer
+    needs contiguous data.
+    '''
+    path = Path(path)
+    if path.is_dir():
+        manifest = read_manifest(path)
+        columns = manifest["columns"]
+        if (manifest["format"] == "npy" and not manifest["extra_positions"]
+                and columns and columns[-1] == target_column):
+            features = np.load(path / FEATURES_NPY_NAME, mmap_mode="r" if mmap else None)
+            x = pd.DataFrame(features[:, :-1], columns=columns[:-1], copy=False)
+            y = pd.Series(features[:, -1], name=target_column, copy=False)
+            return x, y
+
+    data = load_frame(path, mmap=mmap)
+    return data.drop(columns=[target_column]), data[target_column]
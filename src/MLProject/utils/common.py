@@ -3,11 +3,13 @@ from box.exceptions import BoxValueError
 import yaml
 from MLProject import logger
 import json
-import joblib
+import hashlib
+import numpy as np
 from ensure import ensure_annotations
 from box import ConfigBox
 from pathlib import Path
 from typing import Any
+from MLProject.constants import AQI_BUCKETS
 
 
 @ensure_annotations
@@ -89,6 +91,8 @@ def save_bin(data: Any, path: Path):
         data (Any): data to be saved as binary
         path (Path): path to binary file
     """
+    import joblib
+
     joblib.dump(value=data, filename=path)
     logger.info(f"binary file saved at: {path}")
 
@@ -103,6 +107,8 @@ def load_bin(path: Path) -> Any:
     Returns:
         Any: object stored in the file
     """
+    import joblib
+
     data = joblib.load(path)
     logger.info(f"binary file loaded from: {path}")
     return data
@@ -120,3 +126,50 @@ def get_size(path: Path) -> str:
     size_in_kb = round(os.path.getsize(path)/1024)
     return f"~ {size_in_kb} KB"
     
+
+
+@ensure_annotations
+def get_file_hash(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """compute the sha256 of a file without loading it into memory
+
+    Args:
+        path (Path): path to the file
+        chunk_size (int, optional): bytes read per iteration
+
+    Returns:
+        str: hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_aqi_bucket(aqi_score) -> str:
+    """map an AQI score to its CPCB category
+
+    Args:
+        aqi_score (float): predicted or observed AQI
+
+    Returns:
+        str: bucket label, "Extreme" for anything outside the defined ranges
+    """
+    for low, high, label in AQI_BUCKETS:
+        if low <= aqi_score <= high:
+            return label
+    return "Extreme"
+
+
+def get_aqi_buckets(aqi_scores) -> np.ndarray:
+    """vectorized get_aqi_bucket for arrays of scores
+
+    Args:
+        aqi_scores (array-like): predicted or observed AQI values
+
+    Returns:
+        np.ndarray: bucket label per score, by the same rules as get_aqi_bucket
+    """
+    aqi_scores = np.asarray(aqi_scores, dtype=np.float64)
+    conditions = [(aqi_scores >= low) & (aqi_scores <= high) for low, high, _ in AQI_BUCKETS]
+    return np.select(conditions, [label for _, _, label in AQI_BUCKETS], default="Extreme")
@@ -0,0 +1,291 @@
+import numpy as np
+from pathlib import Path
+from typing import Any, List, Sequence
+
+# NOTE: this module must only depend on NumPy at import time. It is used on the
+# serving hot path and by the lightweight inference runtime, so pandas/sklearn
+# are only touched by the compile and parity helpers, which import them lazily.
+
+
+class CompiledPreprocessor:
+    """
+    Flat NumPy re-implementation of the fitted ColumnTransformer built by
+    DataTransformation.get_data_transformer_object.
+
+    The fitted imputer medians, log1p flags, scaler means/scales and one-hot
+    categories are extracted once; transform() then applies exactly the same
+    float64 operations sklearn performs (impute -> log1p -> (x - mean) / scale,
+    most-frequent impute -> one-hot with unknown categories ignored), so the
+    produced feature matrix is bit-identical without DataFrame construction or
+    sklearn input validation.
+
+    In the native categorical mode the categorical pipeline only imputes, so the
+    raw category string passes through; the output is then an object matrix
+    like the one ColumnTransformer produces, ready for CatBoost.
+    """
+
+    def __init__(self, numeric_columns: Sequence[str], numeric_positions: np.ndarray,
+                 fill_values: np.ndarray, log_mask: np.ndarray, means: np.ndarray, scales: np.ndarray,
+                 categorical_columns: Sequence[str], categorical_fill_values: Sequence[str],
+                 categories: Sequence[Sequence[str]], categorical_offsets: Sequence[int],
+                 n_features_out: int, categorical_passthrough: Sequence[bool] = None):
+        self.numeric_columns = list(numeric_columns)
+        self.numeric_positions = np.asarray(numeric_positions, dtype=np.int64)
+        self.fill_values = np.asarray(fill_values, dtype=np.float64)
+        self.log_mask = np.asarray(log_mask, dtype=bool)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.categorical_columns = list(categorical_columns)
+        self.categorical_fill_values = [str(value) for value in categorical_fill_values]
+        self.categories = [[str(category) for category in column_categories] for column_categories in categories]
+        self.categorical_offsets = [int(offset) for offset in categorical_offsets]
+        self.n_features_out = int(n_features_out)
+        if categorical_passthrough is None:
+            categorical_passthrough = [False] * len(self.categorical_columns)
+        self.categorical_passthrough = [bool(flag) for flag in categorical_passthrough]
+        self.output_dtype = object if any(self.categorical_passthrough) else np.float64
+
+        self._log_indices = np.flatnonzero(self.log_mask)
+        self._category_lookup = [{category: index for index, category in enumerate(column_categories)}
+                                 for column_categories in self.categories]
+        # The usual layout (numeric blocks first, contiguous) lets us write a slice instead of fancy indexing
+        self._numeric_slice = None
+        if len(self.numeric_positions) and np.array_equal(
+                self.numeric_positions, np.arange(self.numeric_positions[0], self.numeric_positions[0] + len(self.numeric_positions))):
+            self._numeric_slice = slice(int(self.numeric_positions[0]), int(self.numeric_positions[0]) + len(self.numeric_positions))
+
+    @property
+    def input_columns(self) -> List[str]:
+        return self.numeric_columns + self.categorical_columns
+
+    def transform(self, numeric: np.ndarray, categorical: Sequence[Sequence[Any]] = ()) -> np.ndarray:
+        '''
+        Args:
+            numeric: 2D float32/float64 array with the columns in `numeric_columns` order (NaN = missing)
+            categorical: one sequence of raw values per column in `categorical_columns` order
+
+        Returns:
+            np.ndarray: dense feature matrix identical to ColumnTransformer.transform
+            (float64, or object when categories pass through untouched)
+        '''
+        numeric = np.asarray(numeric, dtype=np.float64)
+        if numeric.ndim == 1:
+            numeric = numeric.reshape(1, -1)
+        if numeric.shape[1] != len(self.numeric_columns):
+            raise ValueError(f"Expected {len(self.numeric_columns)} numeric columns, got {numeric.shape[1]}")
+        if np.isinf(numeric).any():
+            # sklearn's input validation rejects infinities as well
+            raise ValueError("Input contains infinity or a value too large for dtype('float64').")
+
+        n_rows = numeric.shape[0]
+        values = np.where(np.isnan(numeric), self.fill_values, numeric)
+        if len(self._log_indices):
+            values[:, self._log_indices] = np.log1p(values[:, self._log_indices])
+        values -= self.means
+        values /= self.scales
+
+        output = np.zeros((n_rows, self.n_features_out), dtype=self.output_dtype)
+        if self._numeric_slice is not None:
+            output[:, self._numeric_slice] = values
+        else:
+            output[:, self.numeric_positions] = values
+
+        if len(categorical) != len(self.categorical_columns):
+            raise ValueError(f"Expected {len(self.categorical_columns)} categorical columns, got {len(categorical)}")
+        for column_values, fill_value, lookup, offset, passthrough in zip(
+                categorical, self.categorical_fill_values, self._category_lookup,
+                self.categorical_offsets, self.categorical_passthrough):
+            if passthrough:
+                output[:, offset] = [fill_value if _is_missing_category(value) else value for value in column_values]
+                continue
+            codes = np.fromiter(
+                (lookup.get(fill_value if _is_missing_category(value) else str(value), -1) for value in column_values),
+                dtype=np.int64, count=n_rows
+            )
+            known = codes >= 0 # handle_unknown='ignore' -> all-zero block
+            output[np.flatnonzero(known), offset + codes[known]] = 1.0
+
+        return output
+
+    def transform_frame(self, data) -> np.ndarray:
+        '''Convenience wrapper for a pandas DataFrame holding at least `input_columns`.'''
+        numeric = data[self.numeric_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        categorical = [data[column].to_numpy(dtype=object) for column in self.categorical_columns]
+        return self.transform(numeric, categorical)
+
+    def save(self, path: Path):
+        np.savez(
+            path,
+            numeric_columns=np.array(self.numeric_columns, dtype=str),
+            numeric_positions=self.numeric_positions,
+            fill_values=self.fill_values,
+            log_mask=self.log_mask,
+            means=self.means,
+            scales=self.scales,
+            categorical_columns=np.array(self.categorical_columns, dtype=str),
+            categorical_fill_values=np.array(self.categorical_fill_values, dtype=str),
+            categorical_offsets=np.array(self.categorical_offsets, dtype=np.int64),
+            n_features_out=np.array(self.n_features_out),
+            categorical_passthrough=np.array(self.categorical_passthrough, dtype=bool),
+            **{f"categories_{index}": np.array(column_categories, dtype=str)
+               for index, column_categories in enumerate(self.categories)}
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "CompiledPreprocessor":
+        with np.load(path, allow_pickle=False) as arrays:
+            categorical_columns = arrays["categorical_columns"].tolist()
+            return cls(
+                numeric_columns=arrays["numeric_columns"].tolist(),
+                numeric_positions=arrays["numeric_positions"],
+                fill_values=arrays["fill_values"],
+                log_mask=arrays["log_mask"],
+                means=arrays["means"],
+                scales=arrays["scales"],
+                categorical_columns=categorical_columns,
+                categorical_fill_values=arrays["categorical_fill_values"].tolist(),
+                categories=[arrays[f"categories_{index}"].tolist() for index in range(len(categorical_columns))],
+                categorical_offsets=arrays["categorical_offsets"].tolist(),
+                n_features_out=int(arrays["n_features_out"]),
+                categorical_passthrough=arrays["categorical_passthrough"].tolist()
+            )
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor) -> "CompiledPreprocessor":
+        '''
+        Compiles a fitted ColumnTransformer whose transformers are Pipelines of
+        SimpleImputer / FunctionTransformer(np.log1p) / StandardScaler for numeric
+        columns and SimpleImputer(most_frequent) [/ OneHotEncoder] for categorical ones.
+        Raises ValueError for any other layout so callers can fall back to sklearn.
+        '''
+        if getattr(preprocessor, "sparse_output_", False):
+            raise ValueError("Cannot compile a ColumnTransformer with sparse output.")
+
+        numeric_columns, numeric_positions = [], []
+        fill_values, log_mask, means, scales = [], [], [], []
+        categorical_columns, categorical_fill_values, categories, categorical_offsets = [], [], [], []
+        categorical_passthrough = []
+
+        for name, transformer, columns in preprocessor.transformers_:
+            output_slice = preprocessor.output_indices_[name]
+            if name == "remainder" or transformer == "drop":
+                if transformer != "drop" and len(columns) > 0:
+                    raise ValueError("Cannot compile a ColumnTransformer with passthrough remainder columns.")
+                continue
+
+            steps = [step for _, step in getattr(transformer, "steps", [(name, transformer)])]
+            step_names = [type(step).__name__ for step in steps]
+
+            if step_names and step_names[-1] == "OneHotEncoder":
+                encoder = steps[-1]
+                if encoder.handle_unknown != "ignore" or encoder.drop_idx_ is not None:
+                    raise ValueError("Only OneHotEncoder(handle_unknown='ignore', drop=None) can be compiled.")
+                imputer = steps[0] if step_names[0] == "SimpleImputer" else None
+                if imputer is not None and imputer.strategy not in ("most_frequent", "constant"):
+                    raise ValueError(f"Unsupported categorical imputer strategy: {imputer.strategy}")
+                offset = output_slice.start
+                for position, column in enumerate(columns):
+                    categorical_columns.append(column)
+                    categorical_fill_values.append(imputer.statistics_[position] if imputer is not None else "")
+                    categories.append(list(encoder.categories_[position]))
+                    categorical_offsets.append(offset)
+                    categorical_passthrough.append(False)
+                    offset += len(encoder.categories_[position])
+                continue
+
+            if (step_names == ["SimpleImputer"] and steps[0].statistics_.dtype == object
+                    and steps[0].strategy in ("most_frequent", "constant")):
+                # Native categorical mode: imputed raw categories are passed to the model
+                for position, column in enumerate(columns):
+                    categorical_columns.append(column)
+                    categorical_fill_values.append(steps[0].statistics_[position])
+                    categories.append([])
+                    categorical_offsets.append(output_slice.start + position)
+                    categorical_passthrough.append(True)
+                continue
+
+            column_fill = np.full(len(columns), np.nan)
+            column_log = np.zeros(len(columns), dtype=bool)
+            column_mean = np.zeros(len(columns))
+            column_scale = np.ones(len(columns))
+            for step, step_name in zip(steps, step_names):
+                if step_name == "SimpleImputer":
+                    column_fill = np.asarray(step.statistics_, dtype=np.float64)
+                elif step_name == "FunctionTransformer" and step.func is np.log1p:
+                    column_log[:] = True
+                elif step_name == "StandardScaler":
+                    if step.with_mean:
+                        column_mean = np.asarray(step.mean_, dtype=np.float64)
+                    if step.with_std:
+                        column_scale = np.asarray(step.scale_, dtype=np.float64)
+                else:
+                    raise ValueError(f"Unsupported step {step_name} in transformer '{name}'.")
+
+            numeric_columns.extend(columns)
+            numeric_positions.extend(range(output_slice.start, output_slice.stop))
+            fill_values.extend(column_fill)
+            log_mask.extend(column_log)
+            means.extend(column_mean)
+            scales.extend(column_scale)
+
+        n_features_out = max(output_slice.stop for output_slice in preprocessor.output_indices_.values())
+        return cls(numeric_columns, numeric_positions, fill_values, log_mask, means, scales,
+                   categorical_columns, categorical_fill_values, categories, categorical_offsets,
+                   n_features_out, categorical_passthrough)
+
+    def parity_frame(self, n_rows: int = 64, seed: int = 42):
+        '''
+        Builds a DataFrame that exercises every compiled branch: missing values,
+        each known category, an unknown category and a missing category.
+        '''
+        import pandas as pd
+
+        rng = np.random.default_rng(seed)
+        data = {}
+        for index, column in enumerate(self.numeric_columns):
+            centre = self.fill_values[index] if np.isfinite(self.fill_values[index]) else 0.0
+            values = np.abs(centre + rng.normal(0.0, max(abs(centre), 1.0), n_rows))
+            values[rng.random(n_rows) < 0.2] = np.nan
+            data[column] = values
+        for column, column_categories, fill_value in zip(self.categorical_columns, self.categories,
+                                                         self.categorical_fill_values):
+            pool = list(column_categories or [fill_value]) + ["__unknown__", None]
+            data[column] = [pool[i % len(pool)] for i in range(n_rows)]
+        return pd.DataFrame(data)
+
+    def verify_parity(self, preprocessor, data=None):
+        '''
+        Raises AssertionError unless transform() reproduces preprocessor.transform()
+        bit for bit on `data` (defaults to parity_frame()).
+        '''
+        if data is None:
+            data = self.parity_frame()
+        expected = preprocessor.transform(data[self.input_columns])
+        if hasattr(expected, "toarray"):
+            expected = expected.toarray()
+        actual = self.transform_frame(data)
+        if expected.shape != actual.shape:
+            raise AssertionError(f"Compiled preprocessor output shape {actual.shape} differs from ColumnTransformer {expected.shape}.")
+        if expected.dtype == object or actual.dtype == object:
+            # Mixed float/category matrices: compare element by element (outputs never contain NaN)
+            mismatched = int(np.sum(expected != actual))
+        else:
+            mismatched = int(np.sum(~((expected == actual) | (np.isnan(expected) & np.isnan(actual)))))
+        if mismatched:
+            raise AssertionError(f"Compiled preprocessor output differs from ColumnTransformer ({mismatched} mismatched values).")
+
+
+def _is_missing_category(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def compile_preprocessor(preprocessor, verify: bool = True, data=None) -> CompiledPreprocessor:
+    '''
+    Compile step: extracts the fitted parameters of `preprocessor` and, unless
+    disabled, checks bit-identical parity against it before returning.
+    '''
+    compiled = CompiledPreprocessor.from_column_transformer(preprocessor)
+    if verify:
+        compiled.verify_parity(preprocessor, data)
+    return compiled
+
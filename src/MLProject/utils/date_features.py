@@ -0,0 +1,87 @@
+from datetime import date, datetime
+from typing import Any, Dict, Sequence
+import numpy as np
+from MLProject.constants import MIN_DATE, MAX_DATE
+
+# NOTE: NumPy-only, shared by DataTransformation (training), PredictionPipeline
+# and StandaloneModel (serving) so the date features cannot drift between them.
+
+DATE_FEATURE_COLUMNS = ["Year", "Month", "Day", "DayOfWeek", "IsWeekend"]
+
+_NAT = np.datetime64("NaT", "D")
+
+
+def _calendar(days: np.ndarray) -> np.ndarray:
+    '''(n, 5) int64 Year/Month/Day/DayOfWeek/IsWeekend for datetime64[D] values (no NaT).'''
+    years = days.astype("datetime64[Y]")
+    months = days.astype("datetime64[M]")
+    day_of_week = (days.astype(np.int64) + 3) % 7 # 1970-01-01 was a Thursday; Monday = 0 like pandas
+    return np.stack([
+        years.astype(np.int64) + 1970,
+        (months - years).astype(np.int64) + 1,
+        (days - months).astype(np.int64) + 1,
+        day_of_week,
+        (day_of_week >= 5).astype(np.int64),
+    ], axis=1)
+
+
+# One row per day of the range the app accepts, indexed by days since CALENDAR_START
+CALENDAR_START = np.datetime64(MIN_DATE, "D")
+CALENDAR = _calendar(np.arange(CALENDAR_START, np.datetime64(MAX_DATE, "D") + 1))
+
+
+def _parse_one(value: Any) -> np.datetime64:
+    if value is None or (isinstance(value, float) and value != value):
+        return _NAT
+    if hasattr(value, "year"):
+        return np.datetime64(date(value.year, value.month, value.day), "D")
+    try:
+        return np.datetime64(datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date(), "D")
+    except ValueError:
+        return _NAT
+
+
+def parse_dates(values: Sequence[Any]) -> np.ndarray:
+    '''
+    datetime64[D] array from YYYY-MM-DD strings, dates, datetimes or a
+    datetime64 array. Unparseable or missing values become NaT (like
+    pd.to_datetime(errors="coerce")). ISO strings are parsed by NumPy in one
+    call; anything else falls back to parsing value by value.
+    '''
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[D]")
+    try:
+        return values.astype("datetime64[D]")
+    except (TypeError, ValueError):
+        return np.array([_parse_one(value) for value in values], dtype="datetime64[D]")
+
+
+def date_features(values: Sequence[Any]) -> Dict[str, np.ndarray]:
+    '''
+    Year/Month/Day/DayOfWeek/IsWeekend for a batch of dates.
+
+    Days between MIN_DATE and MAX_DATE are looked up in the precomputed
+    CALENDAR; other valid dates are computed with the same NumPy arithmetic.
+    As with the pandas .dt accessors, columns are integers when every date is
+    valid, otherwise floats with NaN for the invalid rows (IsWeekend is 0
+    for them).
+    '''
+    days = parse_dates(values)
+    valid = ~np.isnat(days)
+    offsets = (days - CALENDAR_START).astype(np.int64)
+    in_table = valid & (offsets >= 0) & (offsets < len(CALENDAR))
+
+    if in_table.all():
+        features = CALENDAR[offsets]
+    else:
+        features = np.zeros((len(days), len(DATE_FEATURE_COLUMNS)), dtype=np.int64)
+        features[in_table] = CALENDAR[offsets[in_table]]
+        outside = valid & ~in_table
+        if outside.any():
+            features[outside] = _calendar(days[outside])
+        if not valid.all():
+            features = features.astype(np.float64)
+            features[~valid, :4] = np.nan
+
+    return {column: features[:, position] for position, column in enumerate(DATE_FEATURE_COLUMNS)}
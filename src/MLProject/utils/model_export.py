@@ -0,0 +1,91 @@
+import json
+import shutil
+import numpy as np
+from pathlib import Path
+from typing import List, Optional
+from MLProject import logger
+from MLProject.serving.standalone_model import EXPORT_MANIFEST_NAME, load_model_applier
+
+# CatBoost save_model formats -> file name inside the export directory
+EXPORT_FILE_NAMES = {
+    "cbm": "model.cbm",
+    "json": "model.json",
+    "cpp": "model.cpp",
+    "python": "model.py",
+    "onnx": "model.onnx",
+    "coreml": "model.mlmodel",
+}
+
+
+def export_standalone_model(model, export_dir: Path, compiled_preprocessor_path: Path, target_log_transformed: bool,
+                            formats: List[str], cat_feature_indices: Optional[List[int]] = None, pool=None,
+                            parity_features: Optional[np.ndarray] = None) -> dict:
+    '''
+    Writes everything a serving worker needs without pickles: the CatBoost model
+    in its own formats (.cbm always, plus the requested json/cpp/python/...
+    code exports), the compiled preprocessing parameters and a manifest.
+
+    Code exports CatBoost refuses for the model (e.g. ONNX with categorical
+    features) are skipped with a warning. When parity_features are given, the
+    standalone applier is checked against model.predict on them.
+
+    Without a compiled preprocessor (DataTransformation could not compile the
+    ColumnTransformer) there is nothing a standalone worker could serve, so the
+    export is skipped with a warning.
+
+    Returns:
+        dict: the manifest written to export_dir/export_manifest.json, or None if skipped
+    '''
+    export_dir = Path(export_dir)
+    if export_dir.exists():
+        shutil.rmtree(export_dir) # never leave an export of an earlier model behind
+    if not Path(compiled_preprocessor_path).exists():
+        logger.warning(f"Compiled preprocessor {compiled_preprocessor_path} not found, skipping the standalone model export.")
+        return None
+    export_dir.mkdir(parents=True)
+
+    files = {}
+    for export_format in ["cbm"] + [f for f in formats if f != "cbm"]:
+        file_name = EXPORT_FILE_NAMES.get(export_format)
+        if file_name is None:
+            raise ValueError(f"Unsupported CatBoost export format '{export_format}'. Use one of {sorted(EXPORT_FILE_NAMES)}.")
+        try:
+            # CatBoost needs the training pool to export CTR tables of categorical features
+            model.save_model(str(export_dir / file_name), format=export_format, pool=pool if cat_feature_indices else None)
+            files[export_format] = file_name
+        except Exception as e:
+            if export_format == "cbm":
+                raise e
+            logger.warning(f"Skipping CatBoost '{export_format}' export: {e}")
+
+    preprocessor_name = Path(compiled_preprocessor_path).name
+    shutil.copy2(compiled_preprocessor_path, export_dir / preprocessor_name)
+
+    import catboost
+
+    manifest = {
+        "catboost_version": catboost.__version__,
+        "files": files,
+        "preprocessor": preprocessor_name,
+        "n_features": len(model.feature_names_) if model.feature_names_ else None,
+        "tree_count": int(model.tree_count_),
+        "categorical_feature_indices": list(cat_feature_indices or []),
+        "target_log_transformed": bool(target_log_transformed),
+    }
+    with open(export_dir / EXPORT_MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    if parity_features is not None:
+        applier = load_model_applier(export_dir, manifest)
+        expected = np.asarray(model.predict(parity_features), dtype=np.float64)
+        actual = applier.predict(np.asarray(parity_features))
+        max_abs_diff = float(np.max(np.abs(actual - expected)))
+        if not np.allclose(actual, expected, rtol=1e-9, atol=1e-9):
+            raise AssertionError(f"{type(applier).__name__} differs from CatBoost predict (max abs diff {max_abs_diff}).")
+        manifest["parity_max_abs_diff"] = max_abs_diff
+        with open(export_dir / EXPORT_MANIFEST_NAME, "w") as f:
+            json.dump(manifest, f, indent=4)
+        logger.info(f"Standalone {type(applier).__name__} matches CatBoost predict on {len(expected)} rows (max abs diff {max_abs_diff:.3g}).")
+
+    logger.info(f"Standalone model export written to {export_dir}: {sorted(files.values())} + {preprocessor_name}")
+    return manifest
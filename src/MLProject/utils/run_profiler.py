@@ -0,0 +1,196 @@
+"""
+Wall time, CPU time, peak memory and throughput of the training pipeline.
+
+main.py wraps every stage in profiler.step() and the components wrap their
+expensive calls (CSV parsing, ColumnTransformer fitting, the hyperparameter
+search, MLflow uploads, ...) the same way:
+
+    with profiler.step("fit_transform", rows=len(X_train)):
+        X_train_transformed = preprocessor_obj.fit_transform(X_train)
+
+Steps nest, so that one is reported as "Data Transformation Stage/fit_transform".
+At the end of the run the steps are written to a JSON report and logged as
+metrics of the training MLflow run.
+"""
+import os
+import resource
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from MLProject import logger
+from MLProject.utils.common import save_json
+
+_STATUS = "/proc/self/status"
+_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def _status_bytes(field: str) -> Optional[int]:
+    try:
+        with open(_STATUS) as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    '''Resets the kernel's peak RSS mark (VmHWM) of this process; False where that is unsupported.'''
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> int:
+    '''Peak RSS since the last reset_peak_rss(), or of the whole process lifetime without /proc.'''
+    peak = _status_bytes("VmHWM:")
+    if peak is not None:
+        return peak
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == "Darwin" else maxrss * 1024
+
+
+def cpu_seconds() -> float:
+    '''
+    User + system CPU of every thread of this process (CatBoost, BLAS) plus
+    children that have exited and been waited for. Worker pools that outlive
+    a step (joblib/loky) are only counted once they are shut down.
+    '''
+    children = os.times()
+    return time.process_time() + children.children_user + children.children_system
+
+
+class _Step:
+    __slots__ = ("name", "rows", "peak_rss")
+
+    def __init__(self, name: str, rows: Optional[int]):
+        self.name = name
+        self.rows = rows # may be set inside the block once the row count is known
+        self.peak_rss = 0
+
+
+class RunProfiler:
+    """
+    Collects one record per step: wall time, CPU time, CPU utilisation (CPU
+    seconds per wall second, i.e. cores kept busy), peak RSS and rows/s when
+    the step was given a row count.
+
+    Peak RSS is measured per step by resetting the kernel's high-water mark
+    when a step starts (Linux); a nested step folds the peak it saw into its
+    parents. Elsewhere the process-lifetime peak is reported and
+    "peak_rss_scope" in the report says so. Steps are opened from the
+    pipeline's main thread.
+    """
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+        self.mlflow_run_id = None # set by ModelTrainer; the run the metrics are logged to
+        self.started_at = time.time()
+        self._stack: List[_Step] = []
+        self._per_step_peak = reset_peak_rss()
+
+    @contextmanager
+    def step(self, name: str, rows: Optional[int] = None):
+        parent = self._stack[-1] if self._stack else None
+        record = _Step(f"{parent.name}/{name}" if parent else name, rows)
+        if self._per_step_peak:
+            peak = peak_rss_bytes()
+            for open_step in self._stack:
+                open_step.peak_rss = max(open_step.peak_rss, peak)
+            self._per_step_peak = reset_peak_rss()
+        self._stack.append(record)
+        status = "ok"
+        start_wall, start_cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield record
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            wall_s = time.perf_counter() - start_wall
+            cpu_s = cpu_seconds() - start_cpu
+            self._stack.pop()
+            record.peak_rss = max(record.peak_rss, peak_rss_bytes())
+            if self._stack:
+                self._stack[-1].peak_rss = max(self._stack[-1].peak_rss, record.peak_rss)
+            self._finish(record, status, wall_s, cpu_s)
+
+    def _finish(self, record: _Step, status: str, wall_s: float, cpu_s: float):
+        result = {
+            "name": record.name,
+            "status": status,
+            "wall_s": round(wall_s, 4),
+            "cpu_s": round(cpu_s, 4),
+            "cpu_utilisation": round(cpu_s / wall_s, 3) if wall_s > 0 else None,
+            "peak_rss_mb": round(record.peak_rss / 2**20, 1),
+        }
+        throughput = ""
+        if record.rows is not None:
+            result["rows"] = int(record.rows)
+            result["rows_per_s"] = round(record.rows / wall_s, 1) if wall_s > 0 else None
+            throughput = f", {record.rows} rows ({result['rows_per_s']} rows/s)"
+        self.steps.append(result)
+        logger.info(f"Profile {record.name}: {wall_s:.3f}s wall, {cpu_s:.3f}s CPU, "
+                    f"peak RSS {result['peak_rss_mb']} MB{throughput}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "finished_at": time.time(),
+            "pid": os.getpid(),
+            "cpu_count": os.cpu_count(),
+            "peak_rss_scope": "step" if self._per_step_peak else "process",
+            "mlflow_run_id": self.mlflow_run_id,
+            "steps": self.steps,
+        }
+
+    def mlflow_metrics(self) -> Dict[str, float]:
+        '''Flat metric names, e.g. "profile/model_trainer_stage/randomized_search/wall_s".'''
+        metrics = {}
+        for result in self.steps:
+            prefix = "profile/" + "/".join(part.strip().lower().replace(" ", "_") for part in result["name"].split("/"))
+            for field in ("wall_s", "cpu_s", "peak_rss_mb", "rows_per_s"):
+                if result.get(field) is not None:
+                    metrics[f"{prefix}/{field}"] = float(result[field])
+        return metrics
+
+    def finish(self, report_file: Path, log_to_mlflow: bool = True):
+        '''
+        Writes the JSON report and logs the step metrics plus the report to the
+        training MLflow run. Never raises: a failed upload must not fail (or
+        mask the error of) the pipeline run it describes.
+        '''
+        report = self.report()
+        try:
+            Path(report_file).parent.mkdir(parents=True, exist_ok=True)
+            save_json(Path(report_file), report)
+        except Exception as e:
+            logger.warning(f"Run report could not be written to {report_file}: {e}")
+
+        if not log_to_mlflow:
+            return
+        if self.mlflow_run_id is None:
+            logger.info("No MLflow training run in this pipeline run; step metrics not logged to MLflow.")
+            return
+        try:
+            import mlflow # Lazy: importing mlflow alone takes seconds
+            from mlflow.entities import Metric
+
+            client = mlflow.tracking.MlflowClient()
+            timestamp = int(time.time() * 1000)
+            metrics = [Metric(key, value, timestamp, 0) for key, value in self.mlflow_metrics().items()]
+            for start in range(0, len(metrics), 1000): # log_batch limit
+                client.log_batch(self.mlflow_run_id, metrics=metrics[start:start + 1000])
+            client.log_dict(self.mlflow_run_id, report, "run_report.json")
+            logger.info(f"{len(metrics)} step metrics and run_report.json logged to MLflow run {self.mlflow_run_id}.")
+        except Exception as e:
+            logger.warning(f"Step metrics could not be logged to MLflow run {self.mlflow_run_id}: {e}")
+
+
+# Single profiler shared by the stages of one pipeline run (main.py)
+profiler = RunProfiler()
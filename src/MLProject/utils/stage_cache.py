@@ -0,0 +1,145 @@
+import os
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Any, Collection, Dict, List
+from MLProject import logger
+from MLProject.utils.common import get_file_hash
+
+# Bump when the layout or semantics of cached stage outputs change
+CACHE_FORMAT_VERSION = 2
+
+
+class StageCache:
+    """
+    Content-addressed cache for pipeline stage outputs.
+
+    The key is the sha256 of the stage name, the content hash of every input
+    file and the JSON-serialised params that influence the outputs. Each entry
+    is a directory `<cache_dir>/<stage>/<key>/` holding copies of the output
+    files plus a manifest; restoring hard-links (or copies) them back to the
+    paths the downstream stages read from.
+    """
+
+    def __init__(self, cache_dir: Path, stage_name: str):
+        self.cache_dir = Path(cache_dir)
+        self.stage_name = stage_name
+        self.stage_dir = self.cache_dir / stage_name
+        self._hash_memo_path = self.cache_dir / "file_hashes.json"
+
+    def _file_hash(self, path: Path) -> str:
+        # Re-hashing a multi-GB CSV on every run defeats the purpose, so reuse the
+        # previous digest while size and mtime are unchanged.
+        path = Path(path)
+        stat = path.stat()
+        memo = {}
+        if self._hash_memo_path.exists():
+            with open(self._hash_memo_path) as f:
+                memo = json.load(f)
+        entry = memo.get(str(path.resolve()))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        digest = get_file_hash(path)
+        memo[str(path.resolve())] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._hash_memo_path, "w") as f:
+            json.dump(memo, f, indent=4)
+        return digest
+
+    def compute_key(self, input_files: List[Path], params: Dict[str, Any]) -> str:
+        key_material = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "stage": self.stage_name,
+            "inputs": [self._file_hash(path) for path in input_files],
+            "params": params,
+        }
+        serialised = json.dumps(key_material, sort_keys=True, default=str)
+        return hashlib.sha256(serialised.encode("utf-8")).hexdigest()
+
+    def restore(self, key: str, outputs: Dict[str, Path], optional: Collection[str] = ()) -> bool:
+        '''
+        Materialises the cached outputs for `key` at the given paths.
+        Returns False (and touches nothing) on a cache miss or when the entry
+        lacks any of the requested outputs not listed in `optional`. An optional
+        output the cached run did not produce is removed from its path instead.
+        '''
+        entry_dir = self.stage_dir / key
+        manifest_path = entry_dir / "manifest.json"
+        if not manifest_path.exists():
+            logger.info(f"Stage cache miss for {self.stage_name} (key {key[:12]}).")
+            return False
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        cached_outputs = manifest["outputs"]
+        required = set(outputs) - set(optional)
+        if not required <= set(cached_outputs) or not all((entry_dir / name).exists() for name in cached_outputs):
+            logger.warning(f"Stage cache entry {key[:12]} for {self.stage_name} is incomplete, ignoring it.")
+            return False
+
+        for name, target_path in outputs.items():
+            if name in cached_outputs:
+                _link_or_copy(entry_dir / name, Path(target_path))
+            else:
+                # Optional output the cached run did not produce; don't leave one of another run behind
+                self.release({name: target_path})
+        restored = [name for name in outputs if name in cached_outputs]
+        logger.info(f"Stage cache hit for {self.stage_name} (key {key[:12]}): restored {restored}.")
+        return True
+
+    def release(self, outputs: Dict[str, Path]):
+        '''
+        Unlinks existing output files before the stage recomputes them. Restored
+        outputs are hard links into the cache, so writing through them in place
+        would silently corrupt the cached entry.
+        '''
+        for target_path in outputs.values():
+            target_path = Path(target_path)
+            if target_path.is_dir():
+                shutil.rmtree(target_path)
+            elif target_path.is_file() or target_path.is_symlink():
+                target_path.unlink()
+
+    def store(self, key: str, outputs: Dict[str, Path], metadata: Dict[str, Any] = None):
+        entry_dir = self.stage_dir / key
+        temp_dir = self.stage_dir / f".{key}.tmp"
+        if temp_dir.exists():
+            shutil.rmtree(temp_dir)
+        os.makedirs(temp_dir, exist_ok=True)
+
+        # Optional outputs that the run did not produce are simply not cached
+        produced_outputs = {name: Path(path) for name, path in outputs.items() if Path(path).exists()}
+        for name, source_path in produced_outputs.items():
+            _link_or_copy(source_path, temp_dir / name)
+        with open(temp_dir / "manifest.json", "w") as f:
+            json.dump({"key": key, "stage": self.stage_name, "outputs": list(produced_outputs), "metadata": metadata or {}}, f, indent=4)
+
+        # Publish the entry in one rename so a crash never leaves a half-written entry behind
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        os.replace(temp_dir, entry_dir)
+        logger.info(f"Stored {self.stage_name} outputs in stage cache under key {key[:12]}.")
+
+
+def _link_or_copy(source: Path, target: Path):
+    os.makedirs(target.parent, exist_ok=True)
+    if target.exists() or target.is_symlink():
+        if target.is_dir():
+            shutil.rmtree(target)
+        else:
+            target.unlink()
+    if source.is_dir():
+        # Artifact directories (e.g. npy matrix + manifest) are linked file by file
+        shutil.copytree(source, target, copy_function=_link_or_copy_file)
+        return
+    _link_or_copy_file(source, target)
+
+
+def _link_or_copy_file(source, target):
+    try:
+        # Hard links make restores instant and cost no extra disk space
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
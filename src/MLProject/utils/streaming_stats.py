@@ -0,0 +1,154 @@
+import io
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# schema.yaml dtype names -> dtypes passed to pd.read_csv
+_SCHEMA_TO_PANDAS = {"object": "object", "float64": "float64", "float32": "float32", "int64": "int64"}
+
+
+def schema_dtypes(schema: dict, include_numeric: bool = True) -> Dict[str, str]:
+    '''
+    Explicit read_csv dtypes taken from the schema.yaml COLUMNS mapping. With
+    include_numeric=False only text columns are pinned, so a validator can
+    still see when pandas fails to infer a numeric column.
+    '''
+    dtypes = {}
+    for column, dtype in schema.items():
+        pandas_dtype = _SCHEMA_TO_PANDAS.get(str(dtype), "object")
+        if include_numeric or pandas_dtype == "object":
+            dtypes[str(column)] = pandas_dtype
+    return dtypes
+
+
+def iter_csv_chunks(path, chunk_size: Optional[int] = None, dtype: Optional[dict] = None) -> Iterator[pd.DataFrame]:
+    '''
+    Yields the CSV in chunks of chunk_size rows, or as one frame when chunk_size
+    is falsy. `path` may also be an open binary file object.
+    '''
+    if not chunk_size:
+        yield pd.read_csv(path, dtype=dtype)
+        return
+    with pd.read_csv(path, chunksize=int(chunk_size), dtype=dtype) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+class RunningMoments:
+    """
+    Per-column count, mean, M2, min, max and an all-integers flag over
+    NaN-containing 2D chunks. Moments are merged with Chan et al.'s parallel
+    update, so the result does not depend on how the rows were chunked (up to
+    float rounding).
+    """
+
+    def __init__(self, n_columns: int):
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.mean = np.zeros(n_columns, dtype=np.float64)
+        self.m2 = np.zeros(n_columns, dtype=np.float64)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+        self.integral = np.ones(n_columns, dtype=bool)
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        chunk_count = present.sum(axis=0)
+        if not chunk_count.any():
+            return
+        safe_count = np.maximum(chunk_count, 1)
+        chunk_mean = np.where(present, values, 0.0).sum(axis=0) / safe_count
+        chunk_m2 = np.where(present, (values - chunk_mean) ** 2, 0.0).sum(axis=0)
+
+        total = self.count + chunk_count
+        safe_total = np.maximum(total, 1)
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * chunk_count / safe_total
+        self.m2 = self.m2 + chunk_m2 + delta ** 2 * self.count * chunk_count / safe_total
+        self.count = total
+        with np.errstate(invalid="ignore"):
+            self.min = np.fmin(self.min, np.nanmin(np.where(present, values, np.inf), axis=0))
+            self.max = np.fmax(self.max, np.nanmax(np.where(present, values, -np.inf), axis=0))
+        self.integral &= np.all(~present | (values == np.round(values)), axis=0)
+
+
+class ColumnHistograms:
+    """
+    Fixed-range histograms per column, used to estimate medians in one extra
+    pass without holding the column in memory. Integer-valued columns with a
+    small range (Year, Month, ...) get one bin per value, so their median is
+    exact. Otherwise the estimate interpolates inside the bin holding the
+    median rank and its error is bounded by (max - min) / n_bins.
+    """
+
+    def __init__(self, lower: np.ndarray, upper: np.ndarray, discrete: np.ndarray, n_bins: int = 8192):
+        self.ranges = []
+        for low, high, is_discrete in zip(lower, upper, discrete):
+            if is_discrete and high - low < n_bins:
+                self.ranges.append((float(low) - 0.5, float(high) + 0.5, int(high - low) + 1, True))
+            else:
+                high = high if high > low else low + 1.0
+                self.ranges.append((float(low), float(high), n_bins, False))
+        self.counts = [np.zeros(bins, dtype=np.int64) for _, _, bins, _ in self.ranges]
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        for j, (low, high, bins, _) in enumerate(self.ranges):
+            column = values[:, j]
+            column = column[~np.isnan(column)]
+            if column.size:
+                self.counts[j] += np.histogram(column, bins=bins, range=(low, high))[0]
+
+    def medians(self) -> np.ndarray:
+        medians = np.full(len(self.ranges), np.nan)
+        for j, (low, high, bins, is_discrete) in enumerate(self.ranges):
+            counts = self.counts[j]
+            total = counts.sum()
+            if total == 0:
+                continue
+            cumulative = np.cumsum(counts)
+            if is_discrete:
+                # Same as np.median: mean of the two middle order statistics
+                lower_value = low + 0.5 + np.searchsorted(cumulative, (total - 1) // 2, side="right")
+                upper_value = low + 0.5 + np.searchsorted(cumulative, total // 2, side="right")
+                medians[j] = (lower_value + upper_value) / 2.0
+                continue
+            rank = total / 2.0
+            b = int(np.searchsorted(cumulative, rank))
+            below = cumulative[b - 1] if b > 0 else 0
+            width = (high - low) / bins
+            medians[j] = min(max(low + (b + (rank - below) / counts[b]) * width, low), high)
+        return medians
+
+
+class HashingReader(io.RawIOBase):
+    """
+    Binary file reader that sha256-hashes the bytes as they are consumed, so a
+    parser reading the file (e.g. pd.read_csv) yields its content hash without
+    a second read.
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self._hash = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._file.readinto(buffer)
+        if n:
+            self._hash.update(memoryview(buffer)[:n])
+        return n
+
+    def hexdigest(self) -> str:
+        # Hash whatever the consumer left unread so the digest always covers the whole file
+        for block in iter(lambda: self._file.read(1024 * 1024), b""):
+            self._hash.update(block)
+        return self._hash.hexdigest()
+
+    def close(self):
+        self._file.close()
+        super().close()
@@ -0,0 +1,178 @@
+"""
+Non-blocking, structured logging for the package.
+
+Request threads only put the LogRecord on a bounded in-memory queue. A
+background writer thread formats it and does the file / console I/O, so
+neither disk latency nor message formatting is on the request path. When
+the queue is full, records are dropped and counted rather than blocking.
+The writer reports the drops once it catches up.
+
+The log file gets one JSON object per line (timestamp, level, logger,
+module, message, pid, thread, any `extra=` fields and the traceback). The
+console keeps the classic text format unless LOG_FORMAT=json, e.g. for
+container log collectors. LOG_LEVEL sets the level (default INFO).
+
+NOTE: this module must not import MLProject (it is imported by
+MLProject/__init__.py to create the package logger).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
+
+LOG_FORMAT_ENV = "LOG_FORMAT"
+LOG_LEVEL_ENV = "LOG_LEVEL"
+
+TEXT_FORMAT = "[%(asctime)s: %(levelname)s: %(module)s: %(message)s]"
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    '''One JSON object per record; extra= fields become top-level keys.'''
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    '''The classic text format; extra= fields are appended as JSON.'''
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extra = _extra_fields(record)
+        return f"{text} {json.dumps(extra, default=str, ensure_ascii=False)}" if extra else text
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks and leaves all formatting to the writer
+    thread. The record (including its args) is handed over as is, so
+    objects passed as arguments or extra= must not be mutated after logging.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The base class formats the message here (on the caller's thread) to make the record picklable
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _WriterListener(QueueListener):
+    def __init__(self, queue_handler: NonBlockingQueueHandler, handlers: List[logging.Handler]):
+        super().__init__(queue_handler.queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self.reported_drops = 0
+
+    def handle(self, record: logging.LogRecord):
+        dropped = self.queue_handler.dropped
+        if dropped != self.reported_drops:
+            warning = logging.LogRecord(record.name, logging.WARNING, __file__, 0,
+                                        "%d log records dropped because the log queue was full",
+                                        (dropped - self.reported_drops,), None)
+            self.reported_drops = dropped
+            super().handle(warning)
+        super().handle(record)
+
+    def enqueue_sentinel(self):
+        # Blocking put: on shutdown wait for room rather than losing the queued records
+        self.queue.put(self._sentinel)
+
+
+class BackgroundLogWriter:
+    """
+    Owns the queue handler and the writer thread. Like the MicroBatcher,
+    the thread is restarted in every child after fork() (gunicorn preload),
+    with a fresh queue. At interpreter exit the queue is drained, so
+    short-lived scripts such as main.py lose nothing.
+    """
+
+    def __init__(self, handlers: List[logging.Handler], maxsize: int = 10000):
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.queue_handler = NonBlockingQueueHandler(maxsize)
+        self._start()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+        atexit.register(self.stop)
+
+    def _start(self):
+        self.listener = _WriterListener(self.queue_handler, self.handlers)
+        self.listener.start()
+
+    def _restart_after_fork(self):
+        # The writer thread did not survive fork() and the queue may hold the parent's records
+        self.queue_handler.queue = queue.Queue(maxsize=self.maxsize)
+        self.queue_handler.dropped = 0
+        self._start()
+
+    def stop(self):
+        '''Writes every queued record and stops the writer thread.'''
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for handler in self.handlers:
+            handler.flush()
+
+
+def configure_logging(log_filepath: str, level: Optional[str] = None) -> Optional[BackgroundLogWriter]:
+    '''
+    Routes the root logger through a BackgroundLogWriter that writes JSON
+    lines to log_filepath and text (or JSON, see LOG_FORMAT) to stdout. Like
+    logging.basicConfig it does nothing if the root logger already has handlers.
+    '''
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    file_handler = logging.FileHandler(log_filepath, delay=True) # opened on the first record, not at import
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if os.environ.get(LOG_FORMAT_ENV, "").lower() == "json"
+                                else TextFormatter(TEXT_FORMAT))
+
+    writer = BackgroundLogWriter([file_handler, stream_handler])
+    root.addHandler(writer.queue_handler)
+    root.setLevel((level or os.environ.get(LOG_LEVEL_ENV) or "INFO").upper())
+    return writer
+
+
+def log_sampled(logger: logging.Logger, sample_rate: float, message: str, **fields):
+    '''
+    Logs message at INFO with the given fields (e.g. a request payload) for
+    a random sample_rate share of the calls. Skipped calls cost one random().
+    '''
+    if sample_rate > 0 and (sample_rate >= 1 or random.random() < sample_rate) and logger.isEnabledFor(logging.INFO):
+        logger.info(message, extra={**fields, "sample_rate": sample_rate}, stacklevel=2) # attributed to the caller
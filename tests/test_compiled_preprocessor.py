@@ -0,0 +1,163 @@
+"""
+Parity of MLProject.utils.compiled_preprocessor.CompiledPreprocessor with the
+ColumnTransformer it is compiled from. The ColumnTransformer is the real one
+built by DataTransformation.get_data_transformer_object() with the columns of
+params.yaml, fitted on a small synthetic frame, so no data or artifacts are
+needed. The compiled transform must be bit-identical, not just close.
+"""
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from MLProject.components.data_transformation import DataTransformation
+from MLProject.entity.config_entity import DataTransformationConfig
+from MLProject.utils.common import read_yaml
+from MLProject.utils.compiled_preprocessor import CompiledPreprocessor, compile_preprocessor
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+PARAMS = read_yaml(REPO_ROOT / "params.yaml").data_transformation
+CITIES = ["Delhi", "Mumbai", "Chennai", "Kolkata"]
+# [low, high) of the calendar features
+DATE_RANGES = {"Year": (2015, 2021), "Month": (1, 13), "Day": (1, 29), "DayOfWeek": (0, 7), "IsWeekend": (0, 2)}
+
+
+def make_config(tmp_path: Path, categorical_encoding: str) -> DataTransformationConfig:
+    return DataTransformationConfig(
+        root_dir=tmp_path,
+        data_path=tmp_path / "city_day.csv",
+        preprocessor_name="preprocessor.joblib",
+        compiled_preprocessor_name="compiled_preprocessor.npz",
+        train_data_path=tmp_path / "train.npy",
+        test_data_path=tmp_path / "test.npy",
+        target_column="AQI",
+        numerical_cols=list(PARAMS.numerical_cols),
+        categorical_cols=list(PARAMS.categorical_cols),
+        categorical_encoding=categorical_encoding,
+        columns_to_log_transform=list(PARAMS.columns_to_log_transform),
+        columns_to_drop_after_feature_eng=list(PARAMS.columns_to_drop_after_feature_eng),
+        test_size=PARAMS.test_size,
+        artifact_format="npy",
+        export_csv=False,
+        use_cache=False,
+        cache_dir=tmp_path / "cache",
+        streaming=False,
+        chunk_size=1000,
+        all_schema={},
+    )
+
+
+def make_frame(n_rows: int, seed: int, missing_rate: float = 0.0, cities=CITIES) -> pd.DataFrame:
+    '''Readings shaped like the training features: skewed pollutants, calendar columns and City.'''
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column in PARAMS.numerical_cols:
+        if column in DATE_RANGES:
+            values = rng.integers(*DATE_RANGES[column], n_rows).astype(np.float64)
+        else:
+            values = rng.lognormal(3.0, 1.0, n_rows)
+        values[rng.random(n_rows) < missing_rate] = np.nan
+        data[column] = values
+    data["City"] = [cities[i % len(cities)] for i in range(n_rows)]
+    return pd.DataFrame(data)
+
+
+def fitted_preprocessor(tmp_path: Path, categorical_encoding: str = "onehot"):
+    transformation = DataTransformation(make_config(tmp_path, categorical_encoding))
+    preprocessor = transformation.get_data_transformer_object()
+    train = make_frame(200, seed=0, missing_rate=0.1)
+    preprocessor.fit(train[list(PARAMS.numerical_cols) + list(PARAMS.categorical_cols)])
+    return preprocessor
+
+
+def assert_identical(compiled: CompiledPreprocessor, preprocessor, data: pd.DataFrame):
+    expected = preprocessor.transform(data[compiled.input_columns])
+    if hasattr(expected, "toarray"):
+        expected = expected.toarray()
+    actual = compiled.transform_frame(data)
+    assert actual.shape == expected.shape
+    assert actual.dtype == expected.dtype
+    if expected.dtype == object:
+        assert (actual == expected).all()
+    else:
+        assert np.array_equal(actual, expected) # exact, and outputs never hold NaN
+
+
+@pytest.fixture
+def preprocessor(tmp_path):
+    return fitted_preprocessor(tmp_path)
+
+
+def test_matches_column_transformer(preprocessor):
+    compiled = compile_preprocessor(preprocessor, verify=False)
+    assert_identical(compiled, preprocessor, make_frame(100, seed=1))
+
+
+def test_missing_readings_are_imputed_like_sklearn(preprocessor):
+    compiled = compile_preprocessor(preprocessor, verify=False)
+    data = make_frame(100, seed=2, missing_rate=0.3)
+    data.loc[0, list(PARAMS.numerical_cols)] = np.nan # a row with no readings at all
+    assert_identical(compiled, preprocessor, data)
+
+
+def test_unknown_and_missing_city(preprocessor):
+    compiled = compile_preprocessor(preprocessor, verify=False)
+    data = make_frame(6, seed=3)
+    data["City"] = ["Delhi", "Atlantis", None, np.nan, "", "Mumbai"]
+    assert_identical(compiled, preprocessor, data)
+
+    output = compiled.transform_frame(data)
+    city_block = slice(compiled.categorical_offsets[0], compiled.categorical_offsets[0] + len(compiled.categories[0]))
+    # handle_unknown='ignore': an unseen city is an all-zero one-hot block
+    assert not output[1, city_block].any()
+    # a missing city is imputed with the most frequent training city
+    assert output[2, city_block].sum() == 1.0 and output[3, city_block].sum() == 1.0
+
+
+def test_log_columns(preprocessor):
+    compiled = compile_preprocessor(preprocessor, verify=False)
+    log_columns = [column for column in PARAMS.numerical_cols if column in PARAMS.columns_to_log_transform]
+    assert [column for column, log in zip(compiled.numeric_columns, compiled.log_mask) if log] == log_columns
+
+    data = make_frame(50, seed=4)
+    # Zero, tiny and very large readings stress log1p at both ends
+    for column in log_columns:
+        data.loc[:2, column] = [0.0, 1e-9, 1e6]
+    assert_identical(compiled, preprocessor, data)
+
+
+def test_rejects_infinity_like_sklearn(preprocessor):
+    compiled = compile_preprocessor(preprocessor, verify=False)
+    data = make_frame(3, seed=5)
+    data.loc[1, PARAMS.numerical_cols[0]] = np.inf
+    with pytest.raises(ValueError):
+        preprocessor.transform(data[compiled.input_columns])
+    with pytest.raises(ValueError):
+        compiled.transform_frame(data)
+
+
+def test_npz_round_trip(preprocessor, tmp_path):
+    compiled = compile_preprocessor(preprocessor)
+    path = tmp_path / "compiled_preprocessor.npz"
+    compiled.save(path)
+    loaded = CompiledPreprocessor.load(path)
+
+    assert loaded.input_columns == compiled.input_columns
+    assert loaded.categories == compiled.categories
+    data = make_frame(100, seed=6, missing_rate=0.2, cities=CITIES + ["Atlantis"])
+    assert_identical(loaded, preprocessor, data)
+    assert np.array_equal(loaded.transform_frame(data), compiled.transform_frame(data))
+
+
+def test_native_categorical_mode(tmp_path):
+    preprocessor = fitted_preprocessor(tmp_path, categorical_encoding="native")
+    compiled = compile_preprocessor(preprocessor)
+    assert compiled.categorical_passthrough == [True]
+    assert compiled.output_dtype is object
+
+    data = make_frame(50, seed=7, missing_rate=0.2)
+    data.loc[:1, "City"] = ["Atlantis", None]
+    assert_identical(compiled, preprocessor, data)
+
+    path = tmp_path / "compiled_preprocessor.npz"
+    compiled.save(path)
+    assert_identical(CompiledPreprocessor.load(path), preprocessor, data)